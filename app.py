@@ -1,11 +1,16 @@
 import streamlit as st
 import requests
-import base64
+import io
 from PIL import Image
 import json
 
 # --- Configuration ---
-BACKEND_URL = "http://127.0.0.1:8000/ask"
+UPLOAD_URL = "http://127.0.0.1:8000/ask/upload"
+# Longest side sent to the backend when downscaling (matches the server's VISION_MAX_SIDE)
+UPLOAD_MAX_SIDE = 1280
+# Sent as X-Request-Timeout: the backend answers (snippets only if need be) before our read timeout
+READ_TIMEOUT = 60
+REQUEST_DEADLINE = 50
 PAGE_TITLE = "Sampurna IT Support"
 PAGE_ICON = "🚀"
 
@@ -21,13 +26,33 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def encode_image_to_base64(image_file):
-    if image_file is not None:
-        bytes_data = image_file.getvalue()
-        base64_str = base64.b64encode(bytes_data).decode('utf-8')
-        mime_type = image_file.type
-        return f"data:{mime_type};base64,{base64_str}"
-    return None
+@st.cache_resource
+def get_session():
+    # One keep-alive connection pool for every message of every rerun
+    return requests.Session()
+
+def prepare_upload(image_file, downscale=True):
+    """
+    (filename, bytes, mime) for the multipart 'image' field.
+    Large screenshots are shrunk to UPLOAD_MAX_SIDE and sent as JPEG.
+    """
+    if image_file is None:
+        return None
+    bytes_data = image_file.getvalue()
+    if not downscale:
+        return (image_file.name, bytes_data, image_file.type)
+    with Image.open(io.BytesIO(bytes_data)) as img:
+        if max(img.size) <= UPLOAD_MAX_SIDE:
+            return (image_file.name, bytes_data, image_file.type)
+        img = img.convert("RGBA")
+        # Flatten transparency on white so screenshot text stays readable
+        flat = Image.new("RGB", img.size, (255, 255, 255))
+        flat.paste(img, mask=img.split()[-1])
+        img = flat
+        img.thumbnail((UPLOAD_MAX_SIDE, UPLOAD_MAX_SIDE), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=85)
+    return (image_file.name.rsplit(".", 1)[0] + ".jpg", out.getvalue(), "image/jpeg")
 
 def build_last5_history(messages):
     """
@@ -37,6 +62,31 @@ def build_last5_history(messages):
     last_msgs = messages[-5:] if len(messages) > 5 else messages
     return [f"{m['role']}: {m['content']}" for m in last_msgs]
 
+def iter_sse(response):
+    """
+    Yields (event, data) pairs from a text/event-stream response.
+    """
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+STAGE_LABELS = {
+    "accepted": "🔎 Analyzing...",
+    "cache": "⚡ Found a matching answer...",
+    "vision": "📸 Screenshot analyzed. Searching policies...",
+    "retrieval": "📚 Policies found. Writing answer...",
+    "degraded": "⏱️ Taking too long. Sending the closest policy sections...",
+}
+
 def export_chat_txt(messages):
     lines = []
     for m in messages:
@@ -65,11 +115,13 @@ with st.sidebar:
         key=f"uploader_{st.session_state.uploader_key}"
     )
 
-    image_base64 = None
+    downscale = st.checkbox("Downscale large screenshots before sending", value=True)
+
+    image_upload = None
     if uploaded_file:
         image = Image.open(uploaded_file)
         st.image(image, caption="Uploaded Image", use_column_width=True)
-        image_base64 = encode_image_to_base64(uploaded_file)
+        image_upload = prepare_upload(uploaded_file, downscale)
         st.success("Image ready to send!")
 
     st.divider()
@@ -115,34 +167,70 @@ if prompt := st.chat_input("Describe your issue..."):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        with st.spinner("Analyzing..."):
-            try:
-                history_list = build_last5_history(st.session_state.messages)
-
-                payload = {
-                    "question": prompt,
-                    "chat_history": history_list,   # ✅ last 5 context memory
-                    "image_data": image_base64
-                }
-
-                response = requests.post(BACKEND_URL, json=payload, timeout=60)
-
+        status = st.empty()
+        answer_box = st.empty()
+        status.caption(STAGE_LABELS["accepted"])
+        try:
+            history_list = build_last5_history(st.session_state.messages)
+
+            form = {
+                "question": prompt,
+                "chat_history": json.dumps(history_list),   # ✅ last 5 context memory
+                "stream": "1"
+            }
+            # Raw image bytes as multipart (no base64 inflation)
+            files = {"image": image_upload} if image_upload else None
+
+            # (connect, read) timeout: read applies between streamed chunks, not the whole answer
+            with get_session().post(
+                UPLOAD_URL,
+                data=form,
+                files=files,
+                headers={"X-Request-Timeout": str(REQUEST_DEADLINE)},
+                stream=True,
+                timeout=(5, READ_TIMEOUT),
+            ) as response:
                 if response.status_code == 200:
-                    answer = response.json().get("answer", "").strip()
+                    answer = ""
+                    for event, data in iter_sse(response):
+                        if event == "stage":
+                            label = STAGE_LABELS.get(data.get("stage"))
+                            if data.get("stage") == "retrieval" and data.get("documents"):
+                                top = max(d["similarity"] for d in data["documents"])
+                                label = f"📚 {len(data['documents'])} policy matches (best {top:.2f}). Writing answer..."
+                            if label:
+                                status.caption(label)
+                        elif event == "token":
+                            answer += data.get("text", "")
+                            answer_box.markdown(answer + "▌")
+                        elif event in ("done", "error"):
+                            answer = (data.get("answer") or answer).strip()
+
+                    status.empty()
                     if not answer:
                         answer = "No answer received."
 
-                    st.markdown(answer)
+                    answer_box.markdown(answer)
                     st.session_state.messages.append({"role": "assistant", "content": answer})
 
                     # auto-clear uploaded image after use
-                    if image_base64:
+                    if image_upload:
                         st.session_state.uploader_key += 1
                         st.rerun()
+                elif response.status_code in (413, 415):
+                    status.empty()
+                    st.warning(response.json().get("answer", "Image not accepted."))
+                elif response.status_code in (429, 503):
+                    status.empty()
+                    retry_after = response.headers.get("Retry-After", "a few")
+                    st.warning(f"🚦 Support bot is busy. Please retry in {retry_after} seconds.")
                 else:
+                    status.empty()
                     st.error(f"Error: {response.status_code} - {response.text}")
 
-            except requests.exceptions.ConnectionError:
-                st.error("❌ Could not connect to Backend. Is it running?")
-            except requests.exceptions.Timeout:
-                st.error("⏳ Backend timed out. Please try again.")
+        except requests.exceptions.ConnectionError:
+            status.empty()
+            st.error("❌ Could not connect to Backend. Is it running?")
+        except requests.exceptions.Timeout:
+            status.empty()
+            st.error("⏳ Backend timed out. Please try again.")
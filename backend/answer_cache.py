@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by question meaning instead of exact text.
+    - lookup: cosine similarity of the question embedding against cached ones
+    - bounded: least recently used entry is evicted, entries expire after ttl
+    - corpus-aware: when the it_documents version changes every entry is dropped,
+      and an answer is only stored if the version it was looked up under is
+      still current (it was built from those documents)
+    Embeddings live in one preallocated float32 matrix, so a lookup is a single
+    matrix-vector product.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], np.ndarray],
+        version_fn: Callable[[], int],
+        threshold: float = 0.95,
+        max_entries: int = 512,
+        ttl: Optional[float] = 86400,
+        version_check_interval: float = 30,
+    ):
+        self.embed_fn = embed_fn
+        self.version_fn = version_fn
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.version_check_interval = version_check_interval
+
+        self._matrix: Optional[np.ndarray] = None  # allocated on first store
+        self._slots = [None] * self.max_entries    # slot -> (question, answer, stored_at)
+        self._usage = OrderedDict()                # slot -> None, oldest first
+        self._lock = threading.Lock()
+
+        self._version = None
+        self._version_checked_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ---------------------------
+    # Corpus version
+    # ---------------------------
+    def _current_version(self) -> Optional[int]:
+        """
+        Corpus version, refreshed at most every version_check_interval seconds.
+        Returns None when it can't be read (cache is bypassed then).
+        """
+        now = time.monotonic()
+        if self._version is not None and now - self._version_checked_at < self.version_check_interval:
+            return self._version
+        try:
+            version = self.version_fn()
+        except Exception as e:
+            print(f"Answer cache version check failed: {repr(e)}")
+            return None
+        with self._lock:
+            if self._version is not None and version != self._version:
+                self._clear_locked()
+                self.invalidations += 1
+                print(f"♻️ Corpus changed ({self._version} -> {version}), answer cache cleared.")
+            self._version = version
+            self._version_checked_at = now
+        return version
+
+    def _clear_locked(self) -> None:
+        self._slots = [None] * self.max_entries
+        self._usage.clear()
+        if self._matrix is not None:
+            self._matrix[:] = 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear_locked()
+
+    # ---------------------------
+    # Lookup / store
+    # ---------------------------
+    @staticmethod
+    def _unit(vec: np.ndarray) -> np.ndarray:
+        vec = np.asarray(vec, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def lookup(self, question: str) -> Tuple[Optional[str], Optional[int]]:
+        """
+        (answer or None, corpus version). Pass the version to store() for
+        the answer generated on a miss.
+        """
+        version = self._current_version()
+        if version is None:
+            return None, None
+        query = self._unit(self.embed_fn(question))
+
+        with self._lock:
+            if self._matrix is None or not self._usage:
+                self.misses += 1
+                return None, version
+
+            sims = self._matrix @ query
+            slot = int(np.argmax(sims))
+            entry = self._slots[slot]
+            if entry is None or float(sims[slot]) < self.threshold:
+                self.misses += 1
+                return None, version
+
+            _, answer, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                self._free_locked(slot)
+                self.misses += 1
+                return None, version
+
+            self._usage.move_to_end(slot)
+            self.hits += 1
+            return answer, version
+
+    def store(self, question: str, answer: str, version: Optional[int]) -> None:
+        """
+        version: what lookup() returned. If the corpus changed while the
+        answer was being generated, it came from the old documents: skipped.
+        """
+        if not answer or version is None:
+            return
+        current = self._current_version()
+        if current is None:
+            return
+        if current != version:
+            print(f"♻️ Corpus changed during the answer ({version} -> {current}), not cached.")
+            return
+        vec = self._unit(self.embed_fn(question))
+
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, vec.shape[0]), dtype=np.float32)
+
+            if len(self._usage) < self.max_entries:
+                slot = next(i for i, e in enumerate(self._slots) if e is None)
+            else:
+                slot, _ = self._usage.popitem(last=False)
+                self.evictions += 1
+
+            self._matrix[slot] = vec
+            self._slots[slot] = (question, answer, time.monotonic())
+            self._usage[slot] = None
+            self._usage.move_to_end(slot)
+            self.stores += 1
+
+    def _free_locked(self, slot: int) -> None:
+        self._slots[slot] = None
+        self._matrix[slot] = 0.0
+        self._usage.pop(slot, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._usage),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "corpus_version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def answer_cache_from_env(embed_fn, version_fn) -> Optional[SemanticAnswerCache]:
+    """
+    SEMANTIC_CACHE_ENABLED     -> "0" turns the cache off (default on)
+    SEMANTIC_CACHE_THRESHOLD   -> min cosine similarity for a hit (default 0.95)
+    SEMANTIC_CACHE_SIZE        -> max cached answers (default 512)
+    SEMANTIC_CACHE_TTL         -> answer lifetime in seconds (default 86400, 0 = forever)
+    CORPUS_VERSION_CHECK_EVERY -> seconds between corpus version checks (default 30)
+    """
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "0":
+        return None
+    return SemanticAnswerCache(
+        embed_fn=embed_fn,
+        version_fn=version_fn,
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "512")),
+        ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "86400")),
+        version_check_interval=float(os.getenv("CORPUS_VERSION_CHECK_EVERY", "30")),
+    )
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+import threading
+from typing import List, Optional
+import asyncpg
+from pgvector.asyncpg import register_vector
+from backend.db_pool import VECTOR_EF_SEARCH, VECTOR_PROBES, db_params
+
+# ---------------------------
+# Config
+# ---------------------------
+ASYNC_DB_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", "1"))
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", "10"))
+
+# Same query as the psycopg2 PREPARE; the first fetch() on a connection
+# prepares it into asyncpg's statement cache, later fetches reuse it. The
+# vector is sent in pgvector's binary format.
+MATCH_SQL = "SELECT id, content, metadata, similarity FROM match_it_documents($1, $2, $3, $4, $5)"
+
+
+async def _init_connection(conn) -> None:
+    await register_vector(conn)
+    await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+class AsyncPgSearch:
+    """
+    asyncio-native match_it_documents client.
+    - one asyncpg pool on one event loop (the app's, bound in lifespan);
+      the query holds a connection while it runs, not a thread of its own
+    - search() is the coroutine, awaited by the API for the retrieval before
+      the LLM; search_sync() is for worker threads (the CrewAI tool), which
+      block until the query on that loop returns
+    - without a bound loop (scripts), a private loop thread is started
+    """
+
+    def __init__(self, minconn: int = ASYNC_DB_POOL_MIN, maxconn: int = ASYNC_DB_POOL_MAX):
+        self.minconn = min(minconn, maxconn)
+        self.maxconn = max(1, maxconn)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pool = None
+        self._pool_lock = None
+        self._bind_lock = threading.Lock()
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        with self._bind_lock:
+            self.loop = loop
+            self._pool = None
+            self._pool_lock = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._bind_lock:
+            if self.loop is None or self.loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="asyncpg-loop", daemon=True).start()
+                self.loop = loop
+                self._pool = None
+                self._pool_lock = None
+            return self.loop
+
+    async def pool(self):
+        if self._pool is None:
+            if self._pool_lock is None:
+                self._pool_lock = asyncio.Lock()
+            async with self._pool_lock:
+                if self._pool is None:
+                    params = db_params()
+                    self._pool = await asyncpg.create_pool(
+                        min_size=self.minconn,
+                        max_size=self.maxconn,
+                        init=_init_connection,
+                        database=params.pop("dbname"),
+                        port=int(params.pop("port")),
+                        **params,
+                    )
+                    print(f"🔌 asyncpg pool ready (max {self.maxconn} connections).")
+        return self._pool
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await pool.close()
+
+    # ---------------------------
+    # Search
+    # ---------------------------
+    async def search(self, query_vector, k: int = 4, filter: Optional[dict] = None,
+                     timeout: Optional[float] = None) -> List[dict]:
+        """
+        timeout: seconds for the connection wait and the query each; asyncpg
+        cancels the query server-side when it runs out.
+        """
+        pool = await self.pool()
+        async with pool.acquire(timeout=timeout) as conn:
+            rows = await conn.fetch(
+                MATCH_SQL, query_vector, k, filter or {}, VECTOR_EF_SEARCH, VECTOR_PROBES, timeout=timeout
+            )
+        return [
+            {"id": r["id"], "content": r["content"], "metadata": r["metadata"], "similarity": float(r["similarity"])}
+            for r in rows
+        ]
+
+    def run_sync(self, coro):
+        """
+        Runs a coroutine on the pool's loop from a worker thread.
+        """
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("AsyncPgSearch: use 'await search()' on the event loop thread")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def search_sync(self, query_vector, k: int = 4, filter: Optional[dict] = None,
+                    timeout: Optional[float] = None) -> List[dict]:
+        return self.run_sync(self.search(query_vector, k=k, filter=filter, timeout=timeout))
+
+
+_async_search: AsyncPgSearch = None
+_async_search_lock = threading.Lock()
+
+
+def get_async_search() -> AsyncPgSearch:
+    """
+    ASYNC_DB_POOL_MIN / ASYNC_DB_POOL_MAX -> asyncpg pool size (default 1 / 10)
+    """
+    global _async_search
+    if _async_search is None:
+        with _async_search_lock:
+            if _async_search is None:
+                _async_search = AsyncPgSearch()
+    return _async_search
@@ -0,0 +1,84 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+
+class LRUCache:
+    """
+    Thread-safe bounded LRU with optional TTL.
+    Keeps hit/miss/eviction/expiration counters for sizing in production.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self._data = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            stored_at, value = item
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = (time.monotonic(), value)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_WS_RE = re.compile(r"\s+")
+
+
+def canonicalize_query(q: str) -> str:
+    """
+    Cache key for query text.
+    - unicode NFKC + casefold (mpnet lowercases anyway)
+    - collapsed whitespace
+    - surrounding quotes/punctuation the agent often adds are dropped
+    """
+    t = unicodedata.normalize("NFKC", q or "").casefold()
+    t = _WS_RE.sub(" ", t).strip()
+    return t.strip(" \"'`.,;:!?")
@@ -0,0 +1,186 @@
+import hashlib
+import re
+from typing import Iterable, List, Optional, Tuple
+from backend.context_builder import CHARS_PER_TOKEN, estimate_tokens
+
+_SENTENCE = re.compile(r"(?<=[.!?।])\s+")
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_MD_HEADING = re.compile(r"^\s{0,3}(#{1,6})\s+(.+?)\s*#*\s*$")
+_NUMBERED_HEADING = re.compile(r"^\s*(?:section\s+)?\d+(?:\.\d+)*[.)]?\s+\S", re.IGNORECASE)
+_NORMALIZE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+# ---------------------------
+# Sections
+# ---------------------------
+def _is_heading(line: str) -> bool:
+    """
+    Markdown headings, plus the plain-text kind policies use: short lines
+    without closing punctuation that are numbered, ALL CAPS or end in ':'.
+    """
+    text = line.strip()
+    if not text or len(text) > 80:
+        return False
+    if _MD_HEADING.match(text):
+        return True
+    if text.endswith(":") and len(text.split()) <= 8:
+        return True
+    if text[-1] in ".!?,;":
+        return False
+    letters = [c for c in text if c.isalpha()]
+    if len(text.split()) <= 10 and _NUMBERED_HEADING.match(text):
+        return True
+    return len(letters) >= 3 and all(c.isupper() for c in letters)
+
+
+def _heading_text(line: str) -> str:
+    m = _MD_HEADING.match(line.strip())
+    return (m.group(2) if m else line).strip().rstrip(":").strip()
+
+
+def split_sections(text: str) -> List[Tuple[Optional[str], str]]:
+    """
+    [(section heading or None, body)], in document order; empty bodies dropped.
+    """
+    sections = []
+    heading, body = None, []
+    for line in (text or "").splitlines():
+        if _is_heading(line):
+            if "".join(body).strip():
+                sections.append((heading, "\n".join(body).strip()))
+            heading, body = _heading_text(line), []
+        else:
+            body.append(line)
+    if "".join(body).strip():
+        sections.append((heading, "\n".join(body).strip()))
+    return sections
+
+
+# ---------------------------
+# Size-bounded chunks with overlap
+# ---------------------------
+def _units(text: str, max_chars: int) -> List[str]:
+    """
+    Sentences (within paragraphs); a sentence longer than max_chars is split on words.
+    """
+    units = []
+    for paragraph in _PARAGRAPH.split(text):
+        for sentence in _SENTENCE.split(" ".join(paragraph.split())):
+            if not sentence:
+                continue
+            while len(sentence) > max_chars:
+                cut = sentence[:max_chars].rsplit(" ", 1)[0] or sentence[:max_chars]
+                units.append(cut)
+                sentence = sentence[len(cut):].lstrip()
+            if sentence:
+                units.append(sentence)
+    return units
+
+
+def chunk_text(text: str, max_tokens: int = 200, overlap_tokens: int = 40) -> List[str]:
+    """
+    Packs whole sentences into chunks of at most max_tokens; each chunk
+    starts with up to overlap_tokens of the previous chunk's last sentences.
+    """
+    max_chars = max(1, max_tokens) * CHARS_PER_TOKEN
+    overlap_chars = min(max(0, overlap_tokens) * CHARS_PER_TOKEN, max_chars // 2)
+
+    chunks = []
+    current = []
+    for unit in _units(text, max_chars):
+        if current and len(" ".join(current + [unit])) > max_chars:
+            chunks.append(" ".join(current))
+            # Carry the tail sentences that fit in the overlap (and leave room for this one)
+            tail = []
+            for prev in reversed(current):
+                candidate = [prev] + tail
+                if len(" ".join(candidate)) > overlap_chars or len(" ".join(candidate + [unit])) > max_chars:
+                    break
+                tail = candidate
+            current = tail
+        current.append(unit)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+# ---------------------------
+# Dedupe + ids
+# ---------------------------
+def normalized_hash(text: str) -> str:
+    # Case, whitespace and punctuation differences hash the same
+    return hashlib.sha1(_NORMALIZE.sub(" ", (text or "").lower()).strip().encode("utf-8")).hexdigest()
+
+
+def chunk_id(policy: str, content: str) -> int:
+    """
+    Stable positive bigint: re-running the pipeline on unchanged text gives
+    the same ids, so seed_db.py leaves those rows (and embeddings) alone.
+    """
+    digest = hashlib.sha1(f"{policy}\x00{content}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & 0x7FFFFFFFFFFFFFFF
+
+
+class ChunkingPipeline:
+    """
+    Source policies -> it_documents rows.
+    - sections from headings, then size-bounded chunks with sentence overlap
+    - chunks that are identical after normalisation are kept once
+    - metadata: the source metadata plus policy, section and chunk index, so
+      match_it_documents(filter => '{"policy": ...}') can narrow a search
+    """
+
+    def __init__(self, max_tokens: int = 200, overlap_tokens: int = 40, min_tokens: int = 3):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = min_tokens
+        self.seen = set()
+        self.duplicates = 0
+
+    def chunk_policy(self, policy: str, text: str, metadata: Optional[dict] = None) -> List[dict]:
+        """
+        Rows: {id, content, metadata}.
+        """
+        rows = []
+        index = 0
+        for section, body in split_sections(text):
+            if section and section.lower() == policy.lower():
+                section = None  # the title heading itself
+            for piece in chunk_text(body, self.max_tokens, self.overlap_tokens):
+                if estimate_tokens(piece) < self.min_tokens:
+                    continue
+                key = normalized_hash(piece)
+                if key in self.seen:
+                    self.duplicates += 1
+                    continue
+                self.seen.add(key)
+
+                # Heading travels with the chunk: it is what many questions match
+                content = f"{policy} - {section}\n{piece}" if section else f"{policy}\n{piece}"
+                meta = dict(metadata or {})
+                meta.update({"policy": policy, "chunk": index})
+                if section:
+                    meta["section"] = section
+                rows.append({"id": chunk_id(policy, content), "content": content, "metadata": meta})
+                index += 1
+        return rows
+
+    def run(self, policies: Iterable[Tuple[str, str, Optional[dict]]]) -> List[dict]:
+        rows = []
+        for policy, text, metadata in policies:
+            rows.extend(self.chunk_policy(policy, text, metadata))
+        return rows
+
+
+def policy_name(text: str, metadata: Optional[dict] = None, fallback: str = "IT Policy") -> str:
+    """
+    Name from metadata (policy/title), else the text's first line when it is
+    a heading, else fallback (e.g. the file name).
+    """
+    for key in ("policy", "title", "name"):
+        if isinstance(metadata, dict) and metadata.get(key):
+            return str(metadata[key]).strip()
+    for line in (text or "").splitlines():
+        if line.strip():
+            return _heading_text(line) if _is_heading(line) else fallback
+    return fallback
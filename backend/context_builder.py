@@ -0,0 +1,220 @@
+import os
+import re
+import threading
+from typing import List, Optional, Tuple
+from backend.metrics import CONTEXT_TOKENS, current_trace
+
+# Gemini averages ~4 characters per token for English; close enough for budgeting
+CHARS_PER_TOKEN = 4
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_SENTENCE = re.compile(r"(?<=[.!?।])\s+")
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _words(text: str) -> set:
+    return {w for w in _WORD.findall((text or "").lower()) if len(w) > 2}
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    words = _WORD.findall((text or "").lower())
+    if len(words) < n:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _clip(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:") + " …"
+
+
+class ContextBuilder:
+    """
+    Fits chat history + retrieved chunks into a token budget.
+    - history: the newest turns stay verbatim, older turns shrink to their
+      first sentence; long turns are clipped to share the history budget
+    - chunks: below the similarity floor or near-duplicates of a better chunk
+      are dropped, the rest are clipped to their passages that best match the
+      question when they don't fit
+    - raw vs sent token estimates are counted on /metrics and the request trace
+    """
+
+    def __init__(self, token_budget: int = 1500, history_share: float = 0.3, verbatim_turns: int = 2,
+                 older_turn_chars: int = 160, similarity_floor: float = 0.25, dedupe_threshold: float = 0.8):
+        self.token_budget = max(100, token_budget)
+        self.history_share = min(max(history_share, 0.0), 1.0)
+        self.verbatim_turns = max(0, verbatim_turns)
+        self.older_turn_chars = max(40, older_turn_chars)
+        self.similarity_floor = similarity_floor
+        self.dedupe_threshold = dedupe_threshold
+
+    # ---------------------------
+    # History
+    # ---------------------------
+    def _compress_turn(self, turn: str) -> str:
+        # "assistant: - Summary...\n- Step 1..." -> "assistant: Summary..."
+        role, sep, body = turn.partition(": ")
+        if not sep:
+            role, body = "", turn
+        lines = [_BULLET.sub("", line).strip() for line in body.splitlines()]
+        text = " ".join(line for line in lines if line)
+        first = _SENTENCE.split(text, 1)[0]
+        return f"{role}{sep}{_clip(first, self.older_turn_chars)}"
+
+    def build_history(self, history: List[str], turns: int = 5) -> Tuple[str, int, int]:
+        """
+        Returns (context_str, raw_tokens, sent_tokens).
+        """
+        recent = [h for h in (history or [])[-turns:] if h and h.strip()]
+        raw_tokens = estimate_tokens("\n".join(recent))
+        if not recent:
+            return "No previous context.", 0, 0
+
+        budget_chars = int(self.token_budget * self.history_share) * CHARS_PER_TOKEN
+        # Fewer turns than verbatim_turns: all of them stay verbatim
+        cut = max(0, len(recent) - self.verbatim_turns)
+        turns_out = [self._compress_turn(t) for t in recent[:cut]] + recent[cut:]
+
+        # Water-filling: short turns are kept whole, long ones share what's left
+        fitted = [None] * len(turns_out)
+        remaining = budget_chars
+        order = sorted(range(len(turns_out)), key=lambda i: len(turns_out[i]))
+        for n, i in enumerate(order):
+            share = remaining // (len(order) - n) - 1
+            if share < 40:
+                continue
+            fitted[i] = _clip(turns_out[i].strip(), share)
+            remaining -= len(fitted[i]) + 1
+        context_str = "\n".join(t for t in fitted if t) or "No previous context."
+        return context_str, raw_tokens, estimate_tokens(context_str)
+
+    # ---------------------------
+    # Retrieved chunks
+    # ---------------------------
+    def _best_passages(self, content: str, query_words: set, max_chars: int) -> str:
+        """
+        Keeps the passages (paragraphs, else sentences) sharing the most words
+        with the question, in document order, within max_chars.
+        """
+        passages = [p.strip() for p in re.split(r"\n\s*\n", content) if p.strip()]
+        if len(passages) < 3:
+            passages = [p.strip() for p in _SENTENCE.split(content) if p.strip()]
+        if len(passages) < 2:
+            return _clip(content, max_chars)
+
+        ranked = sorted(
+            range(len(passages)),
+            key=lambda i: (-len(_words(passages[i]) & query_words), i),
+        )
+        chosen = []
+        used = 0
+        for i in ranked:
+            size = len(passages[i]) + 2
+            if used + size > max_chars:
+                continue
+            chosen.append(i)
+            used += size
+        if not chosen:
+            return _clip(passages[ranked[0]], max_chars)
+        return "\n\n".join(passages[i] for i in sorted(chosen))
+
+    def select_documents(self, documents: Optional[list], query: str, budget_tokens: Optional[int] = None) -> Tuple[list, int, int]:
+        """
+        Returns (documents, raw_tokens, sent_tokens); documents are copies,
+        best first, with 'content' possibly clipped.
+        """
+        documents = documents or []
+        raw_tokens = sum(estimate_tokens(d.get("content") or "") for d in documents)
+
+        kept = []
+        kept_shingles = []
+        for d in sorted(documents, key=lambda d: -float(d.get("similarity") or 0.0)):
+            if float(d.get("similarity") or 0.0) < self.similarity_floor:
+                continue
+            shingles = _shingles(d.get("content") or "")
+            if any(_jaccard(shingles, s) >= self.dedupe_threshold for s in kept_shingles):
+                continue
+            kept.append(dict(d))
+            kept_shingles.append(shingles)
+
+        budget_chars = (budget_tokens if budget_tokens is not None else self.token_budget) * CHARS_PER_TOKEN
+        query_words = _words(query)
+        remaining = budget_chars
+        out = []
+        for i, d in enumerate(kept):
+            # Even split of what's left, so one long chunk can't starve the others
+            share = remaining // (len(kept) - i)
+            if share < 80:
+                break
+            content = d.get("content") or ""
+            if len(content) > share:
+                d["content"] = self._best_passages(content, query_words, share)
+            remaining -= len(d["content"])
+            out.append(d)
+
+        sent_tokens = sum(estimate_tokens(d["content"]) for d in out)
+        return out, raw_tokens, sent_tokens
+
+    # ---------------------------
+    # Entry points (build + report)
+    # ---------------------------
+    def fit_history(self, history: List[str]) -> str:
+        context_str, raw_tokens, sent_tokens = self.build_history(history)
+        self.report("history", raw_tokens, sent_tokens)
+        return context_str
+
+    def fit_documents(self, documents: Optional[list], query: str, context_str: str = "") -> list:
+        """
+        Documents get whatever the (already fitted) history left of the budget.
+        """
+        budget = self.token_budget - estimate_tokens(context_str)
+        docs, raw_tokens, sent_tokens = self.select_documents(documents, query, budget)
+        self.report("documents", raw_tokens, sent_tokens)
+        return docs
+
+    @staticmethod
+    def report(part: str, raw_tokens: int, sent_tokens: int) -> None:
+        CONTEXT_TOKENS.labels(part=part, kind="raw").inc(raw_tokens)
+        CONTEXT_TOKENS.labels(part=part, kind="sent").inc(sent_tokens)
+        trace = current_trace()
+        if trace is not None:
+            trace.count(f"{part}_tokens_raw", raw_tokens)
+            trace.count(f"{part}_tokens_sent", sent_tokens)
+
+
+_builder = None
+_builder_lock = threading.Lock()
+
+
+def get_context_builder() -> ContextBuilder:
+    """
+    CONTEXT_TOKEN_BUDGET    -> tokens for history + retrieved chunks (default 1500)
+    CONTEXT_HISTORY_SHARE   -> max fraction of the budget used by history (default 0.3)
+    CONTEXT_VERBATIM_TURNS  -> newest history turns kept word for word (default 2)
+    CONTEXT_SIMILARITY_FLOOR -> chunks below this similarity are dropped (default 0.25)
+    CONTEXT_DEDUPE          -> shingle overlap at which a chunk counts as duplicate (default 0.8)
+    """
+    global _builder
+    if _builder is None:
+        with _builder_lock:
+            if _builder is None:
+                _builder = ContextBuilder(
+                    token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")),
+                    history_share=float(os.getenv("CONTEXT_HISTORY_SHARE", "0.3")),
+                    verbatim_turns=int(os.getenv("CONTEXT_VERBATIM_TURNS", "2")),
+                    similarity_floor=float(os.getenv("CONTEXT_SIMILARITY_FLOOR", "0.25")),
+                    dedupe_threshold=float(os.getenv("CONTEXT_DEDUPE", "0.8")),
+                )
+    return _builder
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import ThreadedConnectionPool
+from pgvector.psycopg2 import register_vector
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# ---------------------------
+# Config
+# ---------------------------
+def db_params() -> dict:
+    return {
+        "dbname": os.getenv("DB_NAME", "vector_db"),
+        "user": os.getenv("DB_USER", "user"),
+        "password": os.getenv("DB_PASSWORD", "password"),
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": os.getenv("DB_PORT", "5432"),
+    }
+
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "8"))
+# Idle connections older than this are pinged before being handed out
+DB_POOL_CHECK_AFTER = float(os.getenv("DB_POOL_CHECK_AFTER", "30"))
+
+# Server-side prepared search, created once per pooled connection
+MATCH_STATEMENT = "match_docs"
+PREPARE_MATCH_SQL = f"""
+PREPARE {MATCH_STATEMENT} (vector, int, jsonb, int, int) AS
+SELECT id, content, metadata, similarity FROM match_it_documents($1, $2, $3, $4, $5)
+"""
+
+# ANN recall knobs passed to match_it_documents (unset = server default)
+VECTOR_EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", "0")) or None
+VECTOR_PROBES = int(os.getenv("VECTOR_PROBES", "0")) or None
+
+
+class _PooledConnection(extensions.connection):
+    """
+    psycopg2 connection that remembers its own pool bookkeeping.
+    """
+    prepared = False
+    last_used = 0.0
+
+
+# ---------------------------
+# Pool
+# ---------------------------
+class PgPool:
+    """
+    Process-wide psycopg2 pool.
+    - blocks (instead of PoolError) when all connections are checked out
+    - pings idle connections before reuse and replaces dead ones
+    - registers the pgvector adapter and prepares match_it_documents per connection
+    """
+
+    def __init__(self, minconn: int = DB_POOL_MIN, maxconn: int = DB_POOL_MAX, check_after: float = DB_POOL_CHECK_AFTER):
+        self.maxconn = max(1, maxconn)
+        self.check_after = check_after
+        self._pool = ThreadedConnectionPool(
+            min(minconn, self.maxconn),
+            self.maxconn,
+            connection_factory=_PooledConnection,
+            **db_params(),
+        )
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+
+    def _prepare(self, conn) -> None:
+        register_vector(conn)
+        with conn.cursor() as cur:
+            cur.execute(PREPARE_MATCH_SQL)
+        conn.commit()
+        conn.prepared = True
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        if not conn.prepared:
+            return True  # freshly opened
+        if time.monotonic() - conn.last_used < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        conn = self._pool.getconn()
+        # Stale idle connections are dropped; at worst every one is replaced
+        for _ in range(self.maxconn):
+            if self._is_healthy(conn):
+                break
+            self._pool.putconn(conn, close=True)
+            conn = self._pool.getconn()
+        if not conn.prepared:
+            self._prepare(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        conn = None
+        broken = False
+        try:
+            conn = self._checkout()
+            yield conn
+            conn.commit()
+        except Exception:
+            if conn is not None:
+                broken = bool(conn.closed)
+                if not broken:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        broken = True
+            raise
+        finally:
+            if conn is not None:
+                conn.last_used = time.monotonic()
+                self._pool.putconn(conn, close=broken)
+            self._slots.release()
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+
+_pool: PgPool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> PgPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PgPool()
+                print(f"🔌 DB pool ready (max {_pool.maxconn} connections).")
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def corpus_version() -> int:
+    """
+    Bumped by a trigger on every write to it_documents (see init.sql).
+    """
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT it_corpus_version()")
+            return int(cur.fetchone()[0])
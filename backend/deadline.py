@@ -0,0 +1,166 @@
+import contextvars
+import math
+import os
+import threading
+import time
+from typing import Mapping, Optional
+
+# ---------------------------
+# Config
+# ---------------------------
+# REQUEST_DEADLINE     -> seconds a request may take end to end (default 45, under the clients' 60)
+# REQUEST_DEADLINE_MAX -> cap on a client-supplied X-Request-Timeout (default 120)
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "45"))
+REQUEST_DEADLINE_MAX = float(os.getenv("REQUEST_DEADLINE_MAX", "120"))
+DEADLINE_HEADER = "x-request-timeout"
+
+# Per-stage ceilings (seconds); a stage never gets more than what is left of the request
+STAGE_BUDGETS = {
+    "vision": float(os.getenv("STAGE_TIMEOUT_VISION", "15")),
+    "embed": float(os.getenv("STAGE_TIMEOUT_EMBED", "5")),
+    "search": float(os.getenv("STAGE_TIMEOUT_SEARCH", "5")),
+    "llm": float(os.getenv("STAGE_TIMEOUT_LLM", "40")),
+}
+# Less than this left before the LLM stage -> answer from the retrieved snippets instead
+LLM_MIN_SECONDS = float(os.getenv("LLM_MIN_SECONDS", "3"))
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised by a stage that has no time left, or whose request was cancelled
+    (client gone).
+    """
+
+    def __init__(self, stage: str, cancelled: bool = False):
+        super().__init__(f"{stage}: request {'cancelled' if cancelled else 'deadline exceeded'}")
+        self.stage = stage
+        self.cancelled = cancelled
+
+
+class InvalidDeadline(ValueError):
+    """
+    X-Request-Timeout present but not a positive number of seconds.
+    """
+
+
+class Deadline:
+    """
+    One request's time budget.
+    - monotonic expiry, shared by every thread working on the request
+    - cancel() marks it dead early (client disconnected); stages check it
+      before starting anything expensive
+    - documents: the last retrieval, so a late request can still be
+      answered from the policy snippets
+    """
+
+    def __init__(self, seconds: float, budgets: Optional[Mapping[str, float]] = None):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+        self.budgets = dict(STAGE_BUDGETS if budgets is None else budgets)
+        self.documents = None
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def check(self, stage: str) -> None:
+        if self.cancelled:
+            raise DeadlineExceeded(stage, cancelled=True)
+        if self.expired:
+            raise DeadlineExceeded(stage)
+
+    def timeout(self, stage: str) -> float:
+        """
+        Seconds this stage may take: its budget, capped by what is left.
+        Raises DeadlineExceeded when nothing is left.
+        """
+        self.check(stage)
+        budget = self.budgets.get(stage)
+        remaining = self.remaining()
+        return min(remaining, budget) if budget else remaining
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("deadline", default=None)
+
+
+def start_deadline(seconds: Optional[float] = None) -> Deadline:
+    deadline = Deadline(REQUEST_DEADLINE if seconds is None else seconds)
+    _current.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def deadline_from_headers(headers: Mapping[str, str]) -> float:
+    """
+    X-Request-Timeout (seconds), capped by REQUEST_DEADLINE_MAX;
+    REQUEST_DEADLINE without the header. Raises InvalidDeadline when the
+    header is not a positive number.
+    """
+    raw = (headers.get(DEADLINE_HEADER) or "").strip()
+    if not raw:
+        return REQUEST_DEADLINE
+    try:
+        seconds = float(raw)
+    except ValueError:
+        raise InvalidDeadline(f"X-Request-Timeout must be a positive number of seconds, got {raw!r}")
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise InvalidDeadline(f"X-Request-Timeout must be a positive number of seconds, got {raw!r}")
+    if seconds > REQUEST_DEADLINE_MAX:
+        print(f"⏱️ X-Request-Timeout {seconds:g}s capped at {REQUEST_DEADLINE_MAX:g}s")
+        return REQUEST_DEADLINE_MAX
+    return seconds
+
+
+# ---------------------------
+# Stage helpers (no-ops outside a request, e.g. scripts)
+# ---------------------------
+def check_deadline(stage: str) -> None:
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+
+def stage_timeout(stage: str) -> Optional[float]:
+    """
+    Seconds for this stage of the current request, None without a deadline.
+    """
+    deadline = _current.get()
+    return deadline.timeout(stage) if deadline is not None else None
+
+
+def llm_time_left() -> bool:
+    # Starting an LLM call that can't finish only burns tokens
+    deadline = _current.get()
+    if deadline is None:
+        return True
+    return not deadline.cancelled and deadline.remaining() >= LLM_MIN_SECONDS
+
+
+def genai_config(config=None, stage: str = "llm"):
+    """
+    google-genai GenerateContentConfig whose HTTP timeout is this stage's
+    budget (None = leave the request unbounded, as before).
+    """
+    seconds = stage_timeout(stage)
+    if seconds is None:
+        return config
+    from google.genai import types
+
+    http_options = types.HttpOptions(timeout=max(1, int(seconds * 1000)))
+    if config is None:
+        return types.GenerateContentConfig(http_options=http_options)
+    return config.model_copy(update={"http_options": http_options})
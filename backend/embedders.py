@@ -0,0 +1,88 @@
+import os
+from typing import Optional
+import numpy as np
+
+DEFAULT_MODEL = "all-mpnet-base-v2"
+
+# ---------------------------
+# Backends
+# ---------------------------
+# torch       -> full-precision PyTorch (default, what the corpus was built with)
+# torch-int8  -> PyTorch with Linear layers dynamically quantized to int8
+# onnx        -> ONNX Runtime, fp32 export of the same weights
+# onnx-int8   -> ONNX Runtime, dynamically quantized int8 export
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Pre-exported files in the sentence-transformers model repo (see EMBEDDING_ONNX_FILE)
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-int8": "onnx/model_quint8_avx2.onnx",
+}
+
+
+class Embedder:
+    """
+    One embedding model behind a SentenceTransformer-style encode().
+    - encode() always returns float32 numpy arrays
+    - version is what gets stored in it_documents.embedding_model, so rows
+      embedded by a different model or backend are picked up by reindex_db.py
+    """
+
+    def __init__(self, model, model_name: str, backend: str):
+        self.model = model
+        self.model_name = model_name
+        self.backend = backend
+
+    @property
+    def version(self) -> str:
+        # Plain model name for torch keeps existing rows up to date
+        if self.backend == "torch":
+            return self.model_name
+        return f"{self.model_name}@{self.backend}"
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        kwargs["convert_to_numpy"] = True
+        vectors = self.model.encode(texts, batch_size=batch_size, **kwargs)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def __repr__(self) -> str:
+        return f"Embedder({self.version})"
+
+
+def load_embedder(backend: str = "torch", model_name: str = DEFAULT_MODEL, onnx_file: Optional[str] = None) -> Embedder:
+    backend = (backend or "torch").strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+
+    # Deferred: importing sentence-transformers pulls in torch
+    from sentence_transformers import SentenceTransformer
+
+    if backend in ("onnx", "onnx-int8"):
+        # Needs sentence-transformers >= 3.2 with onnxruntime + optimum installed
+        model = SentenceTransformer(
+            model_name,
+            device="cpu",
+            backend="onnx",
+            model_kwargs={"file_name": onnx_file or ONNX_FILES[backend]},
+        )
+    else:
+        model = SentenceTransformer(model_name, device="cpu")
+        if backend == "torch-int8":
+            import torch
+
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    return Embedder(model, model_name, backend)
+
+
+def embedder_from_env(backend: Optional[str] = None) -> Embedder:
+    """
+    EMBEDDING_BACKEND   -> torch (default), torch-int8, onnx or onnx-int8
+    EMBEDDING_MODEL     -> sentence-transformers model (default all-mpnet-base-v2)
+    EMBEDDING_ONNX_FILE -> ONNX file inside the model repo (e.g. onnx/model_qint8_avx512_vnni.onnx)
+    """
+    return load_embedder(
+        backend or os.getenv("EMBEDDING_BACKEND", "torch"),
+        model_name=os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL),
+        onnx_file=os.getenv("EMBEDDING_ONNX_FILE") or None,
+    )
@@ -0,0 +1,119 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Optional
+import numpy as np
+
+
+class BatchingEmbedder:
+    """
+    Micro-batches concurrent single-text encode calls.
+    The first waiting request opens a window (window_ms); everything that
+    arrives before it closes, up to max_batch texts, is encoded in one
+    model.encode call and each caller gets its own row back.
+    """
+
+    def __init__(self, model, window_ms: float = 5, max_batch: int = 32):
+        self.model = model
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_started(self) -> None:
+        # Started lazily so no thread exists before a fork (multi-worker preload)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="embed-batcher", daemon=True)
+                self._thread.start()
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        timeout: seconds to wait for the batch (TimeoutError); a text still
+        queued then is skipped by the batch thread.
+        """
+        future = Future()
+        self._ensure_started()
+        self._queue.put((text, future))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError("embedding batch not ready in time") from None
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        if batch[0] is None:
+            return None
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # finish this batch, stop on the next loop
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            # Callers that gave up while queued are dropped; same text twice is encoded once
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            unique = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = self.model.encode(unique, batch_size=len(unique), convert_to_numpy=True)
+                # Copy rows so cached vectors don't pin the whole batch matrix
+                by_text = {t: np.array(v, dtype=np.float32) for t, v in zip(unique, vectors)}
+                for text, future in batch:
+                    future.set_result(by_text[text])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+            self.batches += 1
+            self.items += len(batch)
+
+    def close(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+        }
+
+
+def batcher_from_env(model):
+    """
+    EMBED_BATCHING        -> "0" encodes inline per call (default on)
+    EMBED_BATCH_WINDOW_MS -> how long the first request waits for company (default 5)
+    EMBED_BATCH_MAX       -> max texts per encode call (default 32)
+    """
+    if os.getenv("EMBED_BATCHING", "1") == "0":
+        return None
+    return BatchingEmbedder(
+        model,
+        window_ms=float(os.getenv("EMBED_BATCH_WINDOW_MS", "5")),
+        max_batch=int(os.getenv("EMBED_BATCH_MAX", "32")),
+    )
@@ -0,0 +1,86 @@
+import os
+import threading
+import numpy as np
+from dotenv import load_dotenv
+from backend.cache import LRUCache, canonicalize_query
+from backend.deadline import DeadlineExceeded, check_deadline, stage_timeout
+from backend.embedding_batcher import batcher_from_env
+from backend.embedders import embedder_from_env
+from backend.metrics import span
+
+load_dotenv()
+
+# ---------------------------
+# Lazy model (loaded on first use or by the startup warm-up)
+# ---------------------------
+_embedding_model = None
+_embedding_batcher = None
+_model_lock = threading.Lock()
+
+
+def get_embedding_model():
+    global _embedding_model, _embedding_batcher
+    if _embedding_model is None:
+        with _model_lock:
+            if _embedding_model is None:
+                print("⏳ Loading embedding model...")
+                # EMBEDDING_BACKEND picks torch / torch-int8 / onnx / onnx-int8
+                model = embedder_from_env()
+                # Concurrent encode calls share one batched model.encode (None = inline)
+                _embedding_batcher = batcher_from_env(model)
+                _embedding_model = model
+                print(f"✅ Embedding model loaded: {model.version}")
+    return _embedding_model
+
+
+def is_loaded() -> bool:
+    return _embedding_model is not None
+
+
+def batcher_stats():
+    # None until the model is loaded, or when EMBED_BATCHING=0
+    return _embedding_batcher.stats() if _embedding_batcher is not None else None
+
+
+# ---------------------------
+# Query embedding cache
+# ---------------------------
+# EMBED_CACHE_SIZE -> max cached queries, EMBED_CACHE_TTL -> seconds (0 = no expiry)
+query_embedding_cache = LRUCache(
+    max_size=int(os.getenv("EMBED_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("EMBED_CACHE_TTL", "0")),
+)
+
+
+def embed_query(query: str) -> np.ndarray:
+    """
+    float32 embedding for a query, cached on its canonical text.
+    Returned arrays are shared between callers, so they are read-only.
+    Bounded by the request's 'embed' budget (DeadlineExceeded).
+    """
+    key = canonicalize_query(query)
+    vec = query_embedding_cache.get(key)
+    if vec is None:
+        model = get_embedding_model()
+        with span("embed"):
+            if _embedding_batcher is not None:
+                timeout = stage_timeout("embed")
+                try:
+                    vec = _embedding_batcher.encode(key, timeout=timeout)
+                except TimeoutError:
+                    raise DeadlineExceeded("embed")
+            else:
+                # An inline encode can't be interrupted: only don't start one too late
+                check_deadline("embed")
+                vec = model.encode(key)
+        vec.setflags(write=False)
+        query_embedding_cache.put(key, vec)
+    return vec
+
+
+def warm_up() -> None:
+    """
+    Loads the model and runs one encode so the first real query doesn't pay
+    for lazy torch initialisation.
+    """
+    get_embedding_model().encode("warm up")
@@ -0,0 +1,113 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from backend.metrics import record_stage
+
+
+class PoolSaturated(Exception):
+    """
+    Raised when every worker is busy and the admission queue is full.
+    Carries the Retry-After hint (seconds) for the HTTP layer.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__("worker pool saturated")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a hard cap on admitted work.
+    - max_workers jobs run at the same time
+    - up to max_queue more wait for a free worker
+    - anything beyond that is rejected right away (PoolSaturated)
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, retry_after: int = 5, name: str = "crew"):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = max(1, retry_after)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._admitted = 0
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._admitted
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._admitted -= 1
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._admitted >= self.max_workers + self.max_queue:
+                raise PoolSaturated(self.retry_after)
+            self._admitted += 1
+
+    def _start(self, fn, *args, **kwargs) -> asyncio.Future:
+        # Admission already counted: the slot is freed when the job is done
+        submitted = time.perf_counter()
+
+        def job():
+            record_stage("queue", time.perf_counter() - submitted)
+            return fn(*args, **kwargs)
+
+        try:
+            future = self._pool.submit(contextvars.copy_context().run, job)
+        except Exception:
+            self._release(None)
+            raise
+
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    def submit(self, fn, *args, **kwargs) -> asyncio.Future:
+        """
+        Admits fn(*args, **kwargs) or raises PoolSaturated right away.
+        Returns an asyncio future; cancelling it while the job is still
+        queued drops the job and frees its slot.
+        The caller's contextvars (request trace) are carried into the worker,
+        and the wait for a free worker is recorded as the 'queue' stage.
+        """
+        self._admit()
+        return self._start(fn, *args, **kwargs)
+
+    def submit_after(self, prepare, fn, *args) -> asyncio.Future:
+        """
+        Like submit(), but the job is fn(*args, await prepare()): admission is
+        decided right away, while the prepare() coroutine (e.g. an awaited DB
+        search) runs on the event loop and holds no worker. Cancelling the
+        returned task during prepare() frees the slot as well.
+        """
+        self._admit()
+
+        async def run():
+            try:
+                prepared = await prepare()
+            except BaseException:
+                self._release(None)
+                raise
+            return await self._start(fn, *args, prepared)
+
+        return asyncio.ensure_future(run())
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def executor_from_env() -> BoundedExecutor:
+    """
+    CREW_MAX_WORKERS  -> concurrent crew runs (default 4)
+    CREW_MAX_QUEUE    -> requests allowed to wait for a worker (default 16)
+    CREW_RETRY_AFTER  -> Retry-After seconds sent when saturated (default 5)
+    """
+    return BoundedExecutor(
+        max_workers=int(os.getenv("CREW_MAX_WORKERS", "4")),
+        max_queue=int(os.getenv("CREW_MAX_QUEUE", "16")),
+        retry_after=int(os.getenv("CREW_RETRY_AFTER", "5")),
+    )
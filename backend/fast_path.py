@@ -0,0 +1,139 @@
+import os
+import re
+from typing import List, Optional
+from backend.metrics import FAST_PATH
+
+_SENTENCE = re.compile(r"(?<=[.!?।])\s+")
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+# Devanagari (Hindi) and Bengali script, plus common romanized Hindi/Bengali words
+_INDIC_SCRIPT = re.compile(r"[\u0900-\u09ff]")
+_ROMANIZED_WORDS = {
+    "kya", "kaise", "kaisa", "hai", "hain", "nahi", "nahin", "mera", "meri", "mujhe", "karna", "karein", "churi",
+    "ami", "amar", "kivabe", "kothay", "hobe", "korbo", "korte",
+}
+_WORD = re.compile(r"[a-z]+")
+
+
+def is_english(text: str) -> bool:
+    """
+    False for Hindi/Bengali questions (native script or common romanized
+    words): the templated FAQ answer is English only.
+    """
+    if _INDIC_SCRIPT.search(text or ""):
+        return False
+    return not any(word in _ROMANIZED_WORDS for word in _WORD.findall((text or "").lower()))
+
+
+def _first_line(text: str, max_chars: int = 80) -> str:
+    line = next((line.strip() for line in (text or "").splitlines() if line.strip()), "")
+    line = _BULLET.sub("", line)
+    return line if len(line) <= max_chars else line[:max_chars].rsplit(" ", 1)[0] + " …"
+
+
+def policy_label(document: dict) -> str:
+    """
+    Short name for a chunk: its title/policy/section metadata, else its first line.
+    """
+    metadata = document.get("metadata") or {}
+    if isinstance(metadata, dict):
+        for key in ("title", "policy", "section", "source"):
+            if metadata.get(key):
+                return str(metadata[key])
+    return _first_line(document.get("content"))
+
+
+class FaqFastPath:
+    """
+    Answers straight from retrieval when one chunk clearly is the answer.
+    - top hit similarity >= min_similarity and ahead of the runner-up by
+      >= min_margin -> templated answer from that chunk, no LLM call
+    - the other hits above related_floor are listed as related policies
+    - anything else falls through to the normal pipeline
+    - callers only use it for standalone English questions (no history, no
+      image): the template neither follows a conversation nor translates
+    """
+
+    def __init__(self, min_similarity: float = 0.85, min_margin: float = 0.1, related_floor: float = 0.5,
+                 max_related: int = 3):
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.related_floor = related_floor
+        self.max_related = max_related
+
+    def match(self, documents: Optional[list]) -> Optional[dict]:
+        ranked = sorted(documents or [], key=lambda d: -float(d.get("similarity") or 0.0))
+        if not ranked:
+            return None
+        top = float(ranked[0].get("similarity") or 0.0)
+        runner_up = float(ranked[1].get("similarity") or 0.0) if len(ranked) > 1 else 0.0
+        if top < self.min_similarity or top - runner_up < self.min_margin:
+            return None
+        return ranked[0]
+
+    def render(self, top: dict, others: List[dict]) -> str:
+        body = [line.strip() for line in (top.get("content") or "").splitlines() if line.strip()]
+        # A leading heading line ("Tablet Loss Policy") is not the summary
+        text = body[1:] if len(body) > 1 and not _SENTENCE.search(body[0] + " ") else body
+        summary = _SENTENCE.split(" ".join(_BULLET.sub("", line) for line in text), 1)[0]
+        lines = [f"- Summary: {summary}", "- From the policy document:"]
+        lines += [f"  {line}" for line in body]
+
+        related = []
+        top_label = policy_label(top)
+        for d in others:
+            label = policy_label(d)
+            if float(d.get("similarity") or 0.0) >= self.related_floor and label not in related and label != top_label:
+                related.append(label)
+        if related:
+            lines.append("- Related policies:")
+            lines += [f"  - {label}" for label in related[:self.max_related]]
+        return "\n".join(lines)
+
+    def answer(self, documents: Optional[list]) -> Optional[str]:
+        """
+        Templated answer, or None when the pipeline should run.
+        """
+        top = self.match(documents)
+        FAST_PATH.labels(result="hit" if top is not None else "miss").inc()
+        if top is None:
+            return None
+        return self.render(top, [d for d in documents if d is not top])
+
+
+DEGRADED_INTRO = "I couldn't finish a full answer in time. These are the closest matching policy sections:"
+DEGRADED_EMPTY = "I couldn't finish the policy lookup in time. Please try again in a moment."
+
+
+def degraded_answer(documents: Optional[list], max_snippets: int = 3, max_chars: int = 400) -> str:
+    """
+    Snippets-only answer for a request that ran out of time before (or
+    during) the LLM stage: the best retrieved chunks, labelled and clipped.
+    """
+    ranked = sorted(documents or [], key=lambda d: -float(d.get("similarity") or 0.0))
+    if not ranked:
+        return DEGRADED_EMPTY
+    lines = [DEGRADED_INTRO]
+    for d in ranked[:max_snippets]:
+        text = " ".join((d.get("content") or "").split())
+        if len(text) > max_chars:
+            text = text[:max_chars].rsplit(" ", 1)[0] + " …"
+        label = policy_label(d)
+        # A label taken from the chunk's own first line would repeat it
+        lines.append(f"- {text}" if text.startswith(label.rstrip(" …")) else f"- {label}: {text}")
+    return "\n".join(lines)
+
+
+def fast_path_from_env() -> Optional[FaqFastPath]:
+    """
+    FAST_PATH_ENABLED        -> "1" answers clear FAQ matches without the LLM (default off)
+    FAST_PATH_MIN_SIMILARITY -> min top-hit similarity (default 0.85)
+    FAST_PATH_MIN_MARGIN     -> min lead over the runner-up (default 0.1)
+    FAST_PATH_RELATED_FLOOR  -> min similarity for a related policy (default 0.5)
+    """
+    if os.getenv("FAST_PATH_ENABLED", "0") != "1":
+        return None
+    return FaqFastPath(
+        min_similarity=float(os.getenv("FAST_PATH_MIN_SIMILARITY", "0.85")),
+        min_margin=float(os.getenv("FAST_PATH_MIN_MARGIN", "0.1")),
+        related_floor=float(os.getenv("FAST_PATH_RELATED_FLOOR", "0.5")),
+    )
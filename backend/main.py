@@ -1,18 +1,130 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.datastructures import Headers, MutableHeaders
 from pydantic import BaseModel
-from crewai import Agent, Task, Crew, Process, LLM
-from backend.db_tool import SearchITDocsTool
-from typing import List, Optional
+from backend.answer_cache import answer_cache_from_env
+from backend.cache import canonicalize_query
+from backend.context_builder import get_context_builder
+from backend.db_pool import close_pool, corpus_version, get_pool
+from backend.deadline import DeadlineExceeded, InvalidDeadline, current_deadline, deadline_from_headers, llm_time_left, start_deadline
+from backend import embeddings
+from backend.embeddings import embed_query, query_embedding_cache
+from backend.executor import PoolSaturated, executor_from_env
+from backend.fast_path import degraded_answer, fast_path_from_env, is_english
+from backend.metrics import CREW_IN_FLIGHT, REQUESTS, REQUEST_SECONDS, current_trace, metrics_payload, record_stage, span, start_trace
+from backend.retrieval import AsyncPgRetriever, InProcessRetriever, asearch_documents, get_retriever
+from backend.singleflight import SingleFlight
+from backend.vision import ImageUpload, image_fingerprint, vision_from_env
+from backend.pipeline import GEMINI_MODEL, CrewPipeline, RagPipeline, summarize_documents
+from backend.warmup import Readiness
+from typing import List, Optional, Union
 import os
-import base64
+import json
+import hashlib
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
-# --- Modern Google Client ---
-from google import genai
-from google.genai import types
 
+# ---------------------------
+# Crew worker pool (keeps the event loop free)
+# ---------------------------
+crew_executor = executor_from_env()
+CREW_IN_FLIGHT.set_function(lambda: crew_executor.in_flight)
+
+# Built once in lifespan, reused by every request
+# PIPELINE_MODE: "crew" (agent + tool loop, default) or "rag" (retrieve, then one LLM call)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "crew").strip().lower()
+answer_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    global answer_pipeline
+    if answer_pipeline is None:
+        with _pipeline_lock:
+            if answer_pipeline is None:
+                if PIPELINE_MODE == "rag":
+                    answer_pipeline = RagPipeline(client=get_genai_client())
+                else:
+                    # CREW_VERBOSE=0 turns off CrewAI's per-step console output (production)
+                    answer_pipeline = CrewPipeline(
+                        api_key=GOOGLE_API_KEY,
+                        verbose=os.getenv("CREW_VERBOSE", "1") != "0",
+                    )
+                print(f"🧩 Pipeline mode: {answer_pipeline.mode}")
+    return answer_pipeline
+
+
+# ---------------------------
+# Warm-up + readiness
+# ---------------------------
+# Heavy imports (torch, crewai, google-genai) are deferred to first use.
+# /health answers as soon as the process is up; /ready once everything is warm.
+readiness = Readiness(["embedder", "db_pool", "llm"])
+
+
+def _warm_embedder():
+    embeddings.warm_up()
+
+
+def _warm_db_pool():
+    retriever = get_retriever()
+    if isinstance(retriever, AsyncPgRetriever):
+        retriever.client.run_sync(retriever.client.pool())
+        return
+    if isinstance(retriever, InProcessRetriever):
+        retriever.index.maybe_refresh()
+        if len(retriever.index):
+            # A loaded snapshot serves searches even while the DB is down
+            return
+    get_pool()
 
-app = FastAPI(title="Sampurna IT Support Chatbot (Enhanced)")
+
+def _warm_llm():
+    if get_genai_client() is None:
+        raise RuntimeError("missing GOOGLE_API_KEY / GEMINI_API_KEY")
+    get_pipeline()
+
+
+WARMUP_STEPS = {"embedder": _warm_embedder, "db_pool": _warm_db_pool, "llm": _warm_llm}
+# Failed components are retried by /ready at most this often (seconds)
+WARMUP_RETRY_EVERY = float(os.getenv("WARMUP_RETRY_EVERY", "10"))
+
+
+async def warm_up():
+    # Components warm in parallel; a failure is reported on /ready, never raised
+    await asyncio.gather(
+        *(asyncio.to_thread(readiness.run, name, fn) for name, fn in WARMUP_STEPS.items())
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print(f"🧵 Crew pool: {crew_executor.max_workers} workers, queue {crew_executor.max_queue}")
+    # asyncpg searches run on this loop, also when called from crew threads
+    retriever = get_retriever()
+    if isinstance(retriever, AsyncPgRetriever):
+        retriever.client.bind(asyncio.get_running_loop())
+    # WARMUP_ON_STARTUP=0 leaves everything cold until the first request or /ready
+    warmup_task = None
+    if os.getenv("WARMUP_ON_STARTUP", "1") != "0":
+        warmup_task = asyncio.create_task(warm_up())
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    crew_executor.shutdown()
+    vision_pool.shutdown(wait=False, cancel_futures=True)
+    if isinstance(retriever, AsyncPgRetriever):
+        await retriever.client.close()
+    close_pool()
+
+
+app = FastAPI(title="Sampurna IT Support Chatbot (Enhanced)", lifespan=lifespan)
 
 # --- CORS ---
 app.add_middleware(
@@ -21,8 +133,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "Server-Timing"],
 )
 
+# --- Tracing ---
+# TRACE_LOG=1 prints one JSON line per answered request (trace id + stage timings)
+TRACE_LOG = os.getenv("TRACE_LOG", "0") == "1"
+
+
+class TraceMiddleware:
+    """
+    Starts the request trace and deadline, adds X-Trace-Id to the response.
+    Pure ASGI on purpose: @app.middleware("http") (BaseHTTPMiddleware) wraps
+    receive, so /ask would never see the client's http.disconnect.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        # Honour an upstream id so logs can be joined across the proxy and the API
+        trace = start_trace(headers.get("x-trace-id") or headers.get("x-request-id"))
+        # Request deadline (X-Request-Timeout or REQUEST_DEADLINE), checked by every stage
+        try:
+            start_deadline(deadline_from_headers(headers))
+        except InvalidDeadline as e:
+            # Tell the client rather than quietly running on the default budget
+            response = JSONResponse(status_code=400, content={"answer": str(e)},
+                                    headers={"X-Trace-Id": trace.trace_id})
+            await response(scope, receive, send)
+            return
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Trace-Id"] = trace.trace_id
+            await send(message)
+
+        await self.app(scope, receive, send_with_trace)
+
+
+app.add_middleware(TraceMiddleware)
+
 # ---------------------------
 # Data Models
 # ---------------------------
@@ -39,60 +194,59 @@ GOOGLE_API_KEY = (os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY") or
 if not GOOGLE_API_KEY:
     print("⚠️ Missing GOOGLE_API_KEY / GEMINI_API_KEY in env")
 
-genai_client = genai.Client(api_key=GOOGLE_API_KEY) if GOOGLE_API_KEY else None
+genai_client = None
+_client_lock = threading.Lock()
 
 
-# ---------------------------
-# Helper: parse data-uri MIME
-# ---------------------------
-def _parse_data_uri(data_uri: str):
+def get_genai_client():
     """
-    Returns (mime_type, base64_payload)
+    Shared google-genai client (None without an API key), created on first use.
     """
-    if not data_uri:
-        return ("image/png", "")
-    if "," in data_uri and data_uri.startswith("data:"):
-        header, b64 = data_uri.split(",", 1)
-        # header like: data:image/png;base64
-        mime = header.split(";")[0].replace("data:", "").strip() or "image/png"
-        return (mime, b64)
-    # raw base64 fallback
-    return ("image/png", data_uri)
+    global genai_client
+    if genai_client is None and GOOGLE_API_KEY:
+        with _client_lock:
+            if genai_client is None:
+                # --- Modern Google Client ---
+                from google import genai
+
+                genai_client = genai.Client(api_key=GOOGLE_API_KEY)
+    return genai_client
+
+# Semantic answer cache (None when SEMANTIC_CACHE_ENABLED=0)
+answer_cache = answer_cache_from_env(embed_fn=embed_query, version_fn=corpus_version)
+faq_fast_path = fast_path_from_env()
 
 
 # ---------------------------
 # Vision Analysis (OCR + Visual)
 # ---------------------------
-def analyze_image(base64_string: str) -> str:
+vision = None
+# Vision runs next to retrieval, so it gets its own small pool
+vision_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("VISION_WORKERS", str(crew_executor.max_workers))),
+    thread_name_prefix="vision",
+)
+
+
+def get_vision():
+    global vision
+    if vision is None:
+        client = get_genai_client()
+        with _client_lock:
+            if vision is None:
+                vision = vision_from_env(client, GEMINI_MODEL)
+    return vision
+
+
+VISION_TIMEOUT = "Image analysis did not finish in time."
+
+
+def analyze_image(image: Union[str, ImageUpload]) -> str:
     try:
-        if not genai_client:
-            return "Vision unavailable: missing API key."
-
-        mime_type, b64_payload = _parse_data_uri(base64_string)
-        image_bytes = base64.b64decode(b64_payload)
-
-        text_prompt = """
-You are an advanced AI Vision System. Perform two distinct tasks:
-1) OCR EXTRACTION: Read visible text verbatim.
-2) VISUAL ANALYSIS: Describe the technical scene (e.g., 'error dialog', '404 page', 'login failed').
-
-Return format exactly:
-[OCR RAW TEXT]: ...
-[VISUAL CONTEXT]: ...
-""".strip()
-
-        response = genai_client.models.generate_content(
-            model="gemini-2.0-flash-lite-preview-02-05",
-            contents=[
-                types.Content(
-                    parts=[
-                        types.Part.from_text(text=text_prompt),
-                        types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
-                    ]
-                )
-            ],
-        )
-        return (response.text or "").strip() or "No image insights found."
+        with span("vision"):
+            return get_vision().analyze(image)
+    except DeadlineExceeded:
+        return VISION_TIMEOUT
     except Exception as e:
         print(f"Vision Error: {repr(e)}")
         return "Error analyzing image."
@@ -130,130 +284,513 @@ def normalize_query(q: str) -> str:
 # ---------------------------
 # Core Logic
 # ---------------------------
-def get_crew_response(user_question: str, history: List[str], image_data: str = None):
-    # Context Memory: last 5 chat messages
+def get_crew_response(user_question: str, history: List[str], image_data: Union[str, ImageUpload, None] = None,
+                      emit=None, documents=None):
+    """
+    image_data: data URI (/ask) or raw upload (/ask/upload).
+    emit(event, data), when given, receives stage/token events for /ask/stream.
+    documents: retrieval already awaited on the event loop (asyncpg backend).
+    Stage timings go to the request trace (Server-Timing) and /metrics.
+    Runs against the request deadline: out of time (or cancelled) before or
+    during the LLM stage -> snippets-only answer, mode 'degraded'.
+    """
+    deadline = current_deadline()
+    # Context Memory: last 5 chat messages, fitted to the context token budget
     recent_history = history[-5:] if history else []
-    context_str = "\n".join(recent_history) if recent_history else "No previous context."
+    context_str = get_context_builder().fit_history(recent_history)
 
-    # Image
+    # Normalize query for better retrieval + ambiguity fix
+    with span("normalize"):
+        normalized_question = normalize_query(user_question)
+
+    # Semantic cache + FAQ fast path: only for standalone text questions (no image, no history)
+    standalone = not image_data and not recent_history
+    use_cache = answer_cache is not None and standalone
+    if use_cache:
+        with span("cache"):
+            cached_answer, cache_version = answer_cache.lookup(normalized_question)
+        if cached_answer:
+            print("⚡ Semantic cache hit")
+            if emit is not None:
+                emit("stage", {"stage": "cache"})
+            return {
+                "answer": cached_answer,
+                "image_description": None,
+                "cached": True
+            }
+
+    pipeline = get_pipeline()
+
+    # Image: Gemini vision runs while the question is embedded + searched
     image_description = None
     image_context = ""
     if image_data:
         print("📸 Image detected! Running Analysis...")
-        image_description = analyze_image(image_data)
+        # Copy the context so the vision span lands on this request's trace
+        vision_future = vision_pool.submit(contextvars.copy_context().run, analyze_image, image_data)
+        if documents is None:
+            with span("retrieval"):
+                documents = pipeline.retrieve(normalized_question)
+        try:
+            # The vision call is bounded by its own budget; never wait past the request's
+            image_description = vision_future.result(timeout=deadline.remaining() if deadline else None)
+        except FutureTimeout:
+            vision_future.cancel()
+            image_description = VISION_TIMEOUT
         image_context = f"\n[IMAGE ANALYSIS REPORT]:\n{image_description}\n"
+        if emit is not None:
+            emit("stage", {"stage": "vision", "image_description": image_description})
+    elif faq_fast_path is not None and standalone and is_english(user_question):
+        # FAQ fast path: the top chunk clearly is the answer -> no LLM call.
+        # Its template is English and ignores the conversation (rule 4).
+        if documents is None:
+            with span("retrieval"):
+                documents = pipeline.retrieve(normalized_question)
+        with span("fast_path"):
+            fast_answer = faq_fast_path.answer(documents)
+        if fast_answer:
+            print("⚡ FAQ fast path")
+            if emit is not None:
+                emit("stage", {"stage": "retrieval", "documents": summarize_documents(documents)})
+                emit("token", {"text": fast_answer})
+            return {
+                "answer": fast_answer,
+                "image_description": None,
+                "cached": False,
+                "mode": "faq",
+                "usage": {}
+            }
+
+    if documents is None and pipeline.mode == "rag":
+        # Fetched before the LLM stage so a late request can still get the snippets.
+        # The crew agent runs its own search; its tool fills deadline.documents.
+        with span("retrieval"):
+            documents = pipeline.retrieve(normalized_question)
+    if deadline is not None and documents is not None:
+        deadline.documents = documents
+
+    if not llm_time_left():
+        if documents is None:
+            # No agent run to wait for: one search for the snippets
+            with span("retrieval"):
+                documents = pipeline.retrieve(normalized_question)
+        return _degraded(documents, image_description, emit)
+    try:
+        result = pipeline.answer(
+            user_question, normalized_question, context_str, image_context,
+            emit=emit, documents=documents
+        )
+    except Exception as e:
+        # Timeouts surface as DeadlineExceeded, httpx or genai errors: the deadline decides
+        if deadline is None or not (deadline.expired or deadline.cancelled):
+            raise
+        print(f"⏱️ LLM stage cut off by the deadline: {repr(e)}")
+        return _degraded(deadline.documents, image_description, emit)
+    answer = result["answer"]
 
-    # Normalize query for better retrieval + ambiguity fix
-    normalized_question = normalize_query(user_question)
+    if use_cache and answer:
+        answer_cache.store(normalized_question, answer, cache_version)
 
-    # LLM (CrewAI wrapper)
-    my_llm = LLM(
-        model="gemini/gemini-2.0-flash-lite-preview-02-05",
-        api_key=GOOGLE_API_KEY
-    )
+    return {
+        "answer": answer,
+        "image_description": image_description,
+        "cached": False,
+        "mode": pipeline.mode,
+        "usage": result.get("usage", {})
+    }
 
-    # ✅ Updated Agent: NO "can't access docs" lines, always answer using near match
-    support_agent = Agent(
-        role="Sampurna Senior IT Specialist",
-        goal="Provide fast, polite, detailed, policy-grounded IT support using internal documents.",
-        backstory = """
-You are Sampurna IT Support — friendly, precise, typo-tolerant, multilingual, and context-aware.
-
-CRITICAL BEHAVIOR RULES:
-1) You MUST use SearchITDocsTool for every query. Use the retrieved policy text as your source.
-2) NEVER say "I cannot access the IT documentation/database" or "technical difficulties" if the backend is running.
-   If retrieval returns nothing, DO THIS INSTEAD:
-   - Use near-match policy topics (asset loss, stolen device, laptop policy, penalties, ticket/TMS process)
-   - Provide the best policy-guided steps anyway.
-   - Phrase it as: "Based on the closest matching policy sections, here is what to do."
-3) DISAMBIGUATION (VERY IMPORTANT):
-   - "tab" / "ট্যাব" / "टैब" means "tablet device" (office TAB) unless the user explicitly says "browser tab" or "Chrome tab".
-   - "laptop lost" / "tablet lost" / "device lost" are asset-loss cases.
-4) LANGUAGE:
-   - Detect language (English/Hindi/Bengali).
-   - Internally search in English terms (translate if needed).
-   - Reply in the same language as the user.
-5) OUTPUT:
-   - Always give the answer (no blank replies).
-   - Prefer bullet points for steps and details.
-   - Include related/near matches when helpful.
-6) If policy lacks a numeric detail (amount/date), say: "The policy document does not mention this detail."
-""".strip(),
-        verbose=True,
-        allow_delegation=False,
-        llm=my_llm,
-        tools=[SearchITDocsTool()]
-    )
 
-    # Task prompt: focuses on retrieval + answering (no whining)
-    final_prompt = f"""
-CONTEXT (Last 5 Messages):
-{context_str}
-
-VISUAL CONTEXT:
-{image_context}
-
-USER QUESTION (original): "{user_question}"
-USER QUESTION (normalized for search): "{normalized_question}"
-
-YOUR MISSION:
-1) Search internal IT docs using SearchITDocsTool with the normalized question.
-2) If image is provided, combine OCR text + visual context with retrieved policy steps.
-3) Provide the best possible policy-aligned answer even if it is a near match.
-4) Output in bullets:
-   - Summary
-   - Steps to follow
-   - Required details/info (serial number, employee ID, location, time)
-   - Escalation/contact (only if present in docs)
-   - Penalties/charges (only if present in docs)
-   - Related policies (if any)
-""".strip()
-
-    answer_task = Task(
-        description=final_prompt,
-        expected_output="A policy-grounded, actionable IT support answer in bullet points.",
-        agent=support_agent
-    )
+def _degraded(documents, image_description, emit=None) -> dict:
+    if emit is not None:
+        emit("stage", {"stage": "degraded"})
+    return {
+        "answer": degraded_answer(documents),
+        "image_description": image_description,
+        "cached": False,
+        "mode": "degraded",
+        "usage": {}
+    }
+
+
+# ---------------------------
+# API Endpoints
+# ---------------------------
+EMPTY_ANSWER = "Please share a bit more detail (example: 'tablet device lost', 'vpn setup', 'laptop policy')."
+ERROR_ANSWER = "I couldn’t complete the policy lookup for that query. Try a clearer keyword like: 'tablet lost', 'asset loss policy', 'stolen laptop', 'vpn setup', or paste the exact error text."
+BUSY_ANSWER = "The IT assistant is busy right now. Please try again in a few seconds."
+
 
-    tech_crew = Crew(
-        agents=[support_agent],
-        tasks=[answer_task],
-        process=Process.sequential
+def _busy_response(e: PoolSaturated) -> JSONResponse:
+    # Shed load fast so the balancer can retry elsewhere
+    return JSONResponse(
+        status_code=503,
+        content={"answer": BUSY_ANSWER},
+        headers={"Retry-After": str(e.retry_after)},
     )
 
-    result = tech_crew.kickoff()
 
-    return {
-        "answer": (result.raw or "").strip(),
-        "image_description": image_description
-    }
+def _answer_source(result: dict) -> str:
+    # Response tag: where the answer came from
+    if result.get("cached"):
+        return "cache"
+    if result.get("mode") == "faq":
+        return "fast_path"
+    if result.get("mode") == "degraded":
+        return "degraded"
+    return "llm"
+
+
+def _outcome(result: dict, leader: bool = True) -> str:
+    if not leader:
+        return "coalesced"
+    return {"cache": "cached", "fast_path": "fast_path", "degraded": "degraded"}.get(_answer_source(result), "ok")
+
+
+def _finish_request(endpoint: str, outcome: str):
+    """
+    Counts the request, records its total time and returns the trace.
+    """
+    REQUESTS.labels(endpoint=endpoint, outcome=outcome).inc()
+    trace = current_trace()
+    if trace is None:
+        return None
+    record_stage("total", trace.elapsed_ms / 1000)
+    REQUEST_SECONDS.labels(endpoint=endpoint, outcome=outcome).observe(trace.elapsed_ms / 1000)
+    raw = sum(v for k, v in trace.counters.items() if k.endswith("_tokens_raw"))
+    sent = sum(v for k, v in trace.counters.items() if k.endswith("_tokens_sent"))
+    if raw:
+        print(f"✂️ Context ~{sent} tokens (raw ~{raw}, saved ~{raw - sent})")
+    if TRACE_LOG:
+        print(json.dumps({
+            "trace_id": trace.trace_id,
+            "endpoint": endpoint,
+            "outcome": outcome,
+            "stages_ms": {k: round(v, 1) for k, v in trace.timer.stages.items()},
+            "counters": trace.counters,
+        }))
+    return trace
 
 
 # ---------------------------
-# API Endpoints
+# Request coalescing (single-flight)
+# ---------------------------
+# Identical questions arriving together (e.g. during an outage) share one run.
+# SINGLEFLIGHT_ENABLED=0 gives every request its own run.
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "1") != "0"
+ask_flights = SingleFlight("ask")
+stream_flights = SingleFlight("ask_stream")
+
+
+def _flight_key(question: str, history: List[str], image_data: Union[str, ImageUpload, None]):
+    """
+    Same normalized question + same recent history + same image -> same answer.
+    """
+    if not SINGLEFLIGHT_ENABLED:
+        return object()  # never equal to another key
+    h = hashlib.sha256(canonicalize_query(normalize_query(question)).encode("utf-8"))
+    for turn in (history or [])[-5:]:
+        h.update(b"\x00" + (turn or "").encode("utf-8"))
+    if isinstance(image_data, ImageUpload):
+        h.update(b"\x02" + image_fingerprint(image_data.data).encode("ascii"))
+    elif image_data:
+        h.update(b"\x01" + image_data.encode("utf-8"))
+    return h.hexdigest()
+
+
 # ---------------------------
+# Deadlines + cancellation
+# ---------------------------
+# DEADLINE_GRACE  -> seconds past the deadline before the API stops waiting for the
+#                    run and answers from its snippets (default 1)
+# DISCONNECT_POLL -> seconds between client-disconnect checks for /ask (default 0.5)
+DEADLINE_GRACE = float(os.getenv("DEADLINE_GRACE", "1"))
+DISCONNECT_POLL = float(os.getenv("DISCONNECT_POLL", "0.5"))
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+def _loop_retrieval(question: str, history: List[str], image_data, streaming: bool):
+    """
+    asyncpg backend: the retrieval a run does before the LLM (rag prompt, FAQ
+    fast path, image requests, stream preview) as a coroutine for the event
+    loop, so the search holds no crew worker. None when the run should search
+    by itself (other backends, crew /ask without the FAQ fast path, where the
+    agent's tool does the only search).
+    """
+    if not isinstance(get_retriever(), AsyncPgRetriever):
+        return None
+    fast_path = faq_fast_path is not None and not history and is_english(question)
+    if not (PIPELINE_MODE == "rag" or fast_path or image_data or streaming):
+        return None
+    normalized_question = normalize_query(question)
+
+    async def retrieve():
+        try:
+            with span("retrieval"):
+                return await asearch_documents(normalized_question, k=4)
+        except Exception as e:
+            # Same fallback as the pipelines' retrieve(): the LLM still answers
+            print("DB search error:", repr(e))
+            return []
+
+    return retrieve
+
+
+def _submit_run(flight, fn, question, history, image_data, emit=None):
+    """
+    Starts the leader's run: fn(question, history, image_data, emit, documents).
+    The flight carries the leader's deadline; when the run is dropped (every
+    waiter gone) the deadline is cancelled, so a run already on a worker stops
+    at its next stage instead of calling Gemini.
+    """
+    deadline = current_deadline()
+    retrieve = _loop_retrieval(question, history, image_data, streaming=emit is not None)
+    if retrieve is None:
+        job = crew_executor.submit(fn, question, history, image_data, emit, None)
+    else:
+        job = crew_executor.submit_after(retrieve, fn, question, history, image_data, emit)
+    if deadline is not None:
+        flight.deadline = deadline
+        job.add_done_callback(lambda f: deadline.cancel() if f.cancelled() else None)
+    return job
+
+
+def _past_deadline(deadline) -> bool:
+    return deadline is not None and time.monotonic() >= deadline.expires + DEADLINE_GRACE
+
+
+def _late_answer(flight) -> dict:
+    # The run overshot (e.g. a crew agent mid-call): answer from what it retrieved
+    run_deadline = flight.deadline
+    return _degraded(run_deadline.documents if run_deadline is not None else None, None)
+
+
+async def _wait_answer(http_request: Request, flight):
+    """
+    Result of the shared run, a late (degraded) answer once this request's
+    deadline has passed, or ClientDisconnected. Leaving the flight cancels
+    the run when nobody else waits on it.
+    """
+    deadline = current_deadline()
+    waiter = asyncio.ensure_future(ask_flights.wait(flight))
+    try:
+        while True:
+            done, _ = await asyncio.wait({waiter}, timeout=DISCONNECT_POLL)
+            if done:
+                return waiter.result()
+            if await http_request.is_disconnected():
+                raise ClientDisconnected()
+            if _past_deadline(deadline):
+                print("⏱️ Deadline passed, answering from the retrieved snippets")
+                return _late_answer(flight)
+    finally:
+        if not waiter.done():
+            waiter.cancel()
+
+
 @app.post("/ask")
-async def ask_question(request: QueryRequest):
+async def ask_question(request: QueryRequest, response: Response, http_request: Request):
+    return await _answer(http_request, request.question, request.chat_history or [], request.image_data, response)
+
+
+async def _answer(http_request: Request, question: str, history: List[str], image_data, response: Response):
     try:
-        result_dict = get_crew_response(
-            request.question,
-            request.chat_history or [],
-            request.image_data
+        # Crew run is fully synchronous -> bounded pool, never inline on the loop
+        flight, leader = ask_flights.join(
+            _flight_key(question, history, image_data),
+            lambda flight: _submit_run(flight, get_crew_response, question, history, image_data),
         )
+        result_dict = await _wait_answer(http_request, flight)
 
         answer = (result_dict.get("answer") or "").strip()
         if not answer:
             # No empty responses
-            answer = "Please share a bit more detail (example: 'tablet device lost', 'vpn setup', 'laptop policy')."
+            answer = EMPTY_ANSWER
+
+        trace = _finish_request("ask", _outcome(result_dict, leader))
+        if trace is not None:
+            response.headers["Server-Timing"] = trace.timer.header()
+        return {"answer": answer, "source": _answer_source(result_dict)}
+
+    except PoolSaturated as e:
+        _finish_request("ask", "busy")
+        return _busy_response(e)
 
-        return {"answer": answer}
+    except ClientDisconnected:
+        # Nobody to answer: the run was dropped with this waiter
+        _finish_request("ask", "disconnected")
+        return Response(status_code=499)
 
     except Exception as e:
         # IMPORTANT: Don't return DB/technical apology templates.
         print(f"Ask Error: {repr(e)}")
-        return {
-            "answer": "I couldn’t complete the policy lookup for that query. Try a clearer keyword like: 'tablet lost', 'asset loss policy', 'stolen laptop', 'vpn setup', or paste the exact error text."
-        }
+        _finish_request("ask", "error")
+        return {"answer": ERROR_ANSWER}
+
+
+# ---------------------------
+# Streaming (Server-Sent Events)
+# ---------------------------
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _stream_job(question: str, history: List[str], image_data, emit, documents=None):
+    """
+    Runs on the crew pool. Always finishes with 'done' or 'error', then None.
+    """
+    try:
+        result = get_crew_response(question, history, image_data, emit=emit, documents=documents)
+        emit("done", {
+            "answer": (result.get("answer") or "").strip() or EMPTY_ANSWER,
+            "cached": result.get("cached", False),
+            "mode": result.get("mode"),
+            "source": _answer_source(result),
+        })
+    except Exception as e:
+        print(f"Ask Stream Error: {repr(e)}")
+        emit("error", {"answer": ERROR_ANSWER})
+    finally:
+        emit(None, None)
+
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: QueryRequest):
+    """
+    Same input as /ask. Emits, in order:
+      stage  {"stage": "vision", ...}      (image requests)
+      stage  {"stage": "retrieval", "documents": [{id, similarity, preview}]}
+      token  {"text": "..."}              (answer chunks as they arrive)
+      done   {"answer": "...", ...}       or  error {"answer": "..."}
+    A coalesced request replays the shared run's events from the start.
+    """
+    return _answer_stream(request.question, request.chat_history or [], request.image_data)
+
+
+def _answer_stream(question: str, history: List[str], image_data):
+    loop = asyncio.get_running_loop()
+
+    def start(flight):
+        def emit(event, data):
+            loop.call_soon_threadsafe(flight.publish, event, data)
+
+        return _submit_run(flight, _stream_job, question, history, image_data, emit)
+
+    try:
+        flight, leader = stream_flights.join(_flight_key(question, history, image_data), start)
+    except PoolSaturated as e:
+        _finish_request("ask_stream", "busy")
+        return _busy_response(e)
+    events = flight.subscribe()
+    deadline = current_deadline()
+
+    async def event_stream():
+        outcome = "disconnected"
+        try:
+            yield _sse("stage", {"stage": "accepted", "coalesced": not leader})
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(events.get(), timeout=DISCONNECT_POLL)
+                except asyncio.TimeoutError:
+                    if not _past_deadline(deadline):
+                        continue
+                    print("⏱️ Deadline passed, streaming the retrieved snippets")
+                    outcome = "degraded"
+                    late = _late_answer(flight)
+                    yield _sse("done", {"answer": late["answer"], "cached": False, "mode": "degraded", "source": "degraded"})
+                    break
+                if event is None:
+                    break
+                if event == "done":
+                    outcome = _outcome(data, leader)
+                elif event == "error":
+                    outcome = "error"
+                yield _sse(event, data)
+        finally:
+            # Client went away: the run is dropped (if not started) once nobody waits on it
+            flight.unsubscribe(events)
+            stream_flights.leave(flight)
+            _finish_request("ask_stream", outcome)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------------------------
+# Multipart upload (raw image bytes instead of base64 in JSON)
+# ---------------------------
+# UPLOAD_MAX_BYTES -> max request body for /ask/upload (default 10 MB)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+TOO_LARGE_ANSWER = "That screenshot is too large. Please send an image under {mb:.0f} MB."
+BAD_UPLOAD_ANSWER = "Please attach a PNG or JPG screenshot."
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+async def _read_form(request: Request, limit: int):
+    """
+    Parses the multipart body, counting bytes as they arrive: an oversized
+    upload is cut off at the limit instead of being read (and spooled) whole.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise UploadTooLarge()
+
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > limit:
+                raise UploadTooLarge()
+        return message
+
+    return await Request(request.scope, receive).form(max_files=1, max_fields=8)
+
+
+@app.post("/ask/upload")
+async def ask_upload(request: Request, response: Response):
+    """
+    multipart/form-data:
+      question      text (required)
+      chat_history  JSON list of strings (optional)
+      image         file (optional, image/*)
+      stream        "1" -> same SSE events as /ask/stream, else the /ask JSON
+    """
+    try:
+        form = await _read_form(request, UPLOAD_MAX_BYTES)
+    except UploadTooLarge:
+        return JSONResponse(status_code=413, content={"answer": TOO_LARGE_ANSWER.format(mb=UPLOAD_MAX_BYTES / 2**20)})
+
+    question = str(form.get("question") or "")
+    try:
+        history = json.loads(form.get("chat_history") or "[]")
+    except ValueError:
+        history = []
+    history = [str(h) for h in history] if isinstance(history, list) else []
+
+    image = None
+    upload = form.get("image")
+    if upload is not None and not isinstance(upload, str):
+        if not (upload.content_type or "").startswith("image/"):
+            return JSONResponse(status_code=415, content={"answer": BAD_UPLOAD_ANSWER})
+        data = await upload.read()
+        if data:
+            image = ImageUpload(data, upload.content_type)
+    await form.close()
+
+    if form.get("stream") == "1":
+        return _answer_stream(question, history, image)
+    return await _answer(request, question, history, image, response)
 
 
 @app.get("/")
@@ -264,3 +801,36 @@ def read_root():
 @app.get("/health")
 def health():
     return {"ok": True}
+
+
+@app.get("/ready")
+def ready():
+    """
+    200 once the embedder, DB pool and LLM client are warm, 503 before that.
+    """
+    # Warm what is still cold (no startup warm-up) and retry failures, e.g. the
+    # DB came up after the API, instead of staying unready forever
+    for name in readiness.pending(older_than=WARMUP_RETRY_EVERY):
+        readiness.run(name, WARMUP_STEPS[name])
+    components = readiness.snapshot()
+    is_ready = readiness.ready()
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "components": components},
+    )
+
+
+@app.get("/metrics")
+def metrics():
+    payload, content_type = metrics_payload()
+    return Response(content=payload, media_type=content_type)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "answers": answer_cache.stats() if answer_cache is not None else None,
+        "embedding_batches": embeddings.batcher_stats(),
+        "singleflight": {"ask": ask_flights.stats(), "ask_stream": stream_flights.stats()},
+    }
@@ -0,0 +1,122 @@
+import contextvars
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from backend.timing import StageTimer
+
+# ---------------------------
+# Prometheus metrics (GET /metrics)
+# ---------------------------
+# Stages: queue, normalize, cache, embed, search, retrieval, fast_path, vision, vision_llm, llm, agent, total
+STAGE_SECONDS = Histogram(
+    "chatbot_stage_seconds",
+    "Time spent per pipeline stage",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80),
+)
+REQUESTS = Counter("chatbot_requests_total", "Answered requests", ["endpoint", "outcome"])
+# Outcomes: ok, cached, fast_path, degraded, coalesced, busy, error, disconnected
+REQUEST_SECONDS = Histogram(
+    "chatbot_request_seconds",
+    "End-to-end request time by outcome",
+    ["endpoint", "outcome"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80),
+)
+FAST_PATH = Counter("chatbot_fast_path_total", "FAQ fast path checks", ["result"])
+LLM_TOKENS = Counter("chatbot_llm_tokens_total", "Gemini tokens", ["source", "kind"])
+LLM_CALLS = Counter("chatbot_llm_calls_total", "Gemini calls", ["source"])
+CONTEXT_TOKENS = Counter(
+    "chatbot_context_tokens_total", "Estimated prompt context tokens before/after budgeting", ["part", "kind"]
+)
+SINGLEFLIGHT = Counter(
+    "chatbot_singleflight_total", "Requests that started (leader) or joined (follower) a computation", ["name", "role"]
+)
+CREW_IN_FLIGHT = Gauge("chatbot_crew_in_flight", "Requests running or queued on the crew pool")
+
+
+# ---------------------------
+# Per-request trace
+# ---------------------------
+class Trace:
+    """
+    One request: an id (X-Trace-Id), its stage timings and counters.
+    Lives in a contextvar; executors copy the context into worker threads,
+    so spans recorded there land on the same trace.
+    """
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.timer = StageTimer()
+        self.counters = {}
+        self.started = time.perf_counter()
+
+    def count(self, name: str, n: int) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+_TRACE_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+def start_trace(trace_id: Optional[str] = None) -> Trace:
+    # Reuse a caller-supplied id (e.g. from the proxy) when it looks sane
+    if trace_id and not _TRACE_ID.match(trace_id):
+        trace_id = None
+    trace = Trace(trace_id)
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage=name).observe(seconds)
+    trace = _current.get()
+    if trace is not None:
+        trace.timer.add(name, seconds * 1000)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Times the block into chatbot_stage_seconds{stage=name} and the current trace.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_usage(source: str, usage: dict) -> None:
+    """
+    usage: {prompt_tokens, completion_tokens, total_tokens, llm_calls}
+    """
+    if not usage:
+        return
+    LLM_CALLS.labels(source=source).inc(usage.get("llm_calls", 0))
+    LLM_TOKENS.labels(source=source, kind="prompt").inc(usage.get("prompt_tokens", 0))
+    LLM_TOKENS.labels(source=source, kind="completion").inc(usage.get("completion_tokens", 0))
+
+
+def usage_from_metadata(meta) -> dict:
+    # google-genai usage_metadata -> the usage dict used everywhere else
+    return {
+        "prompt_tokens": (meta.prompt_token_count or 0) if meta else 0,
+        "completion_tokens": (meta.candidates_token_count or 0) if meta else 0,
+        "total_tokens": (meta.total_token_count or 0) if meta else 0,
+        "llm_calls": 1,
+    }
+
+
+def metrics_payload():
+    return generate_latest(), CONTENT_TYPE_LATEST
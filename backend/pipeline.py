@@ -0,0 +1,430 @@
+import contextvars
+import threading
+from backend.context_builder import get_context_builder
+from backend.deadline import STAGE_BUDGETS, DeadlineExceeded, check_deadline, current_deadline, genai_config, stage_timeout
+from backend.metrics import record_stage, record_usage, span, usage_from_metadata
+from backend.retrieval import format_documents, search_documents
+
+
+GEMINI_MODEL = "gemini-2.0-flash-lite-preview-02-05"
+LLM_MODEL = f"gemini/{GEMINI_MODEL}"
+
+# Rules 2-6 are shared by the agent backstory and the single-call system prompt
+_BEHAVIOR_RULES = """
+2) NEVER say "I cannot access the IT documentation/database" or "technical difficulties" if the backend is running.
+   If retrieval returns nothing, DO THIS INSTEAD:
+   - Use near-match policy topics (asset loss, stolen device, laptop policy, penalties, ticket/TMS process)
+   - Provide the best policy-guided steps anyway.
+   - Phrase it as: "Based on the closest matching policy sections, here is what to do."
+3) DISAMBIGUATION (VERY IMPORTANT):
+   - "tab" / "ট্যাব" / "टैब" means "tablet device" (office TAB) unless the user explicitly says "browser tab" or "Chrome tab".
+   - "laptop lost" / "tablet lost" / "device lost" are asset-loss cases.
+4) LANGUAGE:
+   - Detect language (English/Hindi/Bengali).
+   - Internally search in English terms (translate if needed).
+   - Reply in the same language as the user.
+5) OUTPUT:
+   - Always give the answer (no blank replies).
+   - Prefer bullet points for steps and details.
+   - Include related/near matches when helpful.
+6) If policy lacks a numeric detail (amount/date), say: "The policy document does not mention this detail."
+""".strip()
+
+# ✅ Updated Agent: NO "can't access docs" lines, always answer using near match
+AGENT_BACKSTORY = f"""
+You are Sampurna IT Support — friendly, precise, typo-tolerant, multilingual, and context-aware.
+
+CRITICAL BEHAVIOR RULES:
+1) You MUST use SearchITDocsTool for every query. Use the retrieved policy text as your source.
+{_BEHAVIOR_RULES}
+""".strip()
+
+# Same persona for the retrieve-then-generate path (documents are already in the prompt)
+RAG_SYSTEM_PROMPT = f"""
+You are Sampurna IT Support — friendly, precise, typo-tolerant, multilingual, and context-aware.
+
+CRITICAL BEHAVIOR RULES:
+1) Use the RETRIEVED POLICY DOCUMENTS in the prompt as your source.
+{_BEHAVIOR_RULES}
+""".strip()
+
+
+def build_task_prompt(user_question: str, normalized_question: str, context_str: str, image_context: str) -> str:
+    # Task prompt: focuses on retrieval + answering (no whining)
+    return f"""
+CONTEXT (Last 5 Messages):
+{context_str}
+
+VISUAL CONTEXT:
+{image_context}
+
+USER QUESTION (original): "{user_question}"
+USER QUESTION (normalized for search): "{normalized_question}"
+
+YOUR MISSION:
+1) Search internal IT docs using SearchITDocsTool with the normalized question.
+2) If image is provided, combine OCR text + visual context with retrieved policy steps.
+3) Provide the best possible policy-aligned answer even if it is a near match.
+4) Output in bullets:
+   - Summary
+   - Steps to follow
+   - Required details/info (serial number, employee ID, location, time)
+   - Escalation/contact (only if present in docs)
+   - Penalties/charges (only if present in docs)
+   - Related policies (if any)
+""".strip()
+
+
+def build_rag_prompt(user_question: str, context_str: str, image_context: str, documents) -> str:
+    return f"""
+CONTEXT (Last 5 Messages):
+{context_str}
+
+VISUAL CONTEXT:
+{image_context}
+
+RETRIEVED POLICY DOCUMENTS:
+{format_documents(documents)}
+
+USER QUESTION: "{user_question}"
+
+YOUR MISSION:
+1) Answer from the retrieved policy documents above.
+2) If image is provided, combine OCR text + visual context with retrieved policy steps.
+3) Provide the best possible policy-aligned answer even if it is a near match.
+4) Output in bullets:
+   - Summary
+   - Steps to follow
+   - Required details/info (serial number, employee ID, location, time)
+   - Escalation/contact (only if present in docs)
+   - Penalties/charges (only if present in docs)
+   - Related policies (if any)
+""".strip()
+
+
+def summarize_documents(documents) -> list:
+    """
+    Small per-document payload for the streaming 'retrieval' stage event.
+    """
+    return [
+        {
+            "id": d.get("id"),
+            "similarity": round(float(d["similarity"]), 4),
+            "preview": (d.get("content") or "")[:120],
+        }
+        for d in documents
+    ]
+
+
+# ---------------------------
+# Crew LLM call timing + streaming
+# ---------------------------
+# Each LLM call the agent makes (tool-call turns included) is timed from
+# CrewAI's started/completed events. Handlers run with the caller's context,
+# so the call lands on the request trace.
+# The agent's LLM streams: text chunks go to the emit of the run that made
+# the call (set by CrewPipeline.answer when the request is /ask/stream).
+_stream_emit: contextvars.ContextVar = contextvars.ContextVar("crew_stream_emit", default=None)
+_llm_started = {}
+_llm_events_lock = threading.Lock()
+_llm_events_registered = False
+
+
+def _bound_llm_calls(llm, seconds: float) -> None:
+    """
+    Caps the next Gemini calls of this LLM at seconds. LiteLLM-backed LLMs
+    read .timeout per call; crewAI's native Gemini LLM reads the HttpOptions
+    of its genai client per request.
+    """
+    if "timeout" in getattr(type(llm), "model_fields", {}):
+        llm.timeout = seconds
+    api_client = getattr(getattr(llm, "_client", None), "_api_client", None)
+    if api_client is not None:
+        api_client._http_options.timeout = max(1, int(seconds * 1000))
+
+
+def _before_llm_call(context):
+    # Every agent turn, tool-call turns included: returning False blocks the
+    # call once the request is cancelled or out of time, and the run raises
+    try:
+        seconds = stage_timeout("llm")
+    except DeadlineExceeded:
+        return False
+    if seconds is not None and context.llm is not None:
+        _bound_llm_calls(context.llm, seconds)
+    return None
+
+
+def _check_step(step) -> None:
+    # Between ReAct turns; a final answer that made it is kept
+    from crewai.agents.parser import AgentFinish
+
+    if not isinstance(step, AgentFinish):
+        check_deadline("llm")
+
+
+def _register_llm_events() -> None:
+    global _llm_events_registered
+    with _llm_events_lock:
+        if _llm_events_registered:
+            return
+        from crewai.events import crewai_event_bus
+        from crewai.events.types.llm_events import (
+            LLMCallCompletedEvent,
+            LLMCallFailedEvent,
+            LLMCallStartedEvent,
+            LLMStreamChunkEvent,
+        )
+
+        @crewai_event_bus.on(LLMCallStartedEvent)
+        def _on_llm_started(source, event):
+            with _llm_events_lock:
+                _llm_started[event.call_id] = event.timestamp
+
+        @crewai_event_bus.on(LLMCallCompletedEvent)
+        @crewai_event_bus.on(LLMCallFailedEvent)
+        def _on_llm_finished(source, event):
+            with _llm_events_lock:
+                started = _llm_started.pop(event.call_id, None)
+            if started is not None:
+                record_stage("llm", (event.timestamp - started).total_seconds())
+
+        @crewai_event_bus.on(LLMStreamChunkEvent)
+        def _on_llm_chunk(source, event):
+            emit = _stream_emit.get()
+            # Tool-call turns stream the call, not answer text
+            if emit is not None and event.chunk and getattr(event, "tool_call", None) is None:
+                emit("token", {"text": event.chunk})
+
+        try:
+            from crewai.hooks import register_before_llm_call_hook
+        except ImportError:
+            # Older crewAI: only the step callback checks between turns
+            register_before_llm_call_hook = None
+        if register_before_llm_call_hook is not None:
+            register_before_llm_call_hook(_before_llm_call)
+
+        _llm_events_registered = True
+
+
+class CrewPipeline:
+    """
+    Long-lived Crew setup shared by all requests.
+    - search tool is built once per process
+    - LLM + Agent are built once per worker thread (CrewAI agents keep per-run
+      executor state, and a per-thread LLM keeps token counters per request)
+    - Only the Task is built per request
+    """
+
+    mode = "crew"
+
+    def __init__(self, api_key: str, model: str = LLM_MODEL, verbose: bool = True):
+        # Deferred: crewai is a heavy import, only crew mode needs it
+        from backend.db_tool import SearchITDocsTool
+
+        self.api_key = api_key
+        self.model = model
+        self.search_tool = SearchITDocsTool()
+        self.verbose = verbose
+        self._local = threading.local()
+        _register_llm_events()
+
+    def _build_agent(self):
+        from crewai import Agent, LLM
+
+        return Agent(
+            role="Sampurna Senior IT Specialist",
+            goal="Provide fast, polite, detailed, policy-grounded IT support using internal documents.",
+            backstory=AGENT_BACKSTORY,
+            verbose=self.verbose,
+            allow_delegation=False,
+            llm=LLM(model=self.model, api_key=self.api_key, stream=True, timeout=STAGE_BUDGETS["llm"]),
+            tools=[self.search_tool],
+            step_callback=_check_step
+        )
+
+    @property
+    def agent(self):
+        agent = getattr(self._local, "agent", None)
+        if agent is None:
+            agent = self._build_agent()
+            self._local.agent = agent
+        return agent
+
+    @staticmethod
+    def _usage_snapshot(agent) -> dict:
+        llm = agent.llm
+        if not hasattr(llm, "get_token_usage_summary"):
+            return {}
+        summary = llm.get_token_usage_summary()
+        return {
+            "prompt_tokens": summary.prompt_tokens,
+            "completion_tokens": summary.completion_tokens,
+            "total_tokens": summary.total_tokens,
+            "llm_calls": summary.successful_requests,
+        }
+
+    def run(self, prompt: str) -> dict:
+        """
+        Bounded by the request deadline:
+        - each Gemini call times out with what is left of the LLM budget
+        - before every LLM turn (crewAI LLM call hook) and after every ReAct
+          step (step_callback), a cancelled or expired request stops the run
+        """
+        from crewai import Task
+
+        seconds = stage_timeout("llm")
+        agent = self.agent
+        if seconds is not None:
+            _bound_llm_calls(agent.llm, seconds)
+        before = self._usage_snapshot(agent)
+        answer_task = Task(
+            description=prompt,
+            expected_output="A policy-grounded, actionable IT support answer in bullet points.",
+            agent=agent
+        )
+        result = answer_task.execute_sync(agent=agent)
+        after = self._usage_snapshot(agent)
+        return {
+            "answer": (result.raw or "").strip(),
+            "usage": {k: after[k] - before.get(k, 0) for k in after},
+        }
+
+    def retrieve(self, normalized_question: str) -> list:
+        """
+        Same search the agent is told to run. Used for the streaming preview
+        and, while vision runs, to warm the embedding cache for the tool call.
+        """
+        try:
+            return search_documents(normalized_question, k=4)
+        except Exception as e:
+            print("DB search error:", repr(e))
+            return []
+
+    def answer(self, user_question: str, normalized_question: str, context_str: str, image_context: str,
+               emit=None, documents=None) -> dict:
+        """
+        emit(event, data) gets stage events when streaming. The agent's own
+        tool calls are not observable, so retrieval is previewed with the same
+        normalized query (which also warms the embedding cache for the tool).
+        Answer text is streamed as token events while the agent's final LLM
+        turn generates it; 'done' carries the agent's final answer.
+        """
+        if emit is not None:
+            if documents is None:
+                with span("retrieval"):
+                    documents = self.retrieve(normalized_question)
+                deadline = current_deadline()
+                if deadline is not None:
+                    deadline.documents = documents
+            emit("stage", {"stage": "retrieval", "documents": summarize_documents(documents)})
+
+        prompt = build_task_prompt(user_question, normalized_question, context_str, image_context)
+        streamed = []
+
+        def forward(event, data):
+            streamed.append(data)
+            emit(event, data)
+
+        stream_token = _stream_emit.set(forward if emit is not None else None)
+        try:
+            # agent = every LLM call + tool search; each call is also timed as 'llm'
+            with span("agent"):
+                result = self.run(prompt)
+        finally:
+            _stream_emit.reset(stream_token)
+        record_usage("crew", result["usage"])
+
+        # Nothing streamed (e.g. a provider without chunk events): one token event
+        if emit is not None and result["answer"] and not streamed:
+            emit("token", {"text": result["answer"]})
+        return result
+
+
+class RagPipeline:
+    """
+    Deterministic retrieve-then-generate: one search on the normalized
+    question, top-k chunks pasted into the prompt, one Gemini call.
+    No agent/tool loop, so no extra round trip to decide on the tool.
+    """
+
+    mode = "rag"
+
+    def __init__(self, client, model: str = GEMINI_MODEL, top_k: int = 4):
+        from google.genai import types
+
+        self.client = client
+        self.model = model
+        self.top_k = top_k
+        self.config = types.GenerateContentConfig(system_instruction=RAG_SYSTEM_PROMPT)
+
+    def retrieve(self, normalized_question: str) -> list:
+        try:
+            return search_documents(normalized_question, k=self.top_k)
+        except Exception as e:
+            # Same policy as the tool: answer from near-match guidance, don't leak DB errors
+            print("DB search error:", repr(e))
+            return []
+
+    def generate(self, prompt: str) -> dict:
+        if self.client is None:
+            raise RuntimeError("Gemini client unavailable: missing API key.")
+        response = self.client.models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config=genai_config(self.config),
+        )
+        return {
+            "answer": (response.text or "").strip(),
+            "usage": usage_from_metadata(response.usage_metadata),
+        }
+
+    def generate_stream(self, prompt: str, emit) -> dict:
+        """
+        Same call as generate(), but each text chunk is emitted as a 'token'
+        event as soon as Gemini sends it. Stops reading (and closes the
+        stream) once the request is cancelled or out of time.
+        """
+        if self.client is None:
+            raise RuntimeError("Gemini client unavailable: missing API key.")
+        parts = []
+        meta = None
+        for chunk in self.client.models.generate_content_stream(
+            model=self.model,
+            contents=prompt,
+            config=genai_config(self.config),
+        ):
+            check_deadline("llm")
+            text = chunk.text or ""
+            if text:
+                parts.append(text)
+                emit("token", {"text": text})
+            meta = chunk.usage_metadata or meta
+        return {
+            "answer": "".join(parts).strip(),
+            "usage": usage_from_metadata(meta),
+        }
+
+    def answer(self, user_question: str, normalized_question: str, context_str: str, image_context: str,
+               emit=None, documents=None) -> dict:
+        """
+        documents: results already fetched (e.g. while vision was running).
+        """
+        if documents is None:
+            with span("retrieval"):
+                documents = self.retrieve(normalized_question)
+        # Floor, dedupe and clip the chunks to what the history left of the budget
+        documents = get_context_builder().fit_documents(documents, normalized_question, context_str)
+        prompt = build_rag_prompt(user_question, context_str, image_context, documents)
+
+        if emit is None:
+            with span("llm"):
+                result = self.generate(prompt)
+        else:
+            emit("stage", {"stage": "retrieval", "documents": summarize_documents(documents)})
+            with span("llm"):
+                result = self.generate_stream(prompt, emit)
+        record_usage("rag", result["usage"])
+
+        result["documents"] = documents
+        return result
@@ -0,0 +1,51 @@
+import gc
+import os
+import sys
+import time
+
+
+# ---------------------------
+# Multi-worker preload (gunicorn.conf.py)
+# ---------------------------
+# The master loads what every worker needs read-only, then forks; workers
+# share those pages copy-on-write instead of each holding its own copy.
+# Nothing here may start a thread, open a socket or a DB connection: none
+# of those survive a fork.
+def preload() -> None:
+    """
+    Runs in the master before the workers are forked.
+    - embedding model weights (torch backends; ONNX Runtime sessions own
+      thread pools that don't survive a fork, so those load per worker)
+    - crewai / google-genai modules (PRELOAD_LLM_STACK=0 skips)
+    - gc.freeze() so the collector never touches (and copies) these objects
+    """
+    start = time.perf_counter()
+    backend = os.getenv("EMBEDDING_BACKEND", "torch").strip().lower()
+    if backend.startswith("onnx"):
+        print(f"⚠️ EMBEDDING_BACKEND={backend}: model loads per worker (not fork-safe)")
+    else:
+        from backend import embeddings
+        embeddings.get_embedding_model()  # weights only, no encode before fork
+
+    if os.getenv("PRELOAD_LLM_STACK", "1") != "0":
+        import crewai  # noqa: F401
+        from google import genai  # noqa: F401
+
+    gc.collect()
+    gc.freeze()
+    print(f"🧊 Preloaded shared state in {time.perf_counter() - start:.1f}s (pid {os.getpid()})")
+
+
+def after_fork(workers: int) -> None:
+    """
+    Runs in each worker right after the fork.
+    - torch intra-op threads split across workers instead of every worker
+      using every core (TORCH_THREADS_PER_WORKER overrides)
+    """
+    threads = int(os.getenv("TORCH_THREADS_PER_WORKER", "0")) or max(1, (os.cpu_count() or 1) // max(1, workers))
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+    else:
+        # torch not imported yet: picked up when it initialises
+        os.environ.setdefault("OMP_NUM_THREADS", str(threads))
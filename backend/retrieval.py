@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+import threading
+from typing import List, Optional
+from backend.deadline import stage_timeout
+from backend.db_pool import MATCH_STATEMENT, VECTOR_EF_SEARCH, VECTOR_PROBES, get_pool
+from backend.embeddings import embed_query
+from backend.metrics import span
+from backend.vector_index import VectorIndex
+
+
+# ---------------------------
+# Retrieval backends
+# ---------------------------
+# Every backend returns rows as dicts: {id, content, metadata, similarity}, best first.
+# timeout: seconds the query may run (request deadline), None = unbounded.
+class PostgresRetriever:
+    """
+    match_it_documents through the pooled, prepared statement.
+    """
+
+    name = "postgres"
+
+    def search(self, query_vector, k: int = 4, filter: Optional[dict] = None,
+               timeout: Optional[float] = None) -> List[dict]:
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                if timeout is not None:
+                    # Transaction-scoped: the pool commits after the block, resetting it
+                    cur.execute("SET LOCAL statement_timeout = %s", (max(1, int(timeout * 1000)),))
+                cur.execute(
+                    f"EXECUTE {MATCH_STATEMENT} (%s, %s, %s, %s, %s)",
+                    (query_vector, k, json.dumps(filter or {}), VECTOR_EF_SEARCH, VECTOR_PROBES),
+                )
+                rows = cur.fetchall()
+        return [
+            {"id": r[0], "content": r[1], "metadata": r[2], "similarity": float(r[3])}
+            for r in rows
+        ]
+
+
+class AsyncPgRetriever:
+    """
+    match_it_documents over asyncpg (binary pgvector codec, statement cached
+    per connection), on the app's event loop.
+    - asearch(): awaited by the API for the retrieval before the LLM, whose
+      documents are then handed to the run (no crew worker held)
+    - search(): for crew worker threads (the agent's tool); blocks that
+      thread while the query runs on the loop
+    """
+
+    name = "asyncpg"
+
+    def __init__(self):
+        from backend.async_db import get_async_search
+        self.client = get_async_search()
+
+    async def asearch(self, query_vector, k: int = 4, filter: Optional[dict] = None,
+                      timeout: Optional[float] = None) -> List[dict]:
+        return await self.client.search(query_vector, k=k, filter=filter, timeout=timeout)
+
+    def search(self, query_vector, k: int = 4, filter: Optional[dict] = None,
+               timeout: Optional[float] = None) -> List[dict]:
+        return self.client.search_sync(query_vector, k=k, filter=filter, timeout=timeout)
+
+
+class InProcessRetriever:
+    """
+    Exact search over an in-memory VectorIndex, refreshed from Postgres when
+    the corpus version changes. With VECTOR_SNAPSHOT set it starts from the
+    snapshot file and keeps serving it if the database is unreachable.
+    """
+
+    name = "memory"
+
+    def __init__(self, snapshot_path: Optional[str] = None, refresh_every: float = 30):
+        self.index = VectorIndex(
+            connect_fn=lambda: get_pool().connection(),
+            refresh_every=refresh_every,
+            snapshot_path=snapshot_path,
+        )
+
+    def search(self, query_vector, k: int = 4, filter: Optional[dict] = None,
+               timeout: Optional[float] = None) -> List[dict]:
+        # In-memory and fast: the deadline was already checked by the caller
+        return self.index.search(query_vector, k=k, filter=filter)
+
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever():
+    """
+    RETRIEVAL_BACKEND    -> "postgres" (default, psycopg2), "asyncpg" or "memory"
+    VECTOR_SNAPSHOT      -> snapshot path prefix for the memory backend (optional)
+    VECTOR_REFRESH_EVERY -> seconds between corpus version checks (default 30)
+    """
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                backend = os.getenv("RETRIEVAL_BACKEND", "postgres").strip().lower()
+                if backend == "asyncpg":
+                    _retriever = AsyncPgRetriever()
+                elif backend == "memory":
+                    _retriever = InProcessRetriever(
+                        snapshot_path=os.getenv("VECTOR_SNAPSHOT") or None,
+                        refresh_every=float(os.getenv("VECTOR_REFRESH_EVERY", "30")),
+                    )
+                else:
+                    _retriever = PostgresRetriever()
+                print(f"🔎 Retrieval backend: {_retriever.name}")
+    return _retriever
+
+
+def search_documents(query: str, k: int = 4, filter: Optional[dict] = None) -> List[dict]:
+    """
+    Embeds the query and searches the configured retrieval backend.
+    Rows: {id, content, metadata, similarity}, best first.
+    Each step is bounded by the request deadline (DeadlineExceeded).
+    """
+    query_vector = embed_query(query)
+    timeout = stage_timeout("search")
+    with span("search"):
+        return get_retriever().search(query_vector, k=k, filter=filter, timeout=timeout)
+
+
+async def asearch_documents(query: str, k: int = 4, filter: Optional[dict] = None) -> List[dict]:
+    """
+    search_documents for the event loop (asyncpg backend only): the embedding
+    runs on a thread, the search is awaited.
+    """
+    retriever = get_retriever()
+    query_vector = await asyncio.to_thread(embed_query, query)
+    timeout = stage_timeout("search")
+    with span("search"):
+        return await retriever.asearch(query_vector, k=k, filter=filter, timeout=timeout)
+
+
+def format_documents(documents) -> str:
+    if not documents:
+        return "No relevant documents found."
+    return "\n\n---\n\n".join(
+        f"Content: {d['content']}\n(Confidence: {d['similarity']:.2f})" for d in documents
+    )
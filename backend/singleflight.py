@@ -0,0 +1,105 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+from backend.metrics import SINGLEFLIGHT
+
+
+class Flight:
+    """
+    One in-flight computation shared by every caller with the same key.
+    - task: the shared result (exceptions reach every waiter)
+    - events published while it runs are replayed to late subscribers,
+      so a coalesced stream still sees every stage/token event
+    - deadline: the leader's request deadline, set by the caller
+    """
+
+    def __init__(self):
+        self.task = None
+        self.waiters = 0
+        self.events = []
+        self.deadline = None
+        self._queues = []
+
+    def publish(self, event, data) -> None:
+        # Event-loop thread only (use loop.call_soon_threadsafe from workers)
+        self.events.append((event, data))
+        for q in self._queues:
+            q.put_nowait((event, data))
+
+    def subscribe(self) -> asyncio.Queue:
+        q = asyncio.Queue()
+        for item in self.events:
+            q.put_nowait(item)
+        self._queues.append(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        if q in self._queues:
+            self._queues.remove(q)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests (asyncio, single event loop).
+    - the first caller (leader) starts the work, later callers (followers)
+      with the same key wait for it
+    - the key is forgotten once the work finishes, so nothing is cached and
+      errors are not replayed to later requests
+    - a waiter that goes away only stops waiting; the work is cancelled
+      when the last waiter leaves
+    """
+
+    def __init__(self, name: str = "ask"):
+        self.name = name
+        self._flights: Dict[Hashable, Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def join(self, key: Hashable, start: Callable[[Flight], Awaitable]) -> Tuple[Flight, bool]:
+        """
+        Returns (flight, is_leader). start(flight) is only called for the
+        leader and must return an awaitable; if it raises (e.g. PoolSaturated)
+        nothing is registered and the exception goes to the caller.
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.waiters += 1
+            self.followers += 1
+            SINGLEFLIGHT.labels(name=self.name, role="follower").inc()
+            return flight, False
+
+        flight = Flight()
+        flight.task = asyncio.ensure_future(start(flight))
+        flight.waiters = 1
+        self._flights[key] = flight
+        flight.task.add_done_callback(lambda _task: self._forget(key, flight))
+        self.leaders += 1
+        SINGLEFLIGHT.labels(name=self.name, role="leader").inc()
+        return flight, True
+
+    def _forget(self, key: Hashable, flight: Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def leave(self, flight: Flight) -> None:
+        flight.waiters -= 1
+        if flight.waiters <= 0 and not flight.task.done():
+            flight.task.cancel()
+
+    async def wait(self, flight: Flight):
+        """
+        Result of the shared work. Cancelling this waiter never cancels the
+        work for the others.
+        """
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            self.leave(flight)
+
+    def stats(self) -> dict:
+        total = self.leaders + self.followers
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.followers,
+            "coalesced_rate": round(self.followers / total, 4) if total else 0.0,
+        }
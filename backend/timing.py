@@ -0,0 +1,50 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """
+    Wall-clock milliseconds per pipeline stage for one request.
+    Repeated stages accumulate; stages may overlap (vision runs next to
+    retrieval, embed/search sit inside retrieval). header() renders a
+    Server-Timing value, e.g. 'retrieval;dur=12.4, llm;dur=840.2'.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name: str, ms: float) -> None:
+        # Vision and crew threads add to the same request concurrently
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def header(self) -> str:
+        with self._lock:
+            return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.stages.items())
+
+
+def parse_server_timing(value: str) -> dict:
+    """
+    'a;dur=1.5, b;dur=2' -> {'a': 1.5, 'b': 2.0} (entries without dur are skipped)
+    """
+    stages = {}
+    for entry in (value or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, dur = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    stages[name] = float(dur)
+                except ValueError:
+                    pass
+    return stages
@@ -0,0 +1,264 @@
+import json
+import os
+import sys
+import threading
+import time
+from typing import List, Optional
+import numpy as np
+
+
+def metadata_contains(metadata, filter) -> bool:
+    """
+    Same semantics as jsonb `metadata @> filter` (NULL metadata never matches).
+    """
+    if metadata is None:
+        return False
+    if isinstance(filter, dict):
+        return isinstance(metadata, dict) and all(
+            k in metadata and metadata_contains(metadata[k], v) for k, v in filter.items()
+        )
+    if isinstance(filter, list):
+        if not isinstance(metadata, list):
+            return False
+        return all(any(metadata_contains(m, f) for m in metadata) for f in filter)
+    return metadata == filter
+
+
+class _Snapshot:
+    """
+    Immutable view of the corpus. Refresh builds a new one and swaps it in,
+    so searches never take a lock.
+    """
+
+    def __init__(self, ids, matrix, contents, metadatas, corpus_version, row_version):
+        self.ids = ids                  # int64 (n,)
+        self.matrix = matrix            # float32 (n, dim), rows L2-normalized
+        self.contents = contents
+        self.metadatas = metadatas
+        self.corpus_version = corpus_version
+        self.row_version = row_version  # highest row_version loaded
+        self._filter_rows = {}          # json(filter) -> row indices
+
+    def rows_for(self, filter) -> Optional[np.ndarray]:
+        key = json.dumps(filter or {}, sort_keys=True)
+        rows = self._filter_rows.get(key)
+        if rows is None:
+            rows = np.fromiter(
+                (i for i, m in enumerate(self.metadatas) if metadata_contains(m, filter or {})),
+                dtype=np.int64,
+            )
+            if len(self._filter_rows) < 64:
+                self._filter_rows[key] = rows
+        return rows
+
+
+def _as_array(value) -> np.ndarray:
+    # pgvector >= 0.4 casts vector columns to pgvector.Vector, older ones to numpy
+    if hasattr(value, "to_numpy"):
+        value = value.to_numpy()
+    return np.asarray(value, dtype=np.float32)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _empty_snapshot(dim: int = 768) -> _Snapshot:
+    return _Snapshot(np.zeros(0, dtype=np.int64), np.zeros((0, dim), dtype=np.float32), [], [], None, 0)
+
+
+class VectorIndex:
+    """
+    In-process copy of it_documents embeddings for exact top-k search.
+    - one contiguous float32 matrix, optionally memory-mapped from a snapshot
+    - cosine top-k via normalized dot product + argpartition
+    - metadata filters applied in process (jsonb @> semantics)
+    - refreshes incrementally from Postgres when it_corpus_version() changes:
+      rows with a newer row_version are upserted, missing ids are dropped;
+      version, rows and ids are read in one REPEATABLE READ snapshot
+    """
+
+    def __init__(self, connect_fn=None, refresh_every: float = 30, snapshot_path: Optional[str] = None):
+        self.connect_fn = connect_fn
+        self.refresh_every = refresh_every
+        self.snapshot_path = snapshot_path
+        self._snap = _empty_snapshot()
+        self._refresh_lock = threading.Lock()
+        self._checked_at = 0.0
+        self.refreshes = 0
+
+        if snapshot_path and os.path.exists(snapshot_path + ".npy"):
+            self.load_snapshot(snapshot_path)
+
+    def __len__(self) -> int:
+        return len(self._snap.ids)
+
+    @property
+    def corpus_version(self):
+        return self._snap.corpus_version
+
+    # ---------------------------
+    # Search
+    # ---------------------------
+    def search(self, query_vector, k: int = 4, filter: Optional[dict] = None) -> List[dict]:
+        self.maybe_refresh()
+        snap = self._snap
+        if not len(snap.ids):
+            return []
+
+        q = np.asarray(query_vector, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm:
+            q = q / norm
+
+        rows = snap.rows_for(filter)
+        if not len(rows):
+            return []
+        sims = snap.matrix @ q if len(rows) == len(snap.ids) else snap.matrix[rows] @ q
+
+        k = min(k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+
+        results = []
+        for i in top:
+            row = int(rows[i]) if len(rows) != len(snap.ids) else int(i)
+            results.append({
+                "id": int(snap.ids[row]),
+                "content": snap.contents[row],
+                "metadata": snap.metadatas[row],
+                "similarity": float(sims[i]),
+            })
+        return results
+
+    # ---------------------------
+    # Refresh from Postgres
+    # ---------------------------
+    def maybe_refresh(self) -> None:
+        if self.connect_fn is None or time.monotonic() - self._checked_at < self.refresh_every:
+            return
+        # One refresher at a time; everyone else keeps searching the old snapshot
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = time.monotonic()
+            self.refresh()
+        except Exception as e:
+            print(f"Vector index refresh failed (serving last snapshot): {repr(e)}")
+        finally:
+            self._refresh_lock.release()
+
+    def refresh(self) -> bool:
+        with self.connect_fn() as conn:
+            with conn.cursor() as cur:
+                # One snapshot: the version, the changed rows and the live ids agree
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                cur.execute("SELECT it_corpus_version()")
+                version = int(cur.fetchone()[0])
+                snap = self._snap
+                if version == snap.corpus_version:
+                    return False
+
+                cur.execute(
+                    """
+                    SELECT id, content, metadata, embedding, coalesce(row_version, 0)
+                    FROM it_documents
+                    WHERE embedding IS NOT NULL AND coalesce(row_version, 0) > %s
+                    """,
+                    (snap.row_version if snap.corpus_version is not None else -1,),
+                )
+                changed = cur.fetchall()
+                cur.execute("SELECT id FROM it_documents WHERE embedding IS NOT NULL")
+                live_ids = {r[0] for r in cur.fetchall()}
+
+                # Live rows neither loaded nor changed (e.g. stamped by the old
+                # sequence-based version, or a stale snapshot file) are loaded too
+                known = {int(i) for i in snap.ids} | {int(r[0]) for r in changed}
+                missing = [i for i in live_ids if int(i) not in known]
+                if missing:
+                    cur.execute(
+                        """
+                        SELECT id, content, metadata, embedding, coalesce(row_version, 0)
+                        FROM it_documents
+                        WHERE id = ANY(%s) AND embedding IS NOT NULL
+                        """,
+                        (missing,),
+                    )
+                    changed += cur.fetchall()
+
+        self._snap = self._apply(snap, changed, live_ids, version)
+        self.refreshes += 1
+        print(f"🧭 Vector index at corpus v{version}: {len(self._snap.ids)} docs ({len(changed)} changed)")
+        if self.snapshot_path:
+            self.save_snapshot(self.snapshot_path)
+        return True
+
+    @staticmethod
+    def _apply(snap: _Snapshot, changed, live_ids, version) -> _Snapshot:
+        changed_by_id = {int(r[0]): r for r in changed}
+        keep = [i for i, doc_id in enumerate(snap.ids) if int(doc_id) in live_ids and int(doc_id) not in changed_by_id]
+
+        ids = [int(snap.ids[i]) for i in keep]
+        contents = [snap.contents[i] for i in keep]
+        metadatas = [snap.metadatas[i] for i in keep]
+        parts = [snap.matrix[keep]] if keep else []
+
+        if changed_by_id:
+            rows = list(changed_by_id.values())
+            ids += [int(r[0]) for r in rows]
+            contents += [r[1] for r in rows]
+            metadatas += [r[2] for r in rows]
+            parts.append(_normalize_rows(np.stack([_as_array(r[3]) for r in rows])))
+
+        dim = snap.matrix.shape[1]
+        matrix = np.ascontiguousarray(np.concatenate(parts)) if parts else np.zeros((0, dim), dtype=np.float32)
+        row_version = max([snap.row_version] + [int(r[4]) for r in changed])
+        return _Snapshot(np.asarray(ids, dtype=np.int64), matrix, contents, metadatas, version, row_version)
+
+    # ---------------------------
+    # Snapshot file (<path>.npy + <path>.json)
+    # ---------------------------
+    def save_snapshot(self, path: str) -> None:
+        snap = self._snap
+        tmp = path + ".tmp"
+        np.save(tmp + ".npy", snap.matrix)
+        with open(tmp + ".json", "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": snap.ids.tolist(),
+                "contents": snap.contents,
+                "metadatas": snap.metadatas,
+                "corpus_version": snap.corpus_version,
+                "row_version": snap.row_version,
+            }, f, ensure_ascii=False)
+        os.replace(tmp + ".npy", path + ".npy")
+        os.replace(tmp + ".json", path + ".json")
+
+    def load_snapshot(self, path: str, mmap: bool = True) -> None:
+        matrix = np.load(path + ".npy", mmap_mode="r" if mmap else None)
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        self._snap = _Snapshot(
+            np.asarray(meta["ids"], dtype=np.int64),
+            matrix,
+            meta["contents"],
+            meta["metadatas"],
+            meta["corpus_version"],
+            meta["row_version"],
+        )
+        print(f"🧭 Vector index snapshot loaded: {len(self._snap.ids)} docs (corpus v{meta['corpus_version']})")
+
+
+if __name__ == "__main__":
+    # python -m backend.vector_index <snapshot_path>  -> dump it_documents to a snapshot
+    from backend.db_pool import get_pool
+
+    if len(sys.argv) != 2:
+        print("Usage: python -m backend.vector_index <snapshot_path>")
+        sys.exit(1)
+    index = VectorIndex(connect_fn=get_pool().connection)
+    index.refresh()
+    index.save_snapshot(sys.argv[1])
+    print(f"✅ Snapshot written to {sys.argv[1]}.npy / .json")
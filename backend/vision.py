@@ -0,0 +1,174 @@
+import base64
+import hashlib
+import io
+import os
+from typing import Tuple, Union
+from PIL import Image
+from backend.cache import LRUCache
+from backend.deadline import genai_config
+from backend.metrics import record_usage, span, usage_from_metadata
+
+
+VISION_PROMPT = """
+You are an advanced AI Vision System. Perform two distinct tasks:
+1) OCR EXTRACTION: Read visible text verbatim.
+2) VISUAL ANALYSIS: Describe the technical scene (e.g., 'error dialog', '404 page', 'login failed').
+
+Return format exactly:
+[OCR RAW TEXT]: ...
+[VISUAL CONTEXT]: ...
+""".strip()
+
+# VISION_MAX_SIDE -> longest edge sent to Gemini, VISION_JPEG_QUALITY -> recompression quality
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", "1280"))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+# Images already within bounds and under this size are sent untouched
+VISION_PASSTHROUGH_BYTES = int(os.getenv("VISION_PASSTHROUGH_BYTES", "307200"))
+
+
+# ---------------------------
+# Helper: parse data-uri MIME
+# ---------------------------
+def _parse_data_uri(data_uri: str):
+    """
+    Returns (mime_type, base64_payload)
+    """
+    if not data_uri:
+        return ("image/png", "")
+    if "," in data_uri and data_uri.startswith("data:"):
+        header, b64 = data_uri.split(",", 1)
+        # header like: data:image/png;base64
+        mime = header.split(";")[0].replace("data:", "").strip() or "image/png"
+        return (mime, b64)
+    # raw base64 fallback
+    return ("image/png", data_uri)
+
+
+def decode_data_uri(data_uri: str) -> Tuple[bytes, str]:
+    mime_type, b64_payload = _parse_data_uri(data_uri)
+    return base64.b64decode(b64_payload), mime_type
+
+
+class ImageUpload:
+    """
+    Raw image bytes from a multipart upload (/ask/upload): no base64 round trip.
+    """
+
+    def __init__(self, data: bytes, mime_type: str):
+        self.data = data
+        self.mime_type = mime_type or "image/png"
+
+
+def image_bytes_of(image: Union[str, ImageUpload]) -> Tuple[bytes, str]:
+    # /ask sends a data URI, /ask/upload the bytes themselves
+    if isinstance(image, ImageUpload):
+        return image.data, image.mime_type
+    return decode_data_uri(image)
+
+
+def image_fingerprint(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def prepare_image(image_bytes: bytes, mime_type: str) -> Tuple[bytes, str]:
+    """
+    Bounds the upload: longest side <= VISION_MAX_SIDE, re-encoded as JPEG.
+    Small images that already fit are passed through as-is.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        fits = max(img.size) <= VISION_MAX_SIDE
+        if fits and len(image_bytes) <= VISION_PASSTHROUGH_BYTES:
+            return image_bytes, mime_type
+
+        img = img.convert("RGBA") if img.mode in ("P", "LA") else img
+        if img.mode == "RGBA":
+            # Screenshots with transparency: flatten on white so text stays readable
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        if not fits:
+            img.thumbnail((VISION_MAX_SIDE, VISION_MAX_SIDE), Image.LANCZOS)
+
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=VISION_JPEG_QUALITY, optimize=True)
+
+    prepared = out.getvalue()
+    # Recompression can lose to an already well-compressed original
+    if fits and len(prepared) >= len(image_bytes):
+        return image_bytes, mime_type
+    return prepared, "image/jpeg"
+
+
+class VisionStage:
+    """
+    OCR + visual analysis of screenshots.
+    - images are downscaled/recompressed before upload
+    - results are cached by a hash of the original bytes, since the same
+      error screenshots come in again and again
+    """
+
+    def __init__(self, client, model: str, cache_size: int = 256, cache_ttl: float = 86400):
+        self.client = client
+        self.model = model
+        self.cache = LRUCache(max_size=cache_size, ttl=cache_ttl)
+
+    def analyze_bytes(self, image_bytes: bytes, mime_type: str) -> str:
+        if not self.client:
+            return "Vision unavailable: missing API key."
+
+        key = image_fingerprint(image_bytes)
+        cached = self.cache.get(key)
+        if cached is not None:
+            print("⚡ Vision cache hit")
+            return cached
+
+        try:
+            upload_bytes, upload_mime = prepare_image(image_bytes, mime_type)
+        except Exception as e:
+            # Not decodable by Pillow: let Gemini try the original
+            print(f"Image prepare skipped: {repr(e)}")
+            upload_bytes, upload_mime = image_bytes, mime_type
+
+        from google.genai import types
+
+        with span("vision_llm"):
+            response = self.client.models.generate_content(
+                model=self.model,
+                contents=[
+                    types.Content(
+                        parts=[
+                            types.Part.from_text(text=VISION_PROMPT),
+                            types.Part.from_bytes(data=upload_bytes, mime_type=upload_mime),
+                        ]
+                    )
+                ],
+                # HTTP timeout = the request's 'vision' budget
+                config=genai_config(stage="vision"),
+            )
+        record_usage("vision", usage_from_metadata(response.usage_metadata))
+        description = (response.text or "").strip()
+        if not description:
+            return "No image insights found."
+
+        self.cache.put(key, description)
+        return description
+
+    def analyze(self, image: Union[str, ImageUpload]) -> str:
+        image_bytes, mime_type = image_bytes_of(image)
+        return self.analyze_bytes(image_bytes, mime_type)
+
+
+def vision_from_env(client, model: str) -> VisionStage:
+    """
+    VISION_CACHE_SIZE -> cached screenshot analyses (default 256)
+    VISION_CACHE_TTL  -> seconds an analysis is reused (default 86400)
+    """
+    return VisionStage(
+        client,
+        model,
+        cache_size=int(os.getenv("VISION_CACHE_SIZE", "256")),
+        cache_ttl=float(os.getenv("VISION_CACHE_TTL", "86400")),
+    )
@@ -0,0 +1,62 @@
+import threading
+import time
+from typing import Callable, Dict
+
+
+class Readiness:
+    """
+    Warm/cold state per component, for /ready.
+    - cold -> warming -> warm, or error (with the exception text)
+    - seconds = how long the warm-up step took
+    """
+
+    def __init__(self, components):
+        self._lock = threading.Lock()
+        self._state: Dict[str, dict] = {
+            name: {"state": "cold", "seconds": None, "error": None} for name in components
+        }
+        self._finished_at: Dict[str, float] = {}
+
+    def run(self, name: str, fn: Callable[[], None]) -> bool:
+        with self._lock:
+            self._state[name] = {"state": "warming", "seconds": None, "error": None}
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            with self._lock:
+                self._state[name] = {
+                    "state": "error",
+                    "seconds": round(time.perf_counter() - start, 3),
+                    "error": repr(e),
+                }
+                self._finished_at[name] = time.monotonic()
+            print(f"⚠️ Warm-up failed for {name}: {repr(e)}")
+            return False
+        seconds = round(time.perf_counter() - start, 3)
+        with self._lock:
+            self._state[name] = {"state": "warm", "seconds": seconds, "error": None}
+            self._finished_at[name] = time.monotonic()
+        print(f"🔥 {name} warm in {seconds:.2f}s")
+        return True
+
+    def pending(self, older_than: float = 0) -> list:
+        """
+        Components still to warm: cold ones (never tried, e.g. WARMUP_ON_STARTUP=0)
+        and ones in error whose last attempt finished more than older_than seconds ago.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                name for name, s in self._state.items()
+                if s["state"] == "cold"
+                or (s["state"] == "error" and now - self._finished_at.get(name, 0) >= older_than)
+            ]
+
+    def ready(self) -> bool:
+        with self._lock:
+            return all(s["state"] == "warm" for s in self._state.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: dict(s) for name, s in self._state.items()}
@@ -0,0 +1,71 @@
+"""
+match_it_documents at 1/64/512 concurrent searches:
+psycopg2 pool (one thread per in-flight search) vs asyncpg (one event loop).
+Uses random query vectors, so no embedding model is needed.
+
+Usage: python bench_async_search.py [searches_per_level] [k]
+"""
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from backend.async_db import AsyncPgSearch
+from backend.retrieval import PostgresRetriever
+
+DIM = 768
+
+
+def make_vectors(n):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run_threads(vectors, concurrency, k):
+    retriever = PostgresRetriever()
+    peak = threading.active_count()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(retriever.search, v, k) for v in vectors]
+        peak = max(peak, threading.active_count())
+        for f in futures:
+            f.result()
+    return len(vectors) / (time.perf_counter() - start), peak
+
+
+async def run_async(client, vectors, concurrency, k):
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(v):
+        async with gate:
+            await client.search(v, k)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(v) for v in vectors))
+    return len(vectors) / (time.perf_counter() - start), threading.active_count()
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2048
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    vectors = list(make_vectors(n))
+
+    client = AsyncPgSearch()
+    await client.pool()
+    await client.search(vectors[0], k)
+    await asyncio.to_thread(PostgresRetriever().search, vectors[0], k)
+
+    print(f"\n{n} searches per level, k={k}\n")
+    print(f"{'concurrent':>10} {'psycopg2 q/s':>13} {'threads':>8} {'asyncpg q/s':>12} {'threads':>8}")
+    for concurrency in (1, 64, 512):
+        sync_qps, sync_threads = await asyncio.to_thread(run_threads, vectors, concurrency, k)
+        async_qps, async_threads = await run_async(client, vectors, concurrency, k)
+        print(f"{concurrency:>10} {sync_qps:>13.1f} {sync_threads:>8} {async_qps:>12.1f} {async_threads:>8}")
+
+    await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""
+Embedding throughput at 1/8/32 concurrent callers:
+direct per-call model.encode vs the micro-batching BatchingEmbedder.
+
+Usage: python bench_embedding_batching.py [requests_per_level] [window_ms] [max_batch]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sentence_transformers import SentenceTransformer
+from backend.embedding_batcher import BatchingEmbedder
+
+TOPICS = [
+    "tablet lost in office", "vpn setup on laptop", "password reset policy",
+    "asset declaration monthly", "laptop stolen from car", "printer not working",
+    "email access on phone", "data security policy", "chrome tab crashed",
+    "acceptable use policy",
+]
+
+
+def make_queries(n):
+    # Unique strings so nothing is served from a cache
+    return [f"{TOPICS[i % len(TOPICS)]} #{i}" for i in range(n)]
+
+
+def run_level(encode, queries, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(encode, queries))
+    elapsed = time.perf_counter() - start
+    return len(queries) / elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    window_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    max_batch = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+
+    print("⏳ Loading embedding model...")
+    model = SentenceTransformer("all-mpnet-base-v2")
+    model.encode("warm up")
+    batcher = BatchingEmbedder(model, window_ms=window_ms, max_batch=max_batch)
+
+    print(f"\n{n} queries per level, window {window_ms} ms, max batch {max_batch}\n")
+    print(f"{'callers':>8} {'direct q/s':>12} {'batched q/s':>12} {'speed-up':>9} {'avg batch':>10}")
+    for concurrency in (1, 8, 32):
+        queries = make_queries(n)
+        direct = run_level(lambda q: model.encode(q, convert_to_numpy=True), queries, concurrency)
+
+        batcher.batches = batcher.items = 0
+        batched = run_level(batcher.encode, queries, concurrency)
+
+        avg_batch = batcher.stats()["avg_batch"]
+        print(f"{concurrency:>8} {direct:>12.1f} {batched:>12.1f} {batched / direct:>8.2f}x {avg_batch:>10.1f}")
+
+    batcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+End-to-end load test for /ask without Gemini or Postgres.
+
+- a fake Gemini server (any path ending in :generateContent or
+  :streamGenerateContent) with configurable latency; both the API's genai client
+  and the CrewAI LLM are pointed at it through GOOGLE_GEMINI_BASE_URL
+- retrieval from the in-process vector index (RETRIEVAL_BACKEND=memory), loaded
+  from a snapshot built from documents.csv, or synthetic documents if there is none
+  (--retrieval postgres uses the DB_* database instead, e.g. a throwaway pgvector)
+- replays a query corpus (jsonl with question/title, or one question per line)
+  at a fixed concurrency and reports p50/p95/p99, throughput and the per-stage
+  breakdown from the Server-Timing header
+
+The embedding model is real, so embedding cost is part of the numbers.
+
+Usage: python bench_load.py [--mode rag|crew] [--concurrency 8] [--requests 200]
+                            [--queries requests.jsonl] [--llm-latency-ms 400]
+                            [--stream] [--json results.json]
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import requests
+from backend.timing import parse_server_timing
+from backend.vector_index import VectorIndex, _empty_snapshot
+
+DEFAULT_QUERIES = [
+    "tablet device lost",
+    "laptop stolen from car what do I do",
+    "vpn setup on home laptop",
+    "forgot my password",
+    "acceptable use policy",
+    "how to raise a tms ticket",
+    "outlook not syncing",
+    "printer not working",
+]
+
+
+# ---------------------------
+# Fake Gemini
+# ---------------------------
+class FakeGemini(BaseHTTPRequestHandler):
+    """
+    Answers generateContent / streamGenerateContent with canned text + usageMetadata.
+    - when the request declares tools and has no functionResponse yet, the
+      first tool is called once (like the crew agent's search step)
+    - prompts in CrewAI's ReAct format get a 'Final Answer:' reply
+    """
+
+    latency_ms = 400.0
+    jitter_ms = 100.0
+    token_delay_ms = 20.0
+    answer_words = 80
+    calls = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _sleep(self):
+        delay = max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        time.sleep(delay)
+
+    def _reply(self, body):
+        texts = []
+        for content in body.get("contents") or []:
+            for part in content.get("parts") or []:
+                if "functionResponse" in part:
+                    return self._answer(texts)
+                texts.append(part.get("text") or "")
+
+        declarations = [
+            d for tool in body.get("tools") or [] for d in tool.get("functionDeclarations") or []
+        ]
+        if declarations:
+            return {"functionCall": {"name": declarations[0]["name"], "args": {"query": "it policy"}}}
+        return self._answer(texts)
+
+    def _answer(self, texts):
+        words = " ".join(f"policy{i}" for i in range(self.answer_words))
+        text = f"- Per IT policy: {words}"
+        if any("Final Answer" in t for t in texts):
+            text = f"Thought: I now know the final answer\nFinal Answer: {text}"
+        return {"text": text}
+
+    def _response(self, part, prompt_tokens, candidate_tokens):
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": candidate_tokens,
+                "totalTokenCount": prompt_tokens + candidate_tokens,
+            },
+            "modelVersion": "fake-gemini",
+        }
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        if not (path.endswith(":generateContent") or path.endswith(":streamGenerateContent")):
+            self.send_error(404)
+            return
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        body = json.loads(raw or b"{}")
+        with FakeGemini.lock:
+            FakeGemini.calls += 1
+
+        part = self._reply(body)
+        prompt_tokens = max(1, len(raw) // 4)
+        self._sleep()
+
+        if path.endswith(":generateContent"):
+            data = json.dumps(self._response(part, prompt_tokens, len(json.dumps(part)) // 4)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        # alt=sse: one event per word chunk, usage on the last one
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        chunks = [part] if "text" not in part else [
+            {"text": w + " "} for w in part["text"].split(" ")
+        ]
+        for i, chunk in enumerate(chunks):
+            event = self._response(chunk, prompt_tokens, i + 1)
+            if i < len(chunks) - 1:
+                event["candidates"][0].pop("finishReason")
+            self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode())
+            self.wfile.flush()
+            time.sleep(self.token_delay_ms / 1000)
+
+
+def start_fake_gemini(args):
+    FakeGemini.latency_ms = args.llm_latency_ms
+    FakeGemini.jitter_ms = args.llm_jitter_ms
+    FakeGemini.token_delay_ms = args.token_delay_ms
+    FakeGemini.answer_words = args.answer_words
+    server = ThreadingHTTPServer(("127.0.0.1", args.fake_port), FakeGemini)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-gemini", daemon=True).start()
+    return server
+
+
+# ---------------------------
+# Retrieval snapshot
+# ---------------------------
+def build_snapshot(path, csv_path, synthetic_docs) -> bool:
+    """
+    Returns True when the snapshot is synthetic (random vectors).
+    """
+    rows = []
+    if os.path.exists(csv_path):
+        from seed_db import validate_row
+
+        csv.field_size_limit(sys.maxsize)
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    doc_id, content, metadata, embedding = validate_row(row)
+                except (ValueError, TypeError):
+                    continue
+                if embedding is None:
+                    continue  # not embedded yet (reindex_db.py)
+                rows.append((doc_id, content, json.loads(metadata), json.loads(embedding), 0))
+        print(f"📚 Snapshot from {csv_path}: {len(rows)} documents")
+    synthetic = not rows
+    if synthetic:
+        rng = np.random.default_rng(0)
+        rows = [
+            (i, f"Synthetic IT policy document {i}. " * 20, {"policy": f"policy-{i % 25}"},
+             rng.standard_normal(768).astype(np.float32), 0)
+            for i in range(1, synthetic_docs + 1)
+        ]
+        print(f"📚 Snapshot with {len(rows)} synthetic documents")
+
+    index = VectorIndex()
+    index._snap = VectorIndex._apply(_empty_snapshot(), rows, {r[0] for r in rows}, 0)
+    index.save_snapshot(path)
+    return synthetic
+
+
+# ---------------------------
+# Load generation
+# ---------------------------
+def load_queries(path):
+    if not path or not os.path.exists(path):
+        return DEFAULT_QUERIES
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("{"):
+                row = json.loads(line)
+                line = row.get("question") or row.get("title") or ""
+            if line:
+                queries.append(line)
+    return queries or DEFAULT_QUERIES
+
+
+def ask(session, base, question, stream):
+    start = time.perf_counter()
+    if not stream:
+        r = session.post(f"{base}/ask", json={"question": question}, timeout=300)
+        return {
+            "status": r.status_code,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "stages": parse_server_timing(r.headers.get("Server-Timing", "")),
+            "source": r.json().get("source") if r.status_code == 200 else None,
+        }
+
+    first_token = None
+    source = None
+    event = None
+    with session.post(f"{base}/ask/stream", json={"question": question}, stream=True, timeout=300) as r:
+        for line in r.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+                if first_token is None and event == "token":
+                    first_token = (time.perf_counter() - start) * 1000
+            elif event == "done" and line.startswith("data: "):
+                source = json.loads(line[len("data: "):]).get("source")
+        status = r.status_code
+    stages = {"first_token": first_token} if first_token is not None else {}
+    return {"status": status, "latency_ms": (time.perf_counter() - start) * 1000, "stages": stages, "source": source}
+
+
+def run_load(base, queries, concurrency, total, stream):
+    local = threading.local()
+    results = []
+
+    def one(i):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        # Index suffix keeps the semantic cache from answering repeats
+        question = f"{queries[i % len(queries)]} #{i}" if i >= len(queries) else queries[i]
+        try:
+            return ask(local.session, base, question, stream)
+        except requests.RequestException as e:
+            return {"status": 0, "latency_ms": 0.0, "stages": {}, "error": repr(e)}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    return results, time.perf_counter() - start
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def summarize(results, elapsed):
+    ok = [r for r in results if r["status"] == 200]
+    latencies = [r["latency_ms"] for r in ok]
+    stages = {}
+    sources = {}
+    for r in ok:
+        for name, ms in r["stages"].items():
+            stages.setdefault(name, []).append(ms)
+        sources.setdefault(r.get("source") or "unknown", []).append(r["latency_ms"])
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "busy_503": sum(1 for r in results if r["status"] == 503),
+        "errors": sum(1 for r in results if r["status"] not in (200, 503)),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "mean": round(statistics.mean(latencies), 1) if latencies else 0.0,
+        },
+        "stages_ms": {
+            name: {"mean": round(statistics.mean(v), 1), "p95": round(percentile(v, 95), 1)}
+            for name, v in stages.items()
+        },
+        # Answer source (llm / cache / fast_path / degraded): share of ok requests and latency
+        "sources": {
+            name: {
+                "share": round(len(v) / len(ok), 4),
+                "p50": round(percentile(v, 50), 1),
+                "p95": round(percentile(v, 95), 1),
+            }
+            for name, v in sources.items()
+        },
+    }
+
+
+def print_report(summary, args):
+    lat = summary["latency_ms"]
+    print(f"\n⏱️ {summary['ok']}/{summary['requests']} ok, {summary['busy_503']} busy (503), "
+          f"{summary['errors']} errors in {summary['elapsed_s']:.1f}s "
+          f"(mode={args.mode}, concurrency={args.concurrency})")
+    print(f"   throughput  {summary['throughput_rps']:8.2f} req/s")
+    print(f"   latency     p50 {lat['p50']:8.1f} ms   p95 {lat['p95']:8.1f} ms   p99 {lat['p99']:8.1f} ms")
+    if summary["stages_ms"]:
+        print("\n   stage            mean ms     p95 ms")
+        for name, s in summary["stages_ms"].items():
+            print(f"   {name:<14}{s['mean']:10.1f}{s['p95']:11.1f}")
+    if summary["sources"]:
+        print("\n   source           share     p50 ms     p95 ms")
+        for name, s in summary["sources"].items():
+            print(f"   {name:<14}{s['share']:8.1%}{s['p50']:11.1f}{s['p95']:11.1f}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wait_ready(base, proc, timeout):
+    start = time.time()
+    last = "no response"
+    while time.time() - start < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API exited with code {proc.returncode}")
+        try:
+            r = requests.get(f"{base}/ready", timeout=2)
+            if r.status_code == 200:
+                return
+            last = r.text
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"API not ready after {timeout}s: {last}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /ask against a fake Gemini")
+    parser.add_argument("--mode", choices=["rag", "crew"], default="rag")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5, help="requests sent before measuring")
+    parser.add_argument("--queries", default="requests.jsonl")
+    parser.add_argument("--stream", action="store_true", help="use /ask/stream and report time to first token")
+    parser.add_argument("--retrieval", choices=["memory", "postgres"], default="memory")
+    parser.add_argument("--csv", default="documents.csv", help="snapshot source for --retrieval memory")
+    parser.add_argument("--synthetic-docs", type=int, default=2000)
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--token-delay-ms", type=float, default=20)
+    parser.add_argument("--answer-words", type=int, default=80)
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--fake-port", type=int, default=8791)
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--json", default=None, help="write the summary here, to compare across commits")
+    args = parser.parse_args()
+
+    fake = start_fake_gemini(args)
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    env = dict(
+        os.environ,
+        PIPELINE_MODE=args.mode,
+        GOOGLE_API_KEY="bench-not-a-real-key",
+        GOOGLE_GEMINI_BASE_URL=f"http://127.0.0.1:{args.fake_port}",
+        RETRIEVAL_BACKEND=args.retrieval,
+        CREW_VERBOSE="0",
+        PYTHONUNBUFFERED="1",
+    )
+    env.setdefault("SEMANTIC_CACHE_ENABLED", "0")
+    if args.retrieval == "memory":
+        snapshot = os.path.join(workdir, "index")
+        if build_snapshot(snapshot, args.csv, args.synthetic_docs):
+            # Random vectors score ~0, keep the chunks so prompts have realistic size
+            env.setdefault("CONTEXT_SIMILARITY_FLOOR", "-1")
+        # No DB: serve the snapshot, don't poll for corpus changes
+        env.update(VECTOR_SNAPSHOT=snapshot, VECTOR_REFRESH_EVERY="1e9")
+
+    base = f"http://127.0.0.1:{args.port}"
+    log = open(os.path.join(workdir, "api.log"), "w", encoding="utf-8")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(args.port), "--log-level", "warning"],
+        stdout=log,
+        stderr=subprocess.STDOUT,
+        env=env,
+    )
+    try:
+        print("⏳ Waiting for /ready...")
+        wait_ready(base, proc, args.ready_timeout)
+        queries = load_queries(args.queries)
+        print(f"🔥 Warm-up ({args.warmup} requests), then {args.requests} requests from {len(queries)} queries")
+        run_load(base, queries, min(args.concurrency, max(1, args.warmup)), args.warmup, args.stream)
+
+        FakeGemini.calls = 0
+        results, elapsed = run_load(base, queries, args.concurrency, args.requests, args.stream)
+        summary = summarize(results, elapsed)
+        summary.update({
+            "commit": git_commit(),
+            "mode": args.mode,
+            "stream": args.stream,
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_calls": FakeGemini.calls,
+        })
+        print_report(summary, args)
+        print(f"   LLM calls     {FakeGemini.calls} ({FakeGemini.calls / max(1, summary['ok']):.1f} per answer)")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+            print(f"\n💾 Summary written to {args.json}")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        log.close()
+        fake.shutdown()
+        print(f"📝 API log: {log.name}")
+
+
+if __name__ == "__main__":
+    main()
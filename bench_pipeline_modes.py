@@ -0,0 +1,82 @@
+"""
+A/B comparison of the two answer pipelines on the same questions:
+  crew -> agent decides to call SearchITDocsTool, then answers (ReAct loop)
+  rag  -> retrieve on normalize_query(question), one Gemini call
+
+Needs GOOGLE_API_KEY and a reachable retrieval backend (DB or VECTOR_SNAPSHOT).
+Usage: python bench_pipeline_modes.py [questions.txt] [--repeat N]
+"""
+import argparse
+import statistics
+import time
+from backend.main import GOOGLE_API_KEY, get_genai_client, normalize_query
+from backend.pipeline import CrewPipeline, RagPipeline
+
+DEFAULT_QUESTIONS = [
+    "tab lost",
+    "my office tablet was stolen from the branch",
+    "how do I set up VPN on my laptop?",
+    "what is the password policy?",
+    "How often must branches submit the Monthly Asset Declaration?",
+    "laptop lost while travelling, what is the penalty?",
+]
+
+
+def run_mode(pipeline, questions, repeat):
+    rows = []
+    for _ in range(repeat):
+        for q in questions:
+            start = time.perf_counter()
+            result = pipeline.answer(q, normalize_query(q), "No previous context.", "")
+            elapsed = time.perf_counter() - start
+            usage = result.get("usage", {})
+            rows.append({
+                "seconds": elapsed,
+                "llm_calls": usage.get("llm_calls", 0),
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0),
+            })
+            print(f"  [{pipeline.mode}] {elapsed:6.2f}s  calls={usage.get('llm_calls', '?')}  "
+                  f"tokens={usage.get('total_tokens', '?')}  {q[:50]}")
+    return rows
+
+
+def summarize(mode, rows):
+    secs = [r["seconds"] for r in rows]
+    p95 = statistics.quantiles(secs, n=20)[-1] if len(secs) > 1 else secs[0]
+    return (
+        f"{mode:<6} {statistics.mean(secs):8.2f} {statistics.median(secs):8.2f} {p95:8.2f} "
+        f"{statistics.mean(r['llm_calls'] for r in rows):7.1f} "
+        f"{statistics.mean(r['prompt_tokens'] for r in rows):10.0f} "
+        f"{statistics.mean(r['completion_tokens'] for r in rows):10.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("questions", nargs="?", help="text file, one question per line")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    if not GOOGLE_API_KEY:
+        print("❌ GOOGLE_API_KEY / GEMINI_API_KEY not set.")
+        return
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    pipelines = [CrewPipeline(api_key=GOOGLE_API_KEY, verbose=False), RagPipeline(client=get_genai_client())]
+    results = {}
+    for pipeline in pipelines:
+        print(f"\n▶️ {pipeline.mode}")
+        results[pipeline.mode] = run_mode(pipeline, questions, args.repeat)
+
+    print(f"\n{'mode':<6} {'mean s':>8} {'p50 s':>8} {'p95 s':>8} {'calls':>7} {'prompt tok':>10} {'output tok':>10}")
+    for mode, rows in results.items():
+        print(summarize(mode, rows))
+
+
+if __name__ == "__main__":
+    main()
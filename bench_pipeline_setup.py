@@ -0,0 +1,74 @@
+"""
+Per-request setup cost: old (build everything per call) vs CrewPipeline (Task only).
+No LLM call is made — this only measures object construction.
+
+Usage: python bench_pipeline_setup.py [iterations]
+"""
+import sys
+import time
+import tracemalloc
+from crewai import Agent, Task, Crew, Process, LLM
+from backend.db_tool import SearchITDocsTool
+from backend.pipeline import AGENT_BACKSTORY, LLM_MODEL, CrewPipeline, build_task_prompt
+
+FAKE_KEY = "bench-not-a-real-key"
+PROMPT = build_task_prompt("tab lost", "tab lost (tablet device / office tablet)", "No previous context.", "")
+
+
+def setup_per_request():
+    # Mirrors the original get_crew_response body (minus kickoff)
+    my_llm = LLM(model=LLM_MODEL, api_key=FAKE_KEY)
+    support_agent = Agent(
+        role="Sampurna Senior IT Specialist",
+        goal="Provide fast, polite, detailed, policy-grounded IT support using internal documents.",
+        backstory=AGENT_BACKSTORY,
+        verbose=True,
+        allow_delegation=False,
+        llm=my_llm,
+        tools=[SearchITDocsTool()]
+    )
+    answer_task = Task(
+        description=PROMPT,
+        expected_output="A policy-grounded, actionable IT support answer in bullet points.",
+        agent=support_agent
+    )
+    Crew(agents=[support_agent], tasks=[answer_task], process=Process.sequential)
+
+
+def setup_reused(pipeline: CrewPipeline):
+    agent = pipeline.agent
+    Task(
+        description=PROMPT,
+        expected_output="A policy-grounded, actionable IT support answer in bullet points.",
+        agent=agent
+    )
+
+
+def measure(label, fn, iterations):
+    fn()  # warm-up (imports, pydantic schema caches)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_call_ms = elapsed / iterations * 1000
+    print(f"{label:<28} {per_call_ms:9.2f} ms/request   peak alloc {peak / 1024:9.1f} KiB")
+    return per_call_ms
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    pipeline = CrewPipeline(api_key=FAKE_KEY)
+
+    print(f"⏱️ Setup cost over {iterations} iterations\n")
+    before = measure("before (per-request build)", setup_per_request, iterations)
+    after = measure("after (Task only)", lambda: setup_reused(pipeline), iterations)
+    print(f"\n🎯 Speed-up: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Startup cost of the API: import time, time to first /health, time to /ready,
+and latency of the first /ask versus a warm one.
+Each measurement runs in a fresh process so nothing is cached between runs.
+
+Usage: python bench_startup.py [--port 8765] [--runs 3] [--ask "vpn setup"]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import requests
+
+IMPORT_SNIPPET = (
+    "import time, sys; t = time.perf_counter(); import backend.main; "
+    "print(time.perf_counter() - t, 'crewai' in sys.modules, 'sentence_transformers' in sys.modules)"
+)
+
+
+def measure_import():
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1].split()
+    return float(out[0]), out[1] == "True", out[2] == "True"
+
+
+def wait_for(url, start, timeout, ok=(200,)):
+    while time.perf_counter() - start < timeout:
+        try:
+            if requests.get(url, timeout=1).status_code in ok:
+                return time.perf_counter() - start
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def measure_server(port, question, timeout):
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=dict(os.environ, PYTHONUNBUFFERED="1"),
+    )
+    try:
+        health = wait_for(f"{base}/health", start, timeout)
+        ready = wait_for(f"{base}/ready", start, timeout)
+        first_ask = warm_ask = None
+        if question and ready is not None:
+            t = time.perf_counter()
+            requests.post(f"{base}/ask", json={"question": question}, timeout=120)
+            first_ask = time.perf_counter() - t
+            t = time.perf_counter()
+            # Slightly different wording so the answer cache can't short-circuit it
+            requests.post(f"{base}/ask", json={"question": question + "?"}, timeout=120)
+            warm_ask = time.perf_counter() - t
+        return health, ready, first_ask, warm_ask
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def fmt(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return "      n/a"
+    return f"{statistics.median(values):8.2f}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API import and first-request cost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--ask", default="", help="also time the first /ask with this question")
+    parser.add_argument("--timeout", type=float, default=180, help="seconds to wait for /ready")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    print(f"⏱️ Startup over {args.runs} runs (median)\n")
+    print(f"{'import backend.main':<22}{fmt([i[0] for i in imports])}"
+          f"   (crewai loaded: {imports[0][1]}, sentence-transformers loaded: {imports[0][2]})")
+
+    runs = [measure_server(args.port, args.ask, args.timeout) for _ in range(args.runs)]
+    print(f"{'first /health':<22}{fmt([r[0] for r in runs])}")
+    print(f"{'/ready (warm-up done)':<22}{fmt([r[1] for r in runs])}")
+    if args.ask:
+        print(f"{'first /ask':<22}{fmt([r[2] for r in runs])}")
+        print(f"{'second /ask':<22}{fmt([r[3] for r in runs])}")
+    if any(r[1] is None for r in runs):
+        print("\n⚠️ /ready never returned 200 in some runs (check DB / API key); see GET /ready for details.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Memory per gunicorn worker with and without preloading (gunicorn.conf.py):
+RSS, PSS (shared pages split between the processes that map them), shared
+and private memory from /proc/<pid>/smaps_rollup once every worker is warm.
+PSS summed over master + workers is the real footprint of the deployment.
+
+Linux only. Retrieval uses an in-memory snapshot, so no database is needed.
+
+Usage: python bench_worker_rss.py [--workers 4] [--port 8792] [--json rss.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import requests
+from bench_load import build_snapshot
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def smaps_rollup(pid) -> dict:
+    """
+    {field: MB} for one process.
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in FIELDS:
+                values[name] = int(rest.split()[0]) / 1024
+    return {
+        "rss": values.get("Rss", 0.0),
+        "pss": values.get("Pss", 0.0),
+        "shared": values.get("Shared_Clean", 0.0) + values.get("Shared_Dirty", 0.0),
+        "private": values.get("Private_Clean", 0.0) + values.get("Private_Dirty", 0.0),
+    }
+
+
+def worker_pids(master_pid) -> list:
+    with open(f"/proc/{master_pid}/task/{master_pid}/children", encoding="utf-8") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def wait_all_ready(base, proc, workers, timeout) -> bool:
+    # Requests land on any worker: enough consecutive 200s means all are warm
+    start = time.time()
+    streak = 0
+    while time.time() - start < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {proc.returncode}")
+        try:
+            ok = requests.get(f"{base}/ready", timeout=2).status_code == 200
+        except requests.RequestException:
+            ok = False
+        streak = streak + 1 if ok else 0
+        if streak >= 4 * workers:
+            return True
+        time.sleep(0.05 if ok else 0.25)
+    return False
+
+
+def measure(preload, args, env, workdir):
+    base = f"http://127.0.0.1:{args.port}"
+    log_path = os.path.join(workdir, f"gunicorn_preload{int(preload)}.log")
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "backend.main:app"],
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            env=dict(env, GUNICORN_PRELOAD="1" if preload else "0"),
+        )
+        try:
+            if not wait_all_ready(base, proc, args.workers, args.ready_timeout):
+                print(f"⚠️ Not every worker reported ready within {args.ready_timeout}s (see {log_path})")
+            time.sleep(args.settle)
+            master = smaps_rollup(proc.pid)
+            workers = [dict(pid=pid, **smaps_rollup(pid)) for pid in worker_pids(proc.pid)]
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+    return {
+        "preload": preload,
+        "master": master,
+        "workers": workers,
+        "total_pss": master["pss"] + sum(w["pss"] for w in workers),
+        "total_rss": master["rss"] + sum(w["rss"] for w in workers),
+    }
+
+
+def print_report(run):
+    label = "preload (shared copy-on-write)" if run["preload"] else "no preload (one copy per worker)"
+    print(f"\n🧠 {label}")
+    print(f"   {'process':<14}{'RSS MB':>9}{'PSS MB':>9}{'shared MB':>11}{'private MB':>12}")
+    rows = [("master", run["master"])] + [(f"worker {w['pid']}", w) for w in run["workers"]]
+    for name, m in rows:
+        print(f"   {name:<14}{m['rss']:9.1f}{m['pss']:9.1f}{m['shared']:11.1f}{m['private']:12.1f}")
+    print(f"   {'total':<14}{run['total_rss']:9.1f}{run['total_pss']:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSS/PSS per gunicorn worker, with and without preload")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8792)
+    parser.add_argument("--csv", default="documents.csv", help="snapshot source for the in-memory index")
+    parser.add_argument("--synthetic-docs", type=int, default=2000)
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--settle", type=float, default=2, help="seconds to wait after ready before reading memory")
+    parser.add_argument("--json", default=None, help="write both runs here")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_rss_")
+    snapshot = os.path.join(workdir, "index")
+    build_snapshot(snapshot, args.csv, args.synthetic_docs)
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(args.workers),
+        BIND=f"127.0.0.1:{args.port}",
+        GOOGLE_API_KEY=os.getenv("GOOGLE_API_KEY", "bench-not-a-real-key"),
+        RETRIEVAL_BACKEND="memory",
+        VECTOR_SNAPSHOT=snapshot,
+        VECTOR_REFRESH_EVERY="1e9",
+        CREW_VERBOSE="0",
+        PYTHONUNBUFFERED="1",
+    )
+
+    runs = [measure(preload, args, env, workdir) for preload in (False, True)]
+    for run in runs:
+        print_report(run)
+    before, after = runs
+    saved = before["total_pss"] - after["total_pss"]
+    print(f"\n📉 Total PSS {before['total_pss']:.1f} MB -> {after['total_pss']:.1f} MB "
+          f"({saved:.1f} MB saved with {args.workers} workers)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"workers": args.workers, "runs": runs}, f, indent=2)
+        print(f"💾 Written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Ingestion-time chunking: source policies -> size-bounded, overlapping,
+deduplicated chunks tagged with policy/section metadata, written as a CSV
+that seed_db.py loads (embeddings left empty for reindex_db.py to fill).
+
+Sources: --from-csv (rows of an existing documents.csv, one policy blob per
+row) or --from-dir (*.txt / *.md files, one policy per file).
+
+Usage:
+  python chunk_documents.py --from-csv documents.csv --out documents.chunked.csv --report
+  python seed_db.py documents.chunked.csv --prune
+  python reindex_db.py
+
+--report embeds the corpus before and after (EMBEDDING_BACKEND) and prints
+corpus size and the average retrieved-context tokens per query (top-k, raw
+and after the context budget).
+"""
+import argparse
+import csv
+import json
+import os
+import statistics
+import sys
+import time
+import numpy as np
+from backend.chunking import ChunkingPipeline, policy_name
+from backend.context_builder import ContextBuilder, estimate_tokens
+
+DEFAULT_QUERIES = [
+    "tablet device lost",
+    "laptop stolen from car what do I do",
+    "vpn setup on home laptop",
+    "forgot my password",
+    "acceptable use policy",
+    "how to raise a tms ticket",
+    "outlook not syncing",
+    "printer not working",
+]
+
+
+# ---------------------------
+# Sources
+# ---------------------------
+def read_csv_source(path):
+    """
+    Yields (policy, text, metadata) per documents.csv row.
+    """
+    csv.field_size_limit(sys.maxsize)
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            text = (row.get("content") or "").strip()
+            if not text:
+                continue
+            try:
+                metadata = json.loads(row.get("metadata") or "{}")
+            except ValueError:
+                metadata = {}
+            if not isinstance(metadata, dict):
+                metadata = {}
+            metadata.setdefault("source_id", row.get("id"))
+            yield policy_name(text, metadata, fallback=f"Document {row.get('id')}"), text, metadata
+
+
+def read_dir_source(path):
+    for name in sorted(os.listdir(path)):
+        if not name.lower().endswith((".txt", ".md")):
+            continue
+        with open(os.path.join(path, name), encoding="utf-8") as f:
+            text = f.read()
+        stem = os.path.splitext(name)[0].replace("_", " ").replace("-", " ").strip().title()
+        yield policy_name(text, None, fallback=stem), text, {"source": name}
+
+
+def write_rows(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(("id", "content", "metadata", "embedding"))
+        for r in rows:
+            writer.writerow((r["id"], r["content"], json.dumps(r["metadata"], ensure_ascii=False), ""))
+
+
+# ---------------------------
+# Report
+# ---------------------------
+def corpus_stats(texts):
+    tokens = [estimate_tokens(t) for t in texts]
+    return {
+        "documents": len(texts),
+        "tokens": sum(tokens),
+        "avg_tokens": round(statistics.mean(tokens), 1) if tokens else 0.0,
+        "max_tokens": max(tokens) if tokens else 0,
+    }
+
+
+def prompt_tokens(embedder, texts, queries, k):
+    """
+    Average tokens of the top-k retrieved texts per query: raw, and after
+    the ContextBuilder budget (what actually reaches the prompt).
+    """
+    matrix = embedder.encode(texts, batch_size=64)
+    matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    query_vectors = embedder.encode(queries, batch_size=64)
+    query_vectors = query_vectors / np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+    builder = ContextBuilder()
+
+    raw, sent = [], []
+    for query, vector in zip(queries, query_vectors):
+        scores = matrix @ vector
+        top = np.argsort(-scores)[:k]
+        documents = [{"id": int(i), "content": texts[i], "similarity": float(scores[i])} for i in top]
+        raw.append(sum(estimate_tokens(d["content"]) for d in documents))
+        sent.append(builder.select_documents(documents, query)[2])
+    return round(statistics.mean(raw), 1), round(statistics.mean(sent), 1)
+
+
+def load_queries(path):
+    if not path or not os.path.exists(path):
+        return DEFAULT_QUERIES
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()] or DEFAULT_QUERIES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk source policies for seed_db.py")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-csv", help="documents.csv-style file, one policy per row")
+    source.add_argument("--from-dir", help="directory of .txt/.md policy files")
+    parser.add_argument("--out", default="documents.chunked.csv")
+    parser.add_argument("--max-tokens", type=int, default=200, help="chunk size bound (~4 chars/token)")
+    parser.add_argument("--overlap-tokens", type=int, default=40, help="sentence overlap between chunks")
+    parser.add_argument("--min-tokens", type=int, default=3, help="drop fragments smaller than this")
+    parser.add_argument("--report", action="store_true", help="embed before/after and compare prompt tokens")
+    parser.add_argument("--queries", default=None, help="one query per line for --report")
+    parser.add_argument("--k", type=int, default=4, help="documents retrieved per query for --report")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    policies = list(read_csv_source(args.from_csv) if args.from_csv else read_dir_source(args.from_dir))
+    pipeline = ChunkingPipeline(args.max_tokens, args.overlap_tokens, args.min_tokens)
+    rows = pipeline.run(policies)
+    write_rows(args.out, rows)
+    print(f"✂️ {len(policies)} policies -> {len(rows)} chunks ({pipeline.duplicates} duplicates dropped) "
+          f"in {time.perf_counter() - start:.1f}s -> {args.out}")
+
+    before = corpus_stats([text for _, text, _ in policies])
+    after = corpus_stats([r["content"] for r in rows])
+    print(f"\n   {'':<22}{'before':>10}{'after':>10}")
+    for key in ("documents", "tokens", "avg_tokens", "max_tokens"):
+        print(f"   {key:<22}{before[key]:>10}{after[key]:>10}")
+
+    if args.report and rows:
+        from backend.embedders import embedder_from_env
+
+        print("\n⏳ Embedding both corpora for the retrieval report...")
+        embedder = embedder_from_env()
+        queries = load_queries(args.queries)
+        raw_before, sent_before = prompt_tokens(embedder, [text for _, text, _ in policies], queries, args.k)
+        raw_after, sent_after = prompt_tokens(embedder, [r["content"] for r in rows], queries, args.k)
+        print(f"\n   Avg context tokens per query ({len(queries)} queries, top {args.k}):")
+        print(f"   {'retrieved (raw)':<22}{raw_before:>10}{raw_after:>10}")
+        print(f"   {'sent (after budget)':<22}{sent_before:>10}{sent_after:>10}")
+
+    print(f"\nNext: python seed_db.py {args.out} --prune && python reindex_db.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+-- Adds the corpus version stamp to an existing database (init.sql has it for new ones)
+
+-- Corpus version: bumped by any write to it_documents so caches can invalidate.
+-- A one-row table, not a sequence: the new value only becomes visible when the
+-- writing transaction commits (and is undone on rollback), so a reader never
+-- sees a version newer than the rows it can see. The bump runs before the
+-- statement and holds the row lock until commit, so writers take versions in
+-- commit order.
+CREATE TABLE IF NOT EXISTS it_corpus_version (
+  id boolean primary key default true check (id),
+  version bigint not null
+);
+INSERT INTO it_corpus_version (version) VALUES (0) ON CONFLICT DO NOTHING;
+
+-- Databases that used the sequence-based version keep counting up from it
+DO $$
+begin
+  if to_regclass('it_corpus_version_seq') is not null then
+    update it_corpus_version set version = greatest(version, (select last_value from it_corpus_version_seq));
+  end if;
+end;
+$$;
+
+CREATE OR REPLACE FUNCTION bump_it_corpus_version() returns trigger
+language plpgsql
+as $$
+begin
+  update it_corpus_version set version = version + 1;
+  return null;
+end;
+$$;
+
+DROP TRIGGER IF EXISTS it_documents_corpus_version ON it_documents;
+CREATE TRIGGER it_documents_corpus_version
+BEFORE INSERT OR UPDATE OR DELETE OR TRUNCATE ON it_documents
+FOR EACH STATEMENT EXECUTE FUNCTION bump_it_corpus_version();
+
+CREATE OR REPLACE FUNCTION it_corpus_version() returns bigint
+language sql
+stable
+as $$
+  select version from it_corpus_version;
+$$;
+
+-- Per-row version so in-process indexes can refresh incrementally: the corpus
+-- version this statement bumped to, so a row becomes visible together with
+-- its version and "row_version > loaded version" never misses a late commit
+ALTER TABLE it_documents ADD COLUMN IF NOT EXISTS row_version bigint;
+
+CREATE OR REPLACE FUNCTION stamp_it_document_row_version() returns trigger
+language plpgsql
+as $$
+begin
+  new.row_version := (select version from it_corpus_version);
+  return new;
+end;
+$$;
+
+-- The old sequence-based version (its value was carried over above)
+DROP SEQUENCE IF EXISTS it_corpus_version_seq;
+
+DROP TRIGGER IF EXISTS it_documents_row_version ON it_documents;
+CREATE TRIGGER it_documents_row_version
+BEFORE INSERT OR UPDATE ON it_documents
+FOR EACH ROW EXECUTE FUNCTION stamp_it_document_row_version();
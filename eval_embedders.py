@@ -0,0 +1,156 @@
+"""
+Compares embedding backends against the current model (torch fp32) on it_documents:
+- load time, corpus encode throughput, single-query encode latency (p50/p95)
+- top-k overlap with the baseline, two ways:
+    mixed    -> backend query vectors searched against the torch-embedded corpus
+                (only the API switches backend, no re-index)
+    reindex  -> backend queries against a corpus re-embedded with the same backend
+- mean cosine between backend and baseline vectors for the same text
+
+Usage: python eval_embedders.py [--backends torch-int8,onnx,onnx-int8] [--k 4]
+                                [--limit 2000] [--queries questions.jsonl]
+"""
+import argparse
+import json
+import statistics
+import time
+import numpy as np
+import psycopg2
+from backend.db_pool import db_params
+from backend.embedders import load_embedder
+
+# Typical helpdesk questions, used when no --queries file is given
+DEFAULT_QUERIES = [
+    "tablet device lost",
+    "laptop stolen from car what do I do",
+    "vpn setup on home laptop",
+    "forgot my password",
+    "password policy length",
+    "acceptable use policy",
+    "data security policy usb drives",
+    "how to raise a tms ticket",
+    "asset loss penalty annexure",
+    "outlook not syncing",
+    "printer not working",
+    "request new software installation",
+    "wifi keeps disconnecting",
+    "email phishing report",
+    "laptop policy for new joiners",
+]
+
+
+def load_queries(path):
+    if not path:
+        return DEFAULT_QUERIES
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                row = json.loads(line)
+                line = row.get("question") or row.get("title") or ""
+            if line:
+                queries.append(line)
+    return queries
+
+
+def load_corpus(limit):
+    conn = psycopg2.connect(**db_params())
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT content FROM it_documents WHERE content IS NOT NULL ORDER BY id LIMIT %s",
+            (limit,),
+        )
+        rows = cur.fetchall()
+    conn.close()
+    return [r[0] for r in rows]
+
+
+def normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(queries, corpus, k):
+    sims = normalize(queries) @ normalize(corpus).T
+    return np.argsort(-sims, axis=1)[:, :k]
+
+
+def overlap(a, b):
+    k = a.shape[1]
+    return float(np.mean([len(set(x) & set(y)) / k for x, y in zip(a, b)]))
+
+
+def evaluate(backend, texts, queries, encode_batch_size):
+    start = time.perf_counter()
+    embedder = load_embedder(backend)
+    load_s = time.perf_counter() - start
+
+    embedder.encode(queries[:2])  # warm-up
+    latencies = []
+    query_vectors = []
+    for q in queries:
+        t = time.perf_counter()
+        query_vectors.append(embedder.encode(q))
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    start = time.perf_counter()
+    corpus = embedder.encode(texts, batch_size=encode_batch_size)
+    corpus_s = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "version": embedder.version,
+        "load_s": load_s,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "docs_per_s": len(texts) / corpus_s if corpus_s else 0.0,
+        "queries": np.stack(query_vectors),
+        "corpus": corpus,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and top-k overlap of embedding backends")
+    parser.add_argument("--backends", default="torch-int8,onnx,onnx-int8", help="comma-separated, compared to torch")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=2000, help="max documents loaded from it_documents")
+    parser.add_argument("--queries", default=None, help="jsonl (question/title) or one question per line")
+    parser.add_argument("--encode-batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.limit)
+    queries = load_queries(args.queries)
+    if not texts:
+        print("❌ it_documents is empty; run seed_db.py first.")
+        return
+    print(f"📚 {len(texts)} documents, {len(queries)} queries, k={args.k}\n")
+
+    base = evaluate("torch", texts, queries, args.encode_batch_size)
+    base_top = top_k(base["queries"], base["corpus"], args.k)
+
+    print(f"{'backend':<30}{'load':>8}{'p50 ms':>9}{'p95 ms':>9}{'docs/s':>9}"
+          f"{'cosine':>8}{'mixed':>8}{'reindex':>9}")
+    print(f"{base['version']:<30}{base['load_s']:7.1f}s{base['p50_ms']:9.2f}{base['p95_ms']:9.2f}"
+          f"{base['docs_per_s']:9.0f}{1.0:8.3f}{1.0:8.2f}{1.0:9.2f}")
+
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        try:
+            r = evaluate(backend, texts, queries, args.encode_batch_size)
+        except Exception as e:
+            print(f"{backend:<30}skipped: {repr(e)}")
+            continue
+        cosine = float(np.mean(np.sum(normalize(r["corpus"]) * normalize(base["corpus"]), axis=1)))
+        mixed = overlap(top_k(r["queries"], base["corpus"], args.k), base_top)
+        reindex = overlap(top_k(r["queries"], r["corpus"], args.k), base_top)
+        print(f"{r['version']:<30}{r['load_s']:7.1f}s{r['p50_ms']:9.2f}{r['p95_ms']:9.2f}"
+              f"{r['docs_per_s']:9.0f}{cosine:8.3f}{mixed:8.2f}{reindex:9.2f}")
+
+    print("\nmixed/reindex = mean top-k overlap with torch; switch only if close to 1.0.")
+
+
+if __name__ == "__main__":
+    main()
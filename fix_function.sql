@@ -1,7 +1,12 @@
+-- Old 3-argument version would otherwise stay around as an ambiguous overload
+DROP FUNCTION IF EXISTS match_it_documents(vector, int, jsonb);
+
 CREATE OR REPLACE FUNCTION match_it_documents (
   query_embedding vector(768),
   match_count int default null,
-  filter jsonb DEFAULT '{}'
+  filter jsonb DEFAULT '{}',
+  ef_search int default null,
+  probes int default null
 ) returns table (
   id bigint,
   content text,
@@ -11,6 +16,14 @@ CREATE OR REPLACE FUNCTION match_it_documents (
 language plpgsql
 as $$
 begin
+  -- ANN recall knobs (transaction-local; ignored when no such index exists)
+  if ef_search is not null then
+    perform set_config('hnsw.ef_search', ef_search::text, true);
+  end if;
+  if probes is not null then
+    perform set_config('ivfflat.probes', probes::text, true);
+  end if;
+
   return query
   select
     it_documents.id,
@@ -1,7 +1,69 @@
 import { useState, useRef, useEffect } from 'react';
-import axios from 'axios';
 import { motion, AnimatePresence } from 'framer-motion';
-import { Send, Bot, User, Sparkles, Loader2, Download } from 'lucide-react';
+import { Send, Bot, User, Sparkles, Loader2, Download, Paperclip, X } from 'lucide-react';
+
+// CHANGE IP HERE IF NEEDED
+const API_BASE = 'http://172.16.1.53:8000';
+
+// Screenshots are shrunk to this longest side before upload (matches the server's VISION_MAX_SIDE)
+const UPLOAD_MAX_SIDE = 1280;
+
+const STAGE_LABELS = {
+  accepted: 'Thinking...',
+  cache: 'Found a matching answer...',
+  vision: 'Screenshot analyzed. Searching policies...',
+  retrieval: 'Policies found. Writing answer...',
+  degraded: 'Taking too long. Sending the closest policy sections...',
+};
+
+// Reads a text/event-stream body and calls onEvent(event, data) per message
+async function readSSE(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      const dataLines = [];
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+      }
+      if (dataLines.length) onEvent(event, JSON.parse(dataLines.join('\n')));
+    }
+  }
+}
+
+// Large images -> JPEG within UPLOAD_MAX_SIDE; small ones are sent untouched
+async function downscaleImage(file) {
+  const bitmap = await createImageBitmap(file);
+  const scale = UPLOAD_MAX_SIDE / Math.max(bitmap.width, bitmap.height);
+  if (scale >= 1) {
+    bitmap.close();
+    return file;
+  }
+  const canvas = document.createElement('canvas');
+  canvas.width = Math.round(bitmap.width * scale);
+  canvas.height = Math.round(bitmap.height * scale);
+  const ctx = canvas.getContext('2d');
+  // Flatten transparency on white so screenshot text stays readable
+  ctx.fillStyle = '#fff';
+  ctx.fillRect(0, 0, canvas.width, canvas.height);
+  ctx.drawImage(bitmap, 0, 0, canvas.width, canvas.height);
+  bitmap.close();
+  const blob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg', 0.85));
+  if (!blob) return file;
+  return new File([blob], file.name.replace(/\.[^.]+$/, '') + '.jpg', { type: 'image/jpeg' });
+}
 
 function App() {
   const [question, setQuestion] = useState('');
@@ -12,7 +74,10 @@ function App() {
     }
   ]);
   const [isLoading, setIsLoading] = useState(false);
+  const [stage, setStage] = useState('');
+  const [image, setImage] = useState(null);
   const messagesEndRef = useRef(null);
+  const fileInputRef = useRef(null);
 
   // Auto-scroll
   const scrollToBottom = () => {
@@ -36,11 +101,18 @@ function App() {
     document.body.removeChild(a);
   };
 
+  const handleAttach = (e) => {
+    const file = e.target.files?.[0];
+    if (file) setImage(file);
+    e.target.value = '';
+  };
+
   const handleAsk = async (e) => {
     e.preventDefault();
     if (!question.trim()) return;
 
-    const userMsg = { type: 'user', text: question };
+    const userMsg = { type: 'user', text: question, image: image?.name };
+    const attached = image;
 
     // 1. Prepare History (Last 5 exchanges to keep context)
     // We act like a "sliding window" of memory
@@ -48,22 +120,74 @@ function App() {
 
     setMessages(prev => [...prev, userMsg]);
     setQuestion('');
+    setImage(null);
     setIsLoading(true);
+    setStage(STAGE_LABELS.accepted);
+
+    // Streamed answer is written into one bot message, added on first text
+    let botAdded = false;
+    const setBotText = (text) => {
+      if (!botAdded) {
+        botAdded = true;
+        setMessages(prev => [...prev, { type: 'bot', text }]);
+        return;
+      }
+      setMessages(prev => {
+        const next = [...prev];
+        next[next.length - 1] = { ...next[next.length - 1], text };
+        return next;
+      });
+    };
 
     try {
-      // 2. Send Question + History to Backend
-      // CHANGE IP HERE IF NEEDED
-      const response = await axios.post('http://172.16.1.53:8000/ask', {
-        question: userMsg.text,
-        chat_history: recentHistory 
+      // 2. Send Question + History (+ raw screenshot) as multipart, answer streams back as SSE
+      const form = new FormData();
+      form.append('question', userMsg.text);
+      form.append('chat_history', JSON.stringify(recentHistory));
+      form.append('stream', '1');
+      if (attached) {
+        const upload = await downscaleImage(attached).catch(() => attached);
+        form.append('image', upload, upload.name);
+      }
+      const response = await fetch(`${API_BASE}/ask/upload`, { method: 'POST', body: form });
+
+      if (response.status === 413 || response.status === 415) {
+        const data = await response.json().catch(() => ({}));
+        setBotText(data.answer || 'That image could not be sent.');
+        return;
+      }
+      if (response.status === 503 || response.status === 429) {
+        const retryAfter = response.headers.get('Retry-After') || 'a few';
+        setBotText(`Support bot is busy. Please retry in ${retryAfter} seconds.`);
+        return;
+      }
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+      let answer = '';
+      await readSSE(response, (event, data) => {
+        if (event === 'stage') {
+          if (data.stage === 'retrieval' && data.documents?.length) {
+            const best = Math.max(...data.documents.map(d => d.similarity));
+            setStage(`${data.documents.length} policy matches (best ${best.toFixed(2)}). Writing answer...`);
+          } else if (STAGE_LABELS[data.stage]) {
+            setStage(STAGE_LABELS[data.stage]);
+          }
+        } else if (event === 'token') {
+          answer += data.text || '';
+          setBotText(answer);
+        } else if (event === 'done' || event === 'error') {
+          answer = data.answer || answer;
+          setBotText(answer);
+        }
       });
 
-      setMessages(prev => [...prev, { type: 'bot', text: response.data.answer }]);
+      if (!answer) setBotText('No answer received.');
     } catch (error) {
       console.error(error);
-      setMessages(prev => [...prev, { type: 'bot', text: "Error: Server unreachable. Please check connection." }]);
+      setBotText("Error: Server unreachable. Please check connection.");
     } finally {
       setIsLoading(false);
+      setStage('');
     }
   };
 
@@ -114,6 +238,11 @@ function App() {
                     : 'bg-slate-800 border border-slate-700 text-gray-200 rounded-tl-none'
                 }`}>
                   {msg.text}
+                  {msg.image && (
+                    <div className="mt-1 text-[11px] opacity-75 flex items-center gap-1">
+                      <Paperclip size={12} /> {msg.image}
+                    </div>
+                  )}
                 </div>
               </div>
             </motion.div>
@@ -122,7 +251,7 @@ function App() {
           {isLoading && (
             <div className="flex items-center ml-12 text-gray-400 text-sm">
               <Loader2 className="animate-spin mr-2" size={16} /> 
-              <span className="animate-pulse">Thinking...</span>
+              <span className="animate-pulse">{stage || 'Thinking...'}</span>
             </div>
           )}
         </AnimatePresence>
@@ -131,13 +260,39 @@ function App() {
 
       {/* Input Area */}
       <div className="p-4 bg-slate-800/50 border-t border-slate-700">
+        {image && (
+          <div className="max-w-4xl mx-auto mb-2 flex">
+            <span className="flex items-center gap-2 text-xs bg-slate-900 border border-slate-700 rounded-full px-3 py-1 text-gray-300">
+              <Paperclip size={12} /> {image.name}
+              <button type="button" onClick={() => setImage(null)} className="hover:text-white" title="Remove image">
+                <X size={12} />
+              </button>
+            </span>
+          </div>
+        )}
         <form onSubmit={handleAsk} className="relative flex items-center max-w-4xl mx-auto">
+          <input
+            ref={fileInputRef}
+            type="file"
+            accept="image/png,image/jpeg"
+            onChange={handleAttach}
+            className="hidden"
+          />
+          <button
+            type="button"
+            onClick={() => fileInputRef.current?.click()}
+            disabled={isLoading}
+            className="absolute left-2 p-2 text-gray-400 hover:text-white disabled:opacity-50 rounded-full transition-all"
+            title="Attach screenshot"
+          >
+            <Paperclip size={18} />
+          </button>
           <input
             type="text"
             value={question}
             onChange={(e) => setQuestion(e.target.value)}
             placeholder="Ask me anything..."
-            className="w-full bg-slate-900 text-white rounded-full py-3.5 pl-6 pr-14 focus:outline-none focus:ring-2 focus:ring-blue-500 border border-slate-700 shadow-lg"
+            className="w-full bg-slate-900 text-white rounded-full py-3.5 pl-12 pr-14 focus:outline-none focus:ring-2 focus:ring-blue-500 border border-slate-700 shadow-lg"
           />
           <button 
             type="submit" 
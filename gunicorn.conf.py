@@ -0,0 +1,34 @@
+"""
+Multi-worker server with the embedding model shared copy-on-write.
+
+Usage: gunicorn -c gunicorn.conf.py backend.main:app
+
+WEB_CONCURRENCY          -> worker processes (default 2)
+BIND                     -> listen address (default 0.0.0.0:8000)
+GUNICORN_PRELOAD         -> "0" loads everything per worker instead (for comparison)
+GUNICORN_TIMEOUT         -> seconds before a silent worker is restarted (default 120)
+PRELOAD_LLM_STACK        -> "0" skips importing crewai / google-genai in the master
+TORCH_THREADS_PER_WORKER -> torch threads per worker (default cores / workers)
+
+Each worker still runs its own lifespan: DB pools, warm-up (one encode),
+executors and the Gemini client are per process.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+
+
+def when_ready(server):
+    # Master, after backend.main is imported and before any worker is forked
+    if preload_app:
+        from backend.prefork import preload
+        preload()
+
+
+def post_fork(server, worker):
+    from backend.prefork import after_fork
+    after_fork(server.cfg.workers)
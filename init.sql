@@ -4,13 +4,17 @@ CREATE TABLE IF NOT EXISTS it_documents (
   id bigserial primary key,
   content text,
   metadata jsonb,
-  embedding vector(768)
+  embedding vector(768),
+  content_hash text,      -- md5(content) the embedding was computed from
+  embedding_model text    -- model that produced the embedding (reindex_db.py)
 );
 
 CREATE OR REPLACE FUNCTION match_it_documents (
   query_embedding vector(768),
   match_count int default null,
-  filter jsonb DEFAULT '{}'
+  filter jsonb DEFAULT '{}',
+  ef_search int default null,
+  probes int default null
 ) returns table (
   id bigint,
   content text,
@@ -20,15 +24,81 @@ CREATE OR REPLACE FUNCTION match_it_documents (
 language plpgsql
 as $$
 begin
+  -- ANN recall knobs (transaction-local; ignored when no such index exists)
+  if ef_search is not null then
+    perform set_config('hnsw.ef_search', ef_search::text, true);
+  end if;
+  if probes is not null then
+    perform set_config('ivfflat.probes', probes::text, true);
+  end if;
+
   return query
   select
-    id,
-    content,
-    metadata,
+    it_documents.id,
+    it_documents.content,
+    it_documents.metadata,
     1 - (it_documents.embedding <=> query_embedding) as similarity
   from it_documents
-  where metadata @> filter
+  where it_documents.metadata @> filter
   order by it_documents.embedding <=> query_embedding
   limit match_count;
 end;
 $$;
+
+-- ANN + metadata indexes (manage_index.py builds/rebuilds/tunes these)
+CREATE INDEX IF NOT EXISTS it_documents_embedding_hnsw_idx
+  ON it_documents USING hnsw (embedding vector_cosine_ops);
+CREATE INDEX IF NOT EXISTS it_documents_metadata_gin_idx
+  ON it_documents USING gin (metadata jsonb_path_ops);
+
+-- Corpus version: bumped by any write to it_documents so caches can invalidate.
+-- A one-row table, not a sequence: the new value only becomes visible when the
+-- writing transaction commits (and is undone on rollback), so a reader never
+-- sees a version newer than the rows it can see. The bump runs before the
+-- statement and holds the row lock until commit, so writers take versions in
+-- commit order.
+CREATE TABLE IF NOT EXISTS it_corpus_version (
+  id boolean primary key default true check (id),
+  version bigint not null
+);
+INSERT INTO it_corpus_version (version) VALUES (0) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_it_corpus_version() returns trigger
+language plpgsql
+as $$
+begin
+  update it_corpus_version set version = version + 1;
+  return null;
+end;
+$$;
+
+DROP TRIGGER IF EXISTS it_documents_corpus_version ON it_documents;
+CREATE TRIGGER it_documents_corpus_version
+BEFORE INSERT OR UPDATE OR DELETE OR TRUNCATE ON it_documents
+FOR EACH STATEMENT EXECUTE FUNCTION bump_it_corpus_version();
+
+CREATE OR REPLACE FUNCTION it_corpus_version() returns bigint
+language sql
+stable
+as $$
+  select version from it_corpus_version;
+$$;
+
+-- Per-row version so in-process indexes can refresh incrementally: the corpus
+-- version this statement bumped to, so a row becomes visible together with
+-- its version and "row_version > loaded version" never misses a late commit
+ALTER TABLE it_documents ADD COLUMN IF NOT EXISTS row_version bigint;
+
+CREATE OR REPLACE FUNCTION stamp_it_document_row_version() returns trigger
+language plpgsql
+as $$
+begin
+  new.row_version := (select version from it_corpus_version);
+  return new;
+end;
+$$;
+
+DROP TRIGGER IF EXISTS it_documents_row_version ON it_documents;
+CREATE TRIGGER it_documents_row_version
+BEFORE INSERT OR UPDATE ON it_documents
+FOR EACH ROW EXECUTE FUNCTION stamp_it_document_row_version();
@@ -0,0 +1,283 @@
+"""
+ANN index management for it_documents.
+
+  python manage_index.py build  --method hnsw    [--m 16] [--ef-construction 64]
+  python manage_index.py build  --method ivfflat [--lists N]
+  python manage_index.py rebuild
+  python manage_index.py drop   [--method hnsw|ivfflat]
+  python manage_index.py status
+  python manage_index.py report [--queries 50] [--questions q.txt] [--noise 0.5] [--k 4]
+                                [--ef 20,40,80,160] [--probes 1,4,10]
+
+The report compares ANN search against exact (sequential) search:
+recall@k and latency, through match_it_documents with the ef_search /
+probes values under test (what the app calls). Queries are never stored
+embeddings as-is (each would find itself at rank 1):
+  - --questions: one question per line, embedded with EMBEDDING_BACKEND
+  - otherwise: stored embeddings with random noise added (--noise)
+"""
+import argparse
+import json
+import math
+import statistics
+import time
+import numpy as np
+import psycopg2
+from pgvector.psycopg2 import register_vector
+from backend.db_pool import VECTOR_EF_SEARCH, VECTOR_PROBES, db_params
+
+HNSW_INDEX = "it_documents_embedding_hnsw_idx"
+IVFFLAT_INDEX = "it_documents_embedding_ivfflat_idx"
+METADATA_INDEX = "it_documents_metadata_gin_idx"
+
+# Same function (and knobs) the app searches through
+SEARCH_SQL = "SELECT id FROM match_it_documents(%s, %s, %s, %s, %s)"
+
+
+def connect(autocommit=False):
+    conn = psycopg2.connect(**db_params())
+    conn.autocommit = autocommit
+    register_vector(conn)
+    return conn
+
+
+def row_count(cur) -> int:
+    cur.execute("SELECT count(*) FROM it_documents WHERE embedding IS NOT NULL")
+    return cur.fetchone()[0]
+
+
+# ---------------------------
+# build / rebuild / drop
+# ---------------------------
+def build(args):
+    # CONCURRENTLY keeps the table writable; it can't run inside a transaction
+    conn = connect(autocommit=True)
+    cur = conn.cursor()
+    cur.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+
+    if args.method == "hnsw":
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {IVFFLAT_INDEX}")
+        print(f"⏳ Building HNSW index (m={args.m}, ef_construction={args.ef_construction})...")
+        start = time.perf_counter()
+        cur.execute(
+            f"""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS {HNSW_INDEX}
+            ON it_documents USING hnsw (embedding vector_cosine_ops)
+            WITH (m = %s, ef_construction = %s)
+            """,
+            (args.m, args.ef_construction),
+        )
+    else:
+        rows = row_count(cur)
+        # pgvector guidance: rows/1000 up to 1M rows, sqrt(rows) above
+        lists = args.lists or max(1, rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows)))
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {HNSW_INDEX}")
+        print(f"⏳ Building IVFFlat index (lists={lists}, {rows} rows)...")
+        start = time.perf_counter()
+        cur.execute(
+            f"""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS {IVFFLAT_INDEX}
+            ON it_documents USING ivfflat (embedding vector_cosine_ops)
+            WITH (lists = %s)
+            """,
+            (lists,),
+        )
+    print(f"✅ Vector index ready in {time.perf_counter() - start:.1f}s")
+
+    cur.execute(
+        f"""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS {METADATA_INDEX}
+        ON it_documents USING gin (metadata jsonb_path_ops)
+        """
+    )
+    cur.execute("ANALYZE it_documents")
+    print("✅ Metadata GIN index ready, table analyzed.")
+    conn.close()
+
+
+def rebuild(args):
+    conn = connect(autocommit=True)
+    cur = conn.cursor()
+    for name in (HNSW_INDEX, IVFFLAT_INDEX, METADATA_INDEX):
+        cur.execute("SELECT to_regclass(%s)", (name,))
+        if cur.fetchone()[0] is None:
+            continue
+        print(f"⏳ Reindexing {name}...")
+        start = time.perf_counter()
+        cur.execute(f"REINDEX INDEX CONCURRENTLY {name}")
+        print(f"✅ {name} rebuilt in {time.perf_counter() - start:.1f}s")
+    cur.execute("ANALYZE it_documents")
+    conn.close()
+
+
+def drop(args):
+    conn = connect(autocommit=True)
+    cur = conn.cursor()
+    names = {"hnsw": [HNSW_INDEX], "ivfflat": [IVFFLAT_INDEX]}.get(args.method, [HNSW_INDEX, IVFFLAT_INDEX])
+    for name in names:
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        print(f"🗑️ Dropped {name} (if it existed)")
+    conn.close()
+
+
+def status(args):
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT indexname, pg_size_pretty(pg_relation_size(indexname::regclass)), indexdef
+        FROM pg_indexes
+        WHERE tablename = 'it_documents'
+        ORDER BY indexname
+        """
+    )
+    print(f"📂 {row_count(cur)} embedded documents")
+    for name, size, definition in cur.fetchall():
+        print(f" - {name} ({size})\n   {definition}")
+    conn.close()
+
+
+# ---------------------------
+# recall vs latency report
+# ---------------------------
+def timed_search(cur, settings, vec, k, ef_search=None, probes=None):
+    # Fresh transaction per query so SET LOCAL never leaks between modes
+    for stmt in settings:
+        cur.execute(stmt)
+    start = time.perf_counter()
+    cur.execute(SEARCH_SQL, (vec, k, json.dumps({}), ef_search, probes))
+    ids = [r[0] for r in cur.fetchall()]
+    elapsed = (time.perf_counter() - start) * 1000
+    cur.connection.rollback()
+    return ids, elapsed
+
+
+def summarize(label, latencies, recalls=None):
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    recall = f"{statistics.mean(recalls):8.3f}" if recalls is not None else f"{1.0:8.3f}"
+    print(f"{label:<22} {recall} {statistics.mean(latencies):10.2f} {p95:10.2f}")
+
+
+def question_queries(path):
+    from backend.embedders import embedder_from_env
+
+    with open(path, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    if not questions:
+        return []
+    vectors = embedder_from_env().encode(questions, batch_size=64)
+    return [np.asarray(v, dtype=np.float32) for v in vectors]
+
+
+def perturbed_queries(cur, n, noise, seed=0):
+    """
+    Stored embeddings moved by a random vector of length ~noise (cosine
+    ~1/sqrt(1 + noise^2) to the original), so the nearest neighbours are
+    not just the source row.
+    """
+    cur.execute(
+        "SELECT embedding FROM it_documents WHERE embedding IS NOT NULL ORDER BY random() LIMIT %s",
+        (n,),
+    )
+    rows = [np.asarray(r[0].to_numpy() if hasattr(r[0], "to_numpy") else r[0], dtype=np.float32) for r in cur.fetchall()]
+    cur.connection.rollback()
+    rng = np.random.default_rng(seed)
+    queries = []
+    for vec in rows:
+        vec = vec / max(float(np.linalg.norm(vec)), 1e-12)
+        moved = vec + rng.normal(0.0, noise / math.sqrt(vec.shape[0]), vec.shape[0]).astype(np.float32)
+        queries.append(moved / max(float(np.linalg.norm(moved)), 1e-12))
+    return queries
+
+
+def report(args):
+    conn = connect()
+    cur = conn.cursor()
+    # match_it_documents' query plan is cached per session: replan every call
+    # so the exact run (index scans off) and the ANN runs don't share a plan
+    cur.execute("SET plan_cache_mode = force_custom_plan")
+    conn.commit()
+    if args.questions:
+        queries = question_queries(args.questions)
+        source = f"questions from {args.questions}"
+    else:
+        queries = perturbed_queries(cur, args.queries, args.noise)
+        source = f"stored embeddings + noise {args.noise}"
+    if not queries:
+        print("❌ No queries: empty questions file or no embedded documents.")
+        return
+
+    exact_settings = ["SET LOCAL enable_indexscan = off", "SET LOCAL enable_bitmapscan = off"]
+    truth, exact_lat = [], []
+    for vec in queries:
+        ids, ms = timed_search(cur, exact_settings, vec, args.k)
+        truth.append(set(ids))
+        exact_lat.append(ms)
+
+    print(f"\n📊 {len(queries)} queries ({source}), k={args.k}\n")
+    print(f"{'mode':<22} {'recall':>8} {'mean ms':>10} {'p95 ms':>10}")
+    summarize("exact (seq scan)", exact_lat)
+
+    # (label, ef_search, probes) passed to match_it_documents
+    modes = [(f"hnsw ef_search={ef}", int(ef), None) for ef in args.ef]
+    modes += [(f"ivfflat probes={p}", None, int(p)) for p in args.probes]
+    if VECTOR_EF_SEARCH or VECTOR_PROBES:
+        modes.append(("app (env knobs)", VECTOR_EF_SEARCH, VECTOR_PROBES))
+
+    cur.execute("SELECT to_regclass(%s), to_regclass(%s)", (HNSW_INDEX, IVFFLAT_INDEX))
+    has_hnsw, has_ivfflat = (x is not None for x in cur.fetchone())
+    conn.rollback()
+
+    for label, ef_search, probes in modes:
+        if (label.startswith("hnsw") and not has_hnsw) or (label.startswith("ivfflat") and not has_ivfflat):
+            continue
+        recalls, lat = [], []
+        for vec, expected in zip(queries, truth):
+            ids, ms = timed_search(cur, [], vec, args.k, ef_search, probes)
+            recalls.append(len(expected & set(ids)) / max(1, len(expected)))
+            lat.append(ms)
+        summarize(label, lat, recalls)
+    conn.close()
+
+
+def int_list(value):
+    return [int(x) for x in value.split(",") if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage ANN indexes on it_documents")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="create the vector + metadata indexes")
+    p.add_argument("--method", choices=["hnsw", "ivfflat"], default="hnsw")
+    p.add_argument("--m", type=int, default=16)
+    p.add_argument("--ef-construction", type=int, default=64)
+    p.add_argument("--lists", type=int, default=0, help="ivfflat lists (default: from row count)")
+    p.add_argument("--maintenance-work-mem", default="512MB")
+    p.set_defaults(func=build)
+
+    p = sub.add_parser("rebuild", help="REINDEX existing indexes concurrently")
+    p.set_defaults(func=rebuild)
+
+    p = sub.add_parser("drop", help="drop vector indexes")
+    p.add_argument("--method", choices=["hnsw", "ivfflat"])
+    p.set_defaults(func=drop)
+
+    p = sub.add_parser("status", help="list it_documents indexes")
+    p.set_defaults(func=status)
+
+    p = sub.add_parser("report", help="recall vs latency against exact search")
+    p.add_argument("--queries", type=int, default=50, help="perturbed stored embeddings to query with")
+    p.add_argument("--noise", type=float, default=0.5, help="length of the random offset added to each")
+    p.add_argument("--questions", default=None, help="held-out questions file (one per line) instead")
+    p.add_argument("--k", type=int, default=4)
+    p.add_argument("--ef", type=int_list, default=[20, 40, 80, 160])
+    p.add_argument("--probes", type=int_list, default=[1, 4, 10])
+    p.set_defaults(func=report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
+import argparse
+import hashlib
+import inspect
+import json
 import os
+import time
 import psycopg2
-from sentence_transformers import SentenceTransformer
+from psycopg2.extras import execute_values
+from pgvector.psycopg2 import register_vector
 from dotenv import load_dotenv
+from backend.embedders import embedder_from_env
 
 load_dotenv()
 
@@ -14,51 +21,161 @@ DB_CONFIG = {
     "port": os.getenv("DB_PORT", "5432")
 }
 
-def reindex_data():
+CHECKPOINT_FILE = ".reindex_checkpoint.json"
+
+SCHEMA_SQL = """
+ALTER TABLE it_documents ADD COLUMN IF NOT EXISTS content_hash text;
+ALTER TABLE it_documents ADD COLUMN IF NOT EXISTS embedding_model text;
+"""
+
+# Only rows whose content or model changed since their last embedding
+STALE_SQL = """
+SELECT id, content
+FROM it_documents
+WHERE content IS NOT NULL
+  AND id > %(after_id)s
+  AND (%(force)s
+       OR embedding IS NULL
+       OR embedding_model IS DISTINCT FROM %(model)s
+       OR content_hash IS DISTINCT FROM md5(content))
+ORDER BY id
+"""
+
+UPDATE_SQL = """
+UPDATE it_documents AS d
+SET embedding = v.embedding::vector,
+    content_hash = v.content_hash,
+    embedding_model = v.model
+FROM (VALUES %s) AS v(id, embedding, content_hash, model)
+WHERE d.id = v.id
+"""
+
+
+def content_hash(text: str) -> str:
+    # Same value as Postgres md5(content) for a UTF8 database
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+# ---------------------------
+# Checkpoint (resume after interruption)
+# ---------------------------
+def load_checkpoint(model_version: str, force: bool) -> int:
+    if not os.path.exists(CHECKPOINT_FILE):
+        return 0
+    with open(CHECKPOINT_FILE, encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("model") != model_version or state.get("force") != force:
+        return 0
+    return int(state.get("last_id", 0))
+
+
+def save_checkpoint(model_version: str, force: bool, last_id: int) -> None:
+    tmp = CHECKPOINT_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"model": model_version, "force": force, "last_id": last_id}, f)
+    os.replace(tmp, CHECKPOINT_FILE)
+
+
+def clear_checkpoint() -> None:
+    if os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
+
+
+# ---------------------------
+# Encoding
+# ---------------------------
+def encode_batch(embedder, texts, pool, batch_size):
+    if pool is None:
+        return embedder.encode(texts, batch_size=batch_size)
+    model = embedder.model
+    # Newer sentence-transformers take pool= on encode(), older ones have encode_multi_process
+    if "pool" in inspect.signature(model.encode).parameters:
+        return model.encode(texts, pool=pool, batch_size=batch_size, convert_to_numpy=True)
+    return model.encode_multi_process(texts, pool, batch_size=batch_size)
+
+
+def reindex_data(batch_size=512, encode_batch_size=64, processes=0, force=False, reset=False, backend=None):
+    pool = None
+    embedder = None
     try:
-        # 1. Load the Model
+        # 1. Load the Model (EMBEDDING_BACKEND or --backend)
         print("⏳ Loading model (this may take a moment)...")
-        model = SentenceTransformer('all-mpnet-base-v2')
-        print("✅ Model loaded.")
+        embedder = embedder_from_env(backend)
+        model_version = embedder.version
+        print(f"✅ Model loaded: {model_version}")
+        if processes > 1:
+            pool = embedder.model.start_multi_process_pool(target_devices=["cpu"] * processes)
+            print(f"🧵 Encoding with {processes} processes.")
 
-        # 2. Connect to DB
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
+        # 2. Connect to DB (reader streams, writer commits per batch)
+        writer = psycopg2.connect(**DB_CONFIG)
+        register_vector(writer)
+        wcur = writer.cursor()
+        wcur.execute(SCHEMA_SQL)
+        writer.commit()
 
-        # 3. Fetch all documents (id and content only)
-        print("⏳ Fetching documents...")
-        cur.execute("SELECT id, content FROM it_documents WHERE content IS NOT NULL")
-        rows = cur.fetchall()
-        total = len(rows)
-        print(f"📂 Found {total} documents to re-index.")
+        if reset:
+            clear_checkpoint()
+        after_id = load_checkpoint(model_version, force)
+        if after_id:
+            print(f"↩️ Resuming after id {after_id}.")
 
-        # 4. Loop and Update
-        count = 0
-        for row in rows:
-            doc_id = row[0]
-            content = row[1]
+        reader = psycopg2.connect(**DB_CONFIG)
+        rcur = reader.cursor(name="reindex_stream")  # server-side cursor
+        rcur.itersize = batch_size
+        rcur.execute(STALE_SQL, {"after_id": after_id, "force": force, "model": model_version})
 
-            # Generate new valid embedding
-            new_embedding = model.encode(content).tolist()
+        # 3. Encode + write back batch by batch
+        print("⏳ Re-embedding stale documents...")
+        start = time.perf_counter()
+        count = 0
+        while True:
+            rows = rcur.fetchmany(batch_size)
+            if not rows:
+                break
 
-            # Update the row
-            cur.execute(
-                "UPDATE it_documents SET embedding = %s WHERE id = %s",
-                (str(new_embedding), doc_id)
+            texts = [r[1] for r in rows]
+            vectors = encode_batch(embedder, texts, pool, encode_batch_size)
+            execute_values(
+                wcur,
+                UPDATE_SQL,
+                [(r[0], vec, content_hash(r[1]), model_version) for r, vec in zip(rows, vectors)],
+                page_size=batch_size,
             )
+            writer.commit()
+
+            count += len(rows)
+            save_checkpoint(model_version, force, rows[-1][0])
+            rate = count / (time.perf_counter() - start)
+            print(f"   Processed {count} (last id {rows[-1][0]}, {rate:,.0f} docs/sec)...")
 
-            count += 1
-            if count % 100 == 0:
-                print(f"   Processed {count}/{total}...")
-                conn.commit() # Commit in batches
+        rcur.close()
+        reader.close()
+        wcur.close()
+        writer.close()
+        clear_checkpoint()
 
-        conn.commit()
-        cur.close()
-        conn.close()
-        print(f"🎉 Success! Re-indexed all {total} documents.")
+        elapsed = time.perf_counter() - start
+        if count:
+            print(f"🎉 Success! Re-indexed {count} documents in {elapsed:.1f}s ({count / elapsed:,.0f} docs/sec).")
+        else:
+            print("🎉 Nothing to do: every document is up to date.")
 
     except Exception as e:
-        print(f"❌ Error: {e}")
+        print(f"❌ Error: {e} (re-run to resume from the last checkpoint)")
+
+    finally:
+        if pool is not None:
+            embedder.model.stop_multi_process_pool(pool)
+
 
 if __name__ == "__main__":
-    reindex_data()
+    parser = argparse.ArgumentParser(description="Re-embed changed or stale it_documents rows")
+    parser.add_argument("--batch-size", type=int, default=512, help="rows fetched/written per batch")
+    parser.add_argument("--encode-batch-size", type=int, default=64, help="texts per model forward pass")
+    parser.add_argument("--processes", type=int, default=0, help="encode across N CPU processes")
+    parser.add_argument("--force", action="store_true", help="re-embed every row, not only stale ones")
+    parser.add_argument("--reset", action="store_true", help="ignore any saved checkpoint")
+    parser.add_argument("--backend", default=None, help="embedding backend (default: EMBEDDING_BACKEND or torch)")
+    args = parser.parse_args()
+    reindex_data(args.batch_size, args.encode_batch_size, args.processes, args.force, args.reset, args.backend)
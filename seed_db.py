@@ -1,62 +1,209 @@
+import argparse
+import csv
+import io
+import json
+import sys
+import time
 import psycopg2
-import pandas as pd
-import ast
-
-# Database connection parameters (matching your docker-compose)
-DB_CONFIG = {
-    "dbname": "vector_db",
-    "user": "user",
-    "password": "password",
-    "host": "localhost",
-    "port": "5432"
-}
-
-def seed_data():
+from backend.db_pool import db_params
+
+# Database connection parameters (matching your docker-compose, DB_* env overrides)
+DB_CONFIG = db_params()
+
+EMBEDDING_DIM = 768
+COLUMNS = ("id", "content", "metadata", "embedding")
+
+STAGING_SQL = """
+CREATE TEMP TABLE it_documents_staging (
+  seq bigserial,
+  id bigint,
+  content text,
+  metadata jsonb,
+  embedding vector(768)
+) ON COMMIT DROP
+"""
+
+COPY_SQL = "COPY it_documents_staging (id, content, metadata, embedding) FROM STDIN WITH (FORMAT csv)"
+
+# Last occurrence of an id wins; unchanged rows are skipped so they keep their row_version.
+# Rows without an embedding (chunk_documents.py output) keep the stored one;
+# reindex_db.py embeds new rows and re-embeds rows whose content changed.
+UPSERT_SQL = """
+INSERT INTO it_documents (id, content, metadata, embedding)
+SELECT DISTINCT ON (id) id, content, metadata, embedding
+FROM it_documents_staging
+ORDER BY id, seq DESC
+ON CONFLICT (id) DO UPDATE
+SET content = EXCLUDED.content,
+    metadata = EXCLUDED.metadata,
+    embedding = COALESCE(EXCLUDED.embedding, it_documents.embedding)
+WHERE (it_documents.content, it_documents.metadata)
+      IS DISTINCT FROM (EXCLUDED.content, EXCLUDED.metadata)
+   OR (EXCLUDED.embedding IS NOT NULL AND it_documents.embedding IS DISTINCT FROM EXCLUDED.embedding)
+"""
+
+# --prune: the file is the whole corpus (e.g. after re-chunking), drop rows not in it
+PRUNE_SQL = """
+DELETE FROM it_documents d
+WHERE NOT EXISTS (SELECT 1 FROM it_documents_staging s WHERE s.id = d.id)
+"""
+
+
+def validate_row(row):
+    """
+    Returns (id, content, metadata, embedding) ready for COPY, or raises ValueError.
+    An empty embedding is allowed (None -> NULL) for reindex_db.py to fill in.
+    """
+    missing = [c for c in COLUMNS if c not in row]
+    if missing:
+        raise ValueError(f"missing columns: {missing}")
+
+    doc_id = int(row["id"])
+    content = row["content"] or ""
+    if not content.strip():
+        raise ValueError("empty content")
+    if "\x00" in content:
+        raise ValueError("NUL byte in content")
+
+    metadata = (row["metadata"] or "").strip() or "{}"
+    json.loads(metadata)
+
+    embedding = (row["embedding"] or "").strip()
+    if not embedding:
+        return (doc_id, content, metadata, None)
+    if not (embedding.startswith("[") and embedding.endswith("]")):
+        raise ValueError("embedding is not a [..] vector literal")
+    if embedding.count(",") + 1 != EMBEDDING_DIM:
+        raise ValueError(f"embedding has {embedding.count(',') + 1} dims, expected {EMBEDDING_DIM}")
+
+    return (doc_id, content, metadata, embedding)
+
+
+def copy_rows(cur, rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cur.copy_expert(COPY_SQL, buf)
+
+
+def copy_chunk(cur, chunk, reject):
+    """
+    One COPY per chunk. If the server still rejects something the validator
+    missed, the chunk is retried row by row so only the bad rows are rejected.
+    Returns rows staged.
+    """
+    cur.execute("SAVEPOINT chunk")
+    try:
+        copy_rows(cur, [r for _, r in chunk])
+        cur.execute("RELEASE SAVEPOINT chunk")
+        return len(chunk)
+    except psycopg2.Error:
+        cur.execute("ROLLBACK TO SAVEPOINT chunk")
+
+    staged = 0
+    for line_no, r in chunk:
+        cur.execute("SAVEPOINT one_row")
+        try:
+            copy_rows(cur, [r])
+            cur.execute("RELEASE SAVEPOINT one_row")
+            staged += 1
+        except psycopg2.Error as e:
+            cur.execute("ROLLBACK TO SAVEPOINT one_row")
+            reject(line_no, dict(zip(COLUMNS, r)), (e.pgerror or str(e)).strip())
+    return staged
+
+
+def seed_data(csv_path="documents.csv", chunk_rows=5000, reject_path="documents.rejects.csv", prune=False):
+    csv.field_size_limit(sys.maxsize)
+    start = time.perf_counter()
+    rejected = 0
+    reject_file = None
+    reject_writer = None
+
+    def reject(line_no, row, reason):
+        nonlocal rejected, reject_file, reject_writer
+        if reject_writer is None:
+            reject_file = open(reject_path, "w", newline="", encoding="utf-8")
+            reject_writer = csv.writer(reject_file)
+            reject_writer.writerow(("line", *COLUMNS, "error"))
+        reject_writer.writerow((line_no, *(row.get(c, "") for c in COLUMNS), reason))
+        rejected += 1
+
     try:
         # Connect to the database
         conn = psycopg2.connect(**DB_CONFIG)
         cur = conn.cursor()
         print("✅ Connected to database.")
+        cur.execute(STAGING_SQL)
+
+        # Stream the CSV; only one chunk is in memory at a time
+        staged = 0
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            chunk = []
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                try:
+                    chunk.append((line_no, validate_row(row)))
+                except (ValueError, TypeError) as e:
+                    reject(line_no, row, str(e))
+                if len(chunk) >= chunk_rows:
+                    staged += copy_chunk(cur, chunk, reject)
+                    chunk = []
+                    print(f"   Staged {staged} rows ({staged / (time.perf_counter() - start):,.0f} rows/sec)...")
+            if chunk:
+                staged += copy_chunk(cur, chunk, reject)
+
+        load_done = time.perf_counter()
+        print(f"📂 Staged {staged} rows in {load_done - start:.1f}s.")
+
+        # Duplicate ids collapse to one row in the upsert (last one wins)
+        cur.execute("SELECT count(DISTINCT id) FROM it_documents_staging")
+        distinct = cur.fetchone()[0]
+        duplicates = staged - distinct
 
-        # Read the CSV file
-        # ensure documents.csv is in the same folder
-        df = pd.read_csv("documents.csv")
-        print(f"📂 Found {len(df)} rows in CSV.")
-
-        successful_inserts = 0
-
-        for index, row in df.iterrows():
-            try:
-                # Prepare data
-                doc_id = row['id']
-                content = row['content']
-                metadata = row['metadata']
-                embedding = row['embedding']
-
-                # SQL Insert Query
-                insert_query = """
-                INSERT INTO it_documents (id, content, metadata, embedding)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (id) DO UPDATE 
-                SET content = EXCLUDED.content,
-                    metadata = EXCLUDED.metadata,
-                    embedding = EXCLUDED.embedding;
-                """
-                
-                cur.execute(insert_query, (doc_id, content, metadata, embedding))
-                successful_inserts += 1
-
-            except Exception as e:
-                print(f"❌ Error inserting row {index}: {e}")
+        # One set-based upsert for the whole file
+        cur.execute(UPSERT_SQL)
+        changed = cur.rowcount
+        pruned = 0
+        if prune:
+            # A rejected row would otherwise delete the version already in the table
+            if staged and not rejected:
+                cur.execute(PRUNE_SQL)
+                pruned = cur.rowcount
+            else:
+                print("⚠️ --prune skipped: nothing staged or some rows were rejected.")
+        # Explicit ids bypass the bigserial; keep it ahead of them
+        cur.execute(
+            "SELECT setval(pg_get_serial_sequence('it_documents', 'id'), GREATEST((SELECT max(id) FROM it_documents), 1))"
+        )
 
         # Commit changes
         conn.commit()
         cur.close()
         conn.close()
-        print(f"🎉 Success! Inserted/Updated {successful_inserts} documents.")
+
+        total = time.perf_counter() - start
+        print(f"🎉 Success! Inserted/Updated {changed} documents ({distinct - changed} unchanged).")
+        if duplicates:
+            print(f"♊ {duplicates} rows repeated an earlier id (last occurrence kept).")
+        if pruned:
+            print(f"🧹 Removed {pruned} documents not in {csv_path}.")
+        print(f"⏱️ {total:.1f}s total, {staged / total:,.0f} rows/sec "
+              f"(load {load_done - start:.1f}s, upsert {total - (load_done - start):.1f}s)")
 
     except Exception as e:
         print(f"❌ Critical Error: {e}")
 
+    finally:
+        if reject_file is not None:
+            reject_file.close()
+            print(f"⚠️ {rejected} rows rejected -> {reject_path}")
+
+
 if __name__ == "__main__":
-    seed_data()
+    parser = argparse.ArgumentParser(description="Bulk-load documents.csv into it_documents")
+    parser.add_argument("csv_path", nargs="?", default="documents.csv")
+    parser.add_argument("--chunk-rows", type=int, default=5000)
+    parser.add_argument("--reject-file", default="documents.rejects.csv")
+    parser.add_argument("--prune", action="store_true", help="delete rows whose id is not in the file")
+    args = parser.parse_args()
+    seed_data(args.csv_path, args.chunk_rows, args.reject_file, args.prune)
@@ -0,0 +1,24 @@
+from backend.context_builder import ContextBuilder
+
+# python -m pytest test_context_builder.py (or run directly)
+
+
+def test_short_history_is_not_duplicated():
+    # verbatim_turns larger than the history: every turn once, verbatim
+    builder = ContextBuilder(verbatim_turns=5)
+    history = ["user: first question here", "assistant: first answer. More detail.", "user: second question"]
+    context_str, _, _ = builder.build_history(history)
+    assert context_str.split("\n") == history
+
+
+def test_older_turns_are_compressed():
+    builder = ContextBuilder(verbatim_turns=1)
+    history = ["assistant: - Summary line. Second sentence.", "user: latest question"]
+    context_str, _, _ = builder.build_history(history)
+    assert context_str.split("\n") == ["assistant: Summary line.", "user: latest question"]
+
+
+if __name__ == "__main__":
+    test_short_history_is_not_duplicated()
+    test_older_turns_are_compressed()
+    print("✅ context builder history checks passed")
@@ -0,0 +1,86 @@
+import json
+import socket
+import threading
+import time
+import uvicorn
+import backend.main as main
+from backend.deadline import current_deadline
+
+# python -m pytest test_disconnect.py (or run directly)
+
+
+class SlowPipeline:
+    """
+    Stands in for a ~6s crew run; stops early once the request is cancelled.
+    """
+
+    mode = "fake"
+
+    def __init__(self):
+        self.deadline = None
+        self.finished = threading.Event()
+
+    def retrieve(self, normalized_question):
+        return []
+
+    def answer(self, user_question, normalized_question, context_str, image_context, emit=None, documents=None):
+        self.deadline = current_deadline()
+        try:
+            for _ in range(60):
+                if self.deadline.cancelled:
+                    break
+                time.sleep(0.1)
+            return {"answer": "too late", "usage": {}}
+        finally:
+            self.finished.set()
+
+
+def test_client_disconnect_cancels_the_ask_run():
+    pipeline = SlowPipeline()
+    main.answer_pipeline = pipeline
+    main.answer_cache = None
+    main.faq_fast_path = None
+    main.DISCONNECT_POLL = 0.1
+
+    statuses = []
+
+    async def app(scope, receive, send):
+        async def record(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+            await send(message)
+
+        await main.app(scope, receive, record)
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, lifespan="off", log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        while not server.started:
+            time.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+
+        body = json.dumps({"question": "vpn not connecting"}).encode()
+        client = socket.create_connection(("127.0.0.1", port))
+        client.sendall(
+            b"POST /ask HTTP/1.1\r\nHost: test\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        time.sleep(1)
+        client.close()  # client gives up 1s into the run
+
+        assert pipeline.finished.wait(4), "run kept going after the client left"
+        assert pipeline.deadline.cancelled
+        for _ in range(50):
+            if statuses:
+                break
+            time.sleep(0.05)
+        assert statuses == [499]
+    finally:
+        server.should_exit = True
+        thread.join(5)
+
+
+if __name__ == "__main__":
+    test_client_disconnect_cancels_the_ask_run()
+    print("✅ disconnect check passed")
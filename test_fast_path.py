@@ -0,0 +1,55 @@
+import backend.main as main
+from backend.fast_path import FaqFastPath, is_english
+
+# python -m pytest test_fast_path.py (or run directly)
+
+DOCUMENTS = [
+    {"id": 1, "content": "Tablet Loss Policy\nReport a lost tablet to IT within 24 hours.", "metadata": {}, "similarity": 0.95},
+    {"id": 2, "content": "Laptop theft procedure. Contact security.", "metadata": {}, "similarity": 0.6},
+]
+
+
+class FakePipeline:
+    mode = "fake"
+
+    def retrieve(self, normalized_question):
+        return DOCUMENTS
+
+    def answer(self, user_question, normalized_question, context_str, image_context, emit=None, documents=None):
+        return {"answer": "LLM answer", "usage": {}}
+
+
+def _ask(question, history=None):
+    main.answer_pipeline = FakePipeline()
+    main.answer_cache = None
+    main.faq_fast_path = FaqFastPath()
+    return main.get_crew_response(question, history or [])
+
+
+def test_fast_path_answers_a_standalone_english_question():
+    assert _ask("I lost my tablet")["mode"] == "faq"
+
+
+def test_follow_up_skips_the_fast_path():
+    history = ["user: what is the laptop policy?", "assistant: - Summary: Laptops stay in the office."]
+    assert _ask("what about tablets?", history)["mode"] == "fake"
+
+
+def test_hindi_and_bengali_questions_skip_the_fast_path():
+    assert _ask("मेरा टैब खो गया")["mode"] == "fake"
+    assert _ask("আমার ট্যাব হারিয়ে গেছে")["mode"] == "fake"
+    assert _ask("mera tablet kho gaya hai")["mode"] == "fake"
+
+
+def test_is_english():
+    assert is_english("How do I set up the VPN?")
+    assert not is_english("वीपीएन कैसे सेट करें")
+    assert not is_english("vpn kivabe setup korbo")
+
+
+if __name__ == "__main__":
+    test_fast_path_answers_a_standalone_english_question()
+    test_follow_up_skips_the_fast_path()
+    test_hindi_and_bengali_questions_skip_the_fast_path()
+    test_is_english()
+    print("✅ FAQ fast path guard checks passed")
@@ -1,7 +1,9 @@
-from backend.db_tool import ITSupportTools
+# Manual check, not a pytest test: python test_tool.py (needs the DB + embedder)
+if __name__ == "__main__":
+    from backend.db_tool import SearchITDocsTool
 
-# Access the function directly from the class (standard CrewAI/LangChain pattern)
-tool_instance = ITSupportTools()
-print("🔍 Searching for 'asset declaration'...")
-result = ITSupportTools.search_documents.run("How often must branches submit the Monthly Asset Declaration?")
-print(f"\nRESULTS:\n{result}")
+    # Run the agent's search tool directly (same path the crew uses)
+    tool_instance = SearchITDocsTool()
+    print("🔍 Searching for 'asset declaration'...")
+    result = tool_instance.run("How often must branches submit the Monthly Asset Declaration?")
+    print(f"\nRESULTS:\n{result}")